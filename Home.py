@@ -20,17 +20,15 @@ This page sets the foundation for users exploring price estimation and feature i
 """
 
 import streamlit as st
-from PIL import Image
+
+from utils.assets import load_banner
 
 st.set_page_config(page_title="🏠 Home", layout="wide")
 
 # --- Banner ---
 image_path = "static/images/home_header.jpg"
 try:
-    with Image.open(image_path) as img:
-        img = img.convert("RGB")
-        img = img.resize((600, 200))
-        st.image(img, use_container_width=True)
+    st.image(load_banner(image_path, size=(600, 200)), use_container_width=True)
 except Exception as e:
     st.warning(f"Banner load failed: {e}")
 
@@ -92,7 +90,9 @@ Use the sidebar to explore:
 - 📊 **Feature Correlation**: See which attributes impact price most
 - ✅ **Hypothesis Validation**: Confirm modeling assumptions with data
 - 💸 **Price Prediction**: Run estimates for inherited or custom homes
+- 🗂️ **Batch Scoring**: Queue large property CSVs for background scoring
 - 🧪 **Technical Summary**: Review model pipeline and performance
+- 🛠️ **Instrumentation**: See where processing time goes, stage by stage (for administrators)
 - 📘 **User Guide**: Understand how to use the app effectively
 """)
 
@@ -8,17 +8,15 @@ Intended for stakeholders who want a high-level understanding without code-level
 
 import streamlit as st
 import pandas as pd
-from PIL import Image
+
+from utils.assets import load_banner
+from utils.data_io import read_dataset
 
 # --- HEADER IMAGE ---
 image_path = "static/images/summary_header.jpg"
-output_path = "static/images/summary_header_converted.png"
 
 try:
-    with Image.open(image_path) as img:
-        img = img.convert("RGB")
-        img.save(output_path, format="PNG")
-    st.image(output_path, use_container_width=True)
+    st.image(load_banner(image_path), use_container_width=True)
 except Exception as e:
     st.warning(f"Could not load header image: {e}")
 
@@ -60,7 +58,7 @@ except Exception as e:
 st.header("📦 Processed Dataset Summary")
 
 try:
-    df = pd.read_csv("data/processed/final/X_test.csv")
+    df = read_dataset("data/processed/final/X_test.csv")
     st.write(f"Rows: **{df.shape[0]}**, Columns: **{df.shape[1]}**")
     st.dataframe(df.head())
 
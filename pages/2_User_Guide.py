@@ -6,20 +6,16 @@ Offers instructions and tips to help users navigate the dashboard, interpret out
 """
 
 import streamlit as st
-from PIL import Image
+
+from utils.assets import load_banner
 
 st.set_page_config(page_title="User Guide", layout="wide")
 
 # --- Header Image ---
 image_path = "static/images/user_guide_header.jpg"
-output_path = "static/images/user_guide_banner_converted.png"
 
 try:
-    with Image.open(image_path) as img:
-        img = img.convert("RGB")
-        img = img.resize((600, 200))
-        img.save(output_path, format="PNG")
-    st.image(output_path, use_container_width=True)
+    st.image(load_banner(image_path, size=(600, 200)), use_container_width=True)
 except Exception as e:
     st.warning(f"Image load failed: {e}")
 
@@ -4,6 +4,7 @@ Feature Correlation Analysis – Streamlit Page
 This dashboard module:
 - Visualizes feature-to-target correlations using heatmaps and bar charts
 - Supports interactive selection of custom features for analysis
+- Reuses a correlation matrix computed once per dataset version (utils/correlation.py)
 - Highlights top predictors for LogSalePrice
 - Provides a pairwise scatter matrix to identify interactions and outliers
 - Presents interpretable business insights for model justification
@@ -18,26 +19,21 @@ Output:
 """
 
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-from PIL import Image
 import os
 import sys
-import numpy as np
 
 # Ensure parent dir is in path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from utils.assets import load_banner
+from utils.correlation import get_correlation
+
 # --- HEADER IMAGE ---
 image_path = "static/images/ft_corr_header.jpg"
-output_path = "static/images/ft_corr_header_converted.png"
 
 try:
-    with Image.open(image_path) as img:
-        img = img.convert("RGB")
-        img = img.resize((600, 200))
-        img.save(output_path, format="PNG")
-    st.image(output_path, use_container_width=True)
+    st.image(load_banner(image_path, size=(600, 200)), use_container_width=True)
 except Exception as e:
     st.warning(f"Image not loaded: {e}")
 
@@ -54,14 +50,14 @@ Correlation values:
 
 # --- LOAD DATA ---
 try:
-    df = pd.read_csv("data/processed/final/X_test.csv")
-    y = pd.read_csv("data/processed/final/y_test.csv")
-    df["LogSalePrice"] = np.log1p(y.iloc[:, 0])
+    # Cached per dataset version: reruns reuse the same frame and matrix
+    correlation = get_correlation()
+    df = correlation.data
 
     st.write(f"Dataset: **{df.shape[0]} rows** × **{df.shape[1]} columns**")
     st.dataframe(df.head())
 
-    corr_matrix = df.corr()
+    corr_matrix = correlation.matrix
 
     # --- HEATMAP TOGGLE ---
     st.header("Feature Correlation Heatmap")
@@ -88,7 +84,7 @@ try:
         )
         if len(features) > 1:
             fig = px.imshow(
-                df[features].corr(),
+                correlation.submatrix(features),
                 title="Custom Correlation Heatmap",
                 text_auto=".2f",
                 width=1000,
@@ -103,8 +99,7 @@ try:
     st.subheader("📊 Top Features Correlated with LogSalePrice")
     top_n = st.slider("Number of features to display:", 5, 30, 10)
 
-    top_corr = corr_matrix["LogSalePrice"].drop(
-        "LogSalePrice").sort_values(key=abs, ascending=False).head(top_n)
+    top_corr = correlation.top_correlated(top_n)
 
     fig = px.bar(
         x=top_corr.values,
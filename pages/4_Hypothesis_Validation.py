@@ -16,23 +16,19 @@ The validation process confirms model robustness, value driver alignment, and re
 """
 
 import streamlit as st
-from PIL import Image
 import os
 
+from utils.assets import load_banner
+
 # --- PAGE SETUP ---
 # st.set_page_config(page_title="Hypothesis Validation", layout="wide") #
 # Suggested by Streamlit to be only added once in Home.py
 
 # --- HEADER IMAGE ---
 image_path = "static/images/hypothesis_header.jpg"
-output_path = "static/images/hypothesis_header_converted.png"
 
 try:
-    with Image.open(image_path) as img:
-        img = img.convert("RGB")
-        img = img.resize((500, 200))
-        img.save(output_path, format="PNG")
-    st.image(output_path, use_container_width=True)
+    st.image(load_banner(image_path, size=(500, 200)), use_container_width=True)
 except Exception as e:
     st.warning(f"Image header not loaded: {e}")
 
@@ -7,8 +7,13 @@ This page enables:
 
 Features:
 - Form-based inputs for key structural and quality attributes
-- On-the-fly feature engineering and one-hot encoding to match model training
-- Real-time prediction using a serialized Random Forest pipeline
+- Feature engineering and one-hot encoding via the shared, fitted FeatureEngineer (same path as batch scoring)
+- Real-time prediction using a serialized Random Forest pipeline (or its promoted compressed variant), loaded once per process via the model registry
+- Resubmitted property profiles answered from the shared prediction cache
+- Calibrated likely price range from the spread of the forest's trees (utils/intervals.py)
+- Similarity to the training sales: out-of-distribution percentile and the most comparable sales (utils/neighbours.py)
+- Comparable past sales from the historical records for every property (utils/comps.py)
+- "Why this price?" breakdown of each estimate into per-feature contributions (utils/explain.py)
 - Detailed prediction summary, user interpretation notes, and CSV download
 
 This serves both business users (for inherited home pricing) and external users (custom scenario testing).
@@ -17,22 +22,50 @@ This serves both business users (for inherited home pricing) and external users
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
-from PIL import Image
 import datetime
 import os
 
+from utils.assets import load_banner
+from utils.comps import SIMILARITY_COL, comps_summary, get_comps_index
+from utils.data_io import read_dataset
+from utils.explain import get_explainer
+from utils.instrumentation import increment
+from utils.intervals import DEFAULT_COVERAGE, get_interval_model
+from utils.feature_engineering import ENGINEERED_FEATURES, load_feature_engineer
+from utils.model_registry import get_model, model_version, serving_pipeline_path
+from utils.neighbours import OOD_PERCENTILE, get_neighbour_index
+from utils.prediction_cache import BATCH, INTERACTIVE, get_prediction_cache
+from utils.schema import load_feature_schema, out_of_range
+
+# Columns shown for comparable sales
+COMPARABLE_COLUMNS = ["GrLivArea", "TotalBsmtSF", "OverallQual", "YearBuilt", "LotArea", "GarageArea", "SalePrice"]
+
+
+def comps_panel(query):
+    """Expander listing the past sales most comparable to `query` (raw attribute values)."""
+    with st.expander("🏘️ Comparable past sales"):
+        try:
+            comps, filters = get_comps_index().search(query)
+        except Exception as e:
+            increment("comps_errors")
+            st.caption(f"Comparable sales unavailable: {e}")
+            return
+        summary = comps_summary(comps, query)
+        left, right = st.columns(2)
+        left.metric("Median comp price", f"£{summary['median_price']:,.0f}")
+        if summary["implied_price"] is not None:
+            right.metric("Implied by price per sqft", f"£{summary['implied_price']:,.0f}")
+        table = comps[COMPARABLE_COLUMNS].assign(Similarity=comps[SIMILARITY_COL].round(2))
+        st.dataframe(table.rename_axis("Record"))
+        st.caption("Filters: " + (", ".join(f"{col} {low:g}–{high:g}" for col, (low, high) in filters.items())
+                                  or "none (too few close matches)"))
+
 
 # --- Header Image ---
 image_path = "static/images/pp_header.jpg"
-output_path = "static/images/pp_header_converted.png"
 
 try:
-    with Image.open(image_path) as img:
-        img = img.convert("RGB")
-        img = img.resize((600, 200))
-        img.save(output_path, format="PNG")
-    st.image(output_path, use_container_width=True)
+    st.image(load_banner(image_path, size=(600, 200)), use_container_width=True)
 except Exception as e:
     st.warning(f"Image load failed: {e}")
 
@@ -49,7 +82,7 @@ This page enables users to:
 st.header("Predicted Prices for Inherited Houses")
 
 try:
-    df_inherited = pd.read_csv(
+    df_inherited = read_dataset(
         "data/processed/final/inherited_properties_display_ready.csv")
 
     tabs = st.tabs([f"Property {i + 1}" for i in range(len(df_inherited))])
@@ -78,6 +111,8 @@ try:
             </div>
             """, unsafe_allow_html=True)
 
+            comps_panel(house)
+
     st.subheader("📜 Total Predicted Sale Value of Inherited Properties")
     st.markdown("""
     This figure represents the **combined predicted market value** of all inherited heritage properties listed above.
@@ -86,6 +121,7 @@ try:
     st.success(f"**£{df_inherited['Predicted_SalePrice'].sum():,.2f}**")
 
 except Exception as e:
+    increment("inherited_predictions_errors")
     st.error(f"❌ Could not load inherited predictions: {e}")
 
 st.markdown("---")
@@ -170,50 +206,73 @@ if submitted:
         "YearRemodAdd": YearRemodAdd
     }])
 
-    # --- Manual Feature Engineering ---
-    raw_input["HouseAge"] = 2025 - raw_input["YearBuilt"]
-    raw_input["LivingLotRatio"] = raw_input["GrLivArea"] / \
-        (raw_input["LotArea"] + 1)
-    raw_input["FinishedBsmtRatio"] = raw_input["BsmtFinSF1"] / \
-        (raw_input["TotalBsmtSF"] + 1)
-    raw_input["OverallScore"] = raw_input["OverallQual"] * \
-        raw_input["OverallCond"]
-    raw_input["HasPorch"] = np.where(
-        raw_input["OpenPorchSF"] > 0, "Has Porch", "No Porch")
-
-    # Drop original columns that were removed during training
-    raw_input.drop(columns=[
-        "YearBuilt", "GrLivArea", "LotArea", "BsmtFinSF1",
-        "TotalBsmtSF", "OverallQual", "OverallCond"
-    ], inplace=True)
-
-    # --- Manual One-Hot Encoding (match training) ---
-    categorical_cols = [
-        "BsmtExposure",
-        "BsmtFinType1",
-        "GarageFinish",
-        "KitchenQual",
-        "HasPorch"]
-    raw_input_encoded = pd.get_dummies(
-        raw_input, columns=categorical_cols, drop_first=True)
-
-    # --- Align to training features ---
-    expected_cols = pd.read_csv(
-        "data/processed/final/X_train.csv").columns.tolist()
-    for col in expected_cols:
-        if col not in raw_input_encoded.columns:
-            raw_input_encoded[col] = 0
-    raw_input_encoded = raw_input_encoded[expected_cols]
-
-    # --- Load pipeline and predict ---
+    # --- Engineer features and predict with the shared pipeline ---
     try:
-        pipeline = joblib.load(
-            "outputs/models/final_random_forest_pipeline.pkl")
-        log_prediction = pipeline.predict(raw_input_encoded)[0]
+        model_path = serving_pipeline_path()
+        pipeline = get_model(model_path)
+        features = load_feature_engineer().transform(raw_input)
+        log_prediction = get_prediction_cache().predict(
+            pipeline, features, model_version(model_path))[0]
         predicted_price = np.expm1(log_prediction)
 
         st.success(f"💰 Predicted Sale Price: **£{predicted_price:,.2f}**")
 
+        try:
+            _, log_lower, log_upper = get_interval_model(model_path).predict(features)
+            price_lower, price_upper = np.expm1(log_lower[0]), np.expm1(log_upper[0])
+            st.info(f"📏 Likely range ({DEFAULT_COVERAGE:.0%} interval): "
+                    f"**£{price_lower:,.0f} – £{price_upper:,.0f}**")
+        except Exception as e:
+            increment("price_interval_errors")
+            price_lower = price_upper = None
+            st.caption(f"Price range unavailable: {e}")
+
+        outside = out_of_range(raw_input, load_feature_schema())
+        if outside:
+            st.warning("⚠️ Some inputs are outside the range seen in training, so this estimate is less reliable:\n" + "\n".join(
+                f"- **{col}** = {value:g} (training range {low:g}–{high:g})"
+                for col, (value, low, high) in outside.items()))
+
+        ood_percentile = None
+        comparables = None
+        try:
+            neighbour_index = get_neighbour_index(model_path)
+            _, percentile, _ = neighbour_index.query(features)
+            ood_percentile = round(float(percentile[0]), 1)
+            comparables = neighbour_index.comparables(features)
+        except Exception as e:
+            increment("neighbour_errors")
+            st.caption(f"Similarity to training data unavailable: {e}")
+        if ood_percentile is not None:
+            with st.expander("📍 Similarity to training data", expanded=ood_percentile > OOD_PERCENTILE):
+                message = (f"This property is further from its nearest training sales than "
+                           f"**{ood_percentile:g}%** of the sales the model was trained on.")
+                if ood_percentile > OOD_PERCENTILE:
+                    st.warning(f"⚠️ {message} It is unusual for this model, so treat the estimate with caution.")
+                else:
+                    st.markdown(message)
+                if comparables is not None:
+                    st.markdown("Most comparable training sales:")
+                    st.dataframe(comparables[COMPARABLE_COLUMNS].rename_axis("Record"))
+
+        comps_panel(raw_input.iloc[0])
+
+        with st.expander("🔎 Why this price?", expanded=True):
+            try:
+                explainer = get_explainer(model_path)
+                contributions = explainer.explain_row(features)
+                top = contributions.head(8)
+                effect = (np.expm1(top) * 100).round(1)
+                st.markdown(
+                    f"Starting from the typical training-set price of "
+                    f"**£{np.expm1(explainer.base_value):,.0f}**, these features moved this estimate the most "
+                    f"(percentage change in price, {explainer.method} attribution):")
+                st.bar_chart(effect.rename("Effect on price (%)"), horizontal=True)
+                st.caption(" · ".join(f"{col}: {pct:+.1f}%" for col, pct in effect.items()))
+            except Exception as e:
+                increment("explanation_errors")
+                st.caption(f"Price explanation unavailable: {e}")
+
         st.markdown("""
         📌 **Interpretation**:
         - This prediction is based on historical Ames market data and assumes similar economic conditions.
@@ -221,8 +280,13 @@ if submitted:
         - Confidence is higher for inputs that closely match the training data (e.g. typical sizes, quality ratings).
         """)
 
-        display_df = raw_input.copy()
+        display_df = raw_input.join(features[ENGINEERED_FEATURES])
         display_df["Predicted SalePrice"] = predicted_price
+        if price_lower is not None:
+            display_df["Predicted SalePrice Lower"] = price_lower
+            display_df["Predicted SalePrice Upper"] = price_upper
+        if ood_percentile is not None:
+            display_df["OOD Percentile"] = ood_percentile
 
         st.markdown("### Prediction Summary")
         st.dataframe(display_df)
@@ -236,4 +300,8 @@ if submitted:
         )
 
     except Exception as e:
+        increment("custom_prediction_errors")
         st.error(f"Prediction failed: {e}")
+
+with st.expander("⚙️ Prediction cache statistics"):
+    st.json({name: get_prediction_cache(name).stats() for name in (INTERACTIVE, BATCH)})
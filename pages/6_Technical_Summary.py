@@ -7,19 +7,15 @@ Intended for technical reviewers and future developers.
 """
 
 import streamlit as st
-from PIL import Image
 import os
 
+from utils.assets import load_banner
+
 # --- Header Image ---
 image_path = "static/images/tech_summary_header.jpg"
-output_path = "static/images/tech_summary_header_converted.png"
 
 try:
-    with Image.open(image_path) as img:
-        img = img.convert("RGB")
-        img = img.resize((500, 200))
-        img.save(output_path, format="PNG")
-    st.image(output_path, use_container_width=True)
+    st.image(load_banner(image_path, size=(500, 200)), use_container_width=True)
 except Exception as e:
     st.warning(f"Image load failed: {e}")
 
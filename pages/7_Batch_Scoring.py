@@ -0,0 +1,143 @@
+"""
+Heritage Housing – Batch Scoring Page (Streamlit)
+
+This page enables:
+1. Queuing large revaluation batches (raw property CSVs) for background scoring.
+2. Monitoring queued and running jobs (rows scored, throughput, ETA).
+3. Downloading the predictions of completed jobs.
+
+Jobs run on the shared background job manager (utils/jobs.py), so they keep running
+while users navigate away; the status panel polls in a fragment and never blocks the
+rest of the page. Output files are only read when a download is requested, never by
+the polling panel, and uploads are stored under a unique name so sessions uploading
+files with the same name do not overwrite each other's input; they are deleted once
+their job finishes. Besides uploads, only the sample CSVs in `data/raw/` can be
+scored, so visitors cannot queue jobs over other files on the server.
+"""
+
+import os
+import uuid
+
+import streamlit as st
+
+from utils.jobs import COMPLETED, FAILED, PREDICTIONS_DIR, get_job_manager
+
+
+UPLOAD_DIR = os.path.join(PREDICTIONS_DIR, "uploads")
+# The only server-side files visitors may score
+SAMPLE_DIR = "data/raw"
+DEFAULT_SAMPLE = "inherited_houses.csv"
+POLL_SECONDS = 2
+
+manager = get_job_manager()
+
+# --- Title ---
+st.title("🗂️ Batch Scoring")
+st.markdown("""
+Score a full CSV of raw property records in the background. Results are written to
+`outputs/predictions/<job id>.csv` and can be downloaded here once the job completes.
+---
+""")
+
+# === SUBMIT A JOB ===
+st.header("Submit a Scoring Job")
+
+samples = sorted(name for name in os.listdir(SAMPLE_DIR) if name.endswith(".csv"))
+
+with st.form("batch_job_form"):
+    uploaded = st.file_uploader("Upload a raw property CSV", type="csv")
+    sample = st.selectbox("…or score one of the sample files", samples,
+                          index=samples.index(DEFAULT_SAMPLE) if DEFAULT_SAMPLE in samples else 0)
+    submitted = st.form_submit_button("🚀 Queue Job")
+
+if submitted:
+    input_path = os.path.join(SAMPLE_DIR, sample) if sample else None
+    is_upload = uploaded is not None
+    queued = False
+    try:
+        if is_upload:
+            os.makedirs(UPLOAD_DIR, exist_ok=True)
+            input_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex[:12]}_{os.path.basename(uploaded.name)}")
+            with open(input_path, "wb") as f:
+                f.write(uploaded.getbuffer())
+        if input_path is None:
+            raise FileNotFoundError("upload a CSV or pick a sample file")
+        job_id = manager.submit(input_path, remove_input=is_upload)
+        st.session_state.setdefault("batch_jobs", []).insert(0, job_id)
+        queued = True
+        st.success(f"Queued job `{job_id}`.")
+    except FileNotFoundError as e:
+        st.error(f"❌ Input file not found: {e}")
+    except ValueError as e:
+        st.error(f"❌ {e}")
+    # A rejected upload is never queued, so no job would delete it
+    if is_upload and not queued and os.path.exists(input_path):
+        os.remove(input_path)
+
+st.markdown("---")
+
+# === JOB STATUS ===
+st.header("Job Status")
+
+
+@st.fragment(run_every=POLL_SECONDS)
+def job_status_panel():
+    job_ids = st.session_state.get("batch_jobs", [])
+    if not job_ids:
+        st.info("No jobs submitted in this session yet.")
+        return
+
+    for job_id in job_ids:
+        job = manager.get(job_id)
+        if job is None:
+            continue
+        with st.container(border=True):
+            st.markdown(f"**Job `{job_id}`** – {job['input_path']} – *{job['status']}*")
+            if job["progress"] is not None:
+                st.progress(min(job["progress"], 1.0))
+            eta = f", ETA {job['eta_seconds']:.0f}s" if job["eta_seconds"] is not None else ""
+            total = f" / {job['total_rows']:,}" if job["total_rows"] else ""
+            st.caption(f"{job['rows_done']:,}{total} rows · "
+                       f"{job['rows_per_second']:,.0f} rows/s{eta}")
+
+            if job["status"] == FAILED:
+                st.error(job["error"])
+            elif job["status"] == COMPLETED:
+                st.caption("✅ Completed – download it under *Downloads* below.")
+
+    # A newly finished job appears in the (non-polled) Downloads section after a full rerun
+    finished = {job_id for job_id in job_ids
+                if (manager.get(job_id) or {}).get("status") == COMPLETED}
+    if not finished <= st.session_state.setdefault("batch_finished", set()):
+        st.session_state["batch_finished"] = finished
+        st.rerun()
+
+
+job_status_panel()
+
+# === DOWNLOADS ===
+st.header("Downloads")
+
+completed = [job for job in map(manager.get, st.session_state.get("batch_jobs", []))
+             if job is not None and job["status"] == COMPLETED and os.path.exists(job["output_path"])]
+if not completed:
+    st.caption("Completed jobs can be downloaded here.")
+
+for job in completed:
+    job_id = job["job_id"]
+    size_mb = os.path.getsize(job["output_path"]) / 1e6
+    left, right = st.columns([3, 1])
+    left.markdown(f"**Job `{job_id}`** – {job['rows_done']:,} rows ({size_mb:,.1f} MB)")
+    # The file is only read into memory once the user asks for it
+    if st.session_state.get("batch_download") == job_id:
+        with open(job["output_path"], "rb") as f:
+            right.download_button(
+                label="📥 Download Predictions",
+                data=f,
+                file_name=f"predictions_{job_id}.csv",
+                mime="text/csv",
+                key=f"download_{job_id}",
+            )
+    elif right.button("📦 Prepare download", key=f"prepare_{job_id}"):
+        st.session_state["batch_download"] = job_id
+        st.rerun()
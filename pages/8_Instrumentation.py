@@ -0,0 +1,82 @@
+"""
+Heritage Housing – Instrumentation Page (Streamlit)
+
+This page enables:
+1. Viewing per-stage timings of this dashboard process (artefact load, CSV read,
+   feature engineering, column alignment, predict, CSV write, image processing).
+2. Viewing event counters such as errors the other pages showed to users.
+3. Downloading the figures as a JSON snapshot or in Prometheus text format.
+
+Figures come from utils/instrumentation.py and cover every session and background
+batch job served by this process since it started (or since the last reset).
+Instrumentation is off unless the app is started with HERITAGE_INSTRUMENTATION=1;
+it can also be switched on here for the running process.
+"""
+
+import json
+
+import pandas as pd
+import streamlit as st
+
+from utils.instrumentation import (
+    ENV_FLAG,
+    is_enabled,
+    prometheus_text,
+    reset,
+    set_enabled,
+    snapshot,
+    summary_rows,
+)
+
+
+st.title("🛠️ Instrumentation")
+st.markdown("""
+Where time goes in this dashboard process, stage by stage. Percentiles are estimated
+from fixed latency buckets, so treat them as approximate.
+""")
+
+enabled = st.toggle("Record stage timings", value=is_enabled(),
+                    help=f"Starting the app with {ENV_FLAG}=1 switches this on at startup.")
+if enabled != is_enabled():
+    set_enabled(enabled)
+
+if not enabled:
+    st.info("Instrumentation is off, so nothing new is being recorded.")
+
+snap = snapshot()
+rows = summary_rows(snap)
+
+st.header("Stage Timings")
+if rows:
+    table = pd.DataFrame(rows).set_index("Stage")
+    st.dataframe(table, use_container_width=True)
+    st.bar_chart(table["Total (s)"].rename("Total time (s)"), horizontal=True)
+else:
+    st.caption("No stages recorded yet. Use the other pages (e.g. Price Prediction) and refresh.")
+
+st.header("Event Counters")
+if snap["counters"]:
+    st.dataframe(pd.Series(snap["counters"], name="Count").to_frame(), use_container_width=True)
+else:
+    st.caption("No events recorded.")
+
+st.markdown("---")
+left, middle, right = st.columns(3)
+with left:
+    st.download_button(
+        label="📥 JSON Snapshot",
+        data=json.dumps(snap, indent=2),
+        file_name="instrumentation_snapshot.json",
+        mime="application/json",
+    )
+with middle:
+    st.download_button(
+        label="📥 Prometheus Text",
+        data=prometheus_text(snap),
+        file_name="instrumentation.prom",
+        mime="text/plain",
+    )
+with right:
+    if st.button("🔄 Reset"):
+        reset()
+        st.rerun()
@@ -7,42 +7,207 @@ It processes input data, applies the trained model, and saves the output with pr
 
 Usage:
 Run this script as a standalone module to perform batch inference on new properties.
+
+    python run_pipeline.py                               # small files, scored in memory
+    python run_pipeline.py --input big.csv --chunksize 100000   # streaming mode
+    python run_pipeline.py --input big.csv --workers 4 --verify  # parallel mode
+    python run_pipeline.py --intervals --coverage 0.9            # add price intervals
+    python run_pipeline.py --input big.csv --chunksize 100000 --profile   # where does time go?
+    python run_pipeline.py --input big.csv --chunksize 100000 --validate  # reject bad rows, check drift
+    python run_pipeline.py --neighbours                          # flag unusual properties
+
+In streaming mode the input is read, scored and appended to the output file one
+chunk at a time, so memory stays bounded by the chunk size. In parallel mode the
+chunks are scored as shards in a process pool and written back in input order;
+--verify re-scores every shard sequentially and checks the results match bit for bit.
+--intervals adds calibrated lower/upper sale price columns (see utils/intervals.py);
+it applies to the in-memory and streaming modes.
+--metrics-output saves per-stage timings of the run (see utils/instrumentation.py);
+in parallel mode only the coordinating process is covered.
+--validate checks every row against the feature schema first (types, ranges, category
+codes), writes rejected rows with reasons to <output>_rejects.csv instead of scoring them,
+and reports input drift (PSI/KS) in <output>_drift.csv (see utils/validation.py).
+--profile records wall/CPU time, memory and allocations per stage (CSV read, feature
+engineering, column check, preprocessor, model, CSV write) and saves a JSON report to
+outputs/metrics/ (see utils/profiling.py); --profile-sample-ms adds a sampled call profile.
+--neighbours adds each property's distance to its nearest training sales, the percentile
+of that distance among the training sales and the comparable records (see utils/neighbours.py).
 """
 
+import argparse
+import sys
+
 import pandas as pd
-from utils.deployment_pipeline import predict_from_raw
+from utils.deployment_pipeline import (
+    DEFAULT_CHUNKSIZE,
+    predict_csv_in_chunks,
+    predict_from_raw,
+)
+from utils.instrumentation import save_snapshot, set_enabled, timed
+from utils.intervals import DEFAULT_COVERAGE
+from utils.neighbours import PERCENTILE_COL
+from utils.profiling import profile_run
+from utils.parallel_scoring import predict_csv_parallel
+from utils.schema import check_raw_columns, load_feature_schema
 
 
 # Paths to required files
 RAW_DATA_PATH = "data/raw/inherited_houses.csv"
-X_TRAIN_PATH = "data/processed/final/X_train.csv"
 MODEL_PATH = "outputs/models/final_random_forest_pipeline.pkl"
 OUTPUT_PATH = "outputs/predictions/new_data_predictions.csv"
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Batch inference for Heritage Housing.")
+    parser.add_argument("--input", default=RAW_DATA_PATH, help="Raw property CSV to score.")
+    parser.add_argument("--model", default=MODEL_PATH, help="Serialized pipeline to use.")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="Where to write predictions.")
+    parser.add_argument(
+        "--chunksize", type=int, default=0,
+        help=f"Stream the input in chunks of this many rows (e.g. {DEFAULT_CHUNKSIZE}). "
+             "0 scores the whole file in memory.")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Score shards of --chunksize rows in this many worker processes.")
+    parser.add_argument(
+        "--verify", action="store_true",
+        help="With --workers, check parallel results against the sequential path.")
+    parser.add_argument(
+        "--intervals", action="store_true",
+        help="Add calibrated Predicted_SalePrice_Lower/Upper columns.")
+    parser.add_argument(
+        "--coverage", type=float, default=DEFAULT_COVERAGE,
+        help="Nominal coverage of the --intervals range.")
+    parser.add_argument(
+        "--validate", action="store_true",
+        help="Validate rows against the feature schema; reject bad rows and report drift.")
+    parser.add_argument(
+        "--rejects", default=None,
+        help="With --validate, where to write rejected rows (default <output>_rejects.csv).")
+    parser.add_argument(
+        "--drift-output", default=None,
+        help="With --validate, where to write the drift report (default <output>_drift.csv).")
+    parser.add_argument(
+        "--neighbours", action="store_true",
+        help="Add out-of-distribution scores and comparable training sales to the output.")
+    parser.add_argument(
+        "--metrics-output", default=None,
+        help="Record per-stage timings and save the snapshot to this JSON file.")
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Profile the run per stage (wall/CPU time, peak RSS, allocations).")
+    parser.add_argument(
+        "--profile-output", default=None,
+        help="Where to write the --profile report (default outputs/metrics/profile_<time>.json).")
+    parser.add_argument(
+        "--profile-sample-ms", type=float, default=0,
+        help="With --profile, also sample the call stack every this many milliseconds.")
+    parser.add_argument(
+        "--profile-no-alloc", action="store_true",
+        help="With --profile, skip allocation tracing (faster, undistorted timings).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run inference; returns the process exit status (1 if scoring failed)."""
+    args = parse_args(argv)
+    if args.metrics_output:
+        set_enabled(True)
+    try:
+        if args.profile:
+            with profile_run(args.profile_output, args.profile_sample_ms / 1000 or None,
+                             trace_allocations=not args.profile_no_alloc, label="run_pipeline"):
+                ok = run(args)
+        else:
+            ok = run(args)
+    finally:
+        if args.metrics_output:
+            save_snapshot(args.metrics_output)
+    return 0 if ok else 1
+
+
+def run(args):
     print("Running inference using deployment pipeline...")
 
-    # Load new data and reference feature structure
+    # Validate the input header against the saved feature schema before scoring
+    try:
+        header = pd.read_csv(args.input, nrows=0).columns
+        check_raw_columns(header, load_feature_schema())
+    except FileNotFoundError as e:
+        print(f"[ERROR] Required file missing: {e}")
+        return False
+    except ValueError as e:
+        print(e)
+        return False
+
+    if args.intervals and args.workers > 1:
+        print("[WARNING] --intervals is not supported with --workers; scoring without intervals.")
+    if args.validate and args.workers > 1:
+        print("[WARNING] --validate is not supported with --workers; scoring without validation.")
+    if args.neighbours and args.workers > 1:
+        print("[WARNING] --neighbours is not supported with --workers; scoring without neighbours.")
+
+    if args.workers > 1:
+        summary = predict_csv_parallel(
+            input_path=args.input,
+            model_path=args.model,
+            save_output_path=args.output,
+            workers=args.workers,
+            chunksize=args.chunksize or DEFAULT_CHUNKSIZE,
+            verify=args.verify,
+        )
+        return summary is not None
+
+    if args.chunksize > 0:
+        summary = predict_csv_in_chunks(
+            input_path=args.input,
+            model_path=args.model,
+            save_output_path=args.output,
+            chunksize=args.chunksize,
+            intervals=args.intervals,
+            coverage=args.coverage,
+            validate=args.validate,
+            reject_path=args.rejects,
+            drift_path=args.drift_output,
+            neighbours=args.neighbours,
+        )
+        return summary is not None
+
+    # Load new data
     try:
-        new_data = pd.read_csv(RAW_DATA_PATH)
-        X_train = pd.read_csv(X_TRAIN_PATH)
+        with timed("csv_read"):
+            new_data = pd.read_csv(args.input)
         print(f"[INFO] Loaded raw input shape: {new_data.shape}")
     except FileNotFoundError as e:
         print(f"[ERROR] Required file missing: {e}")
-        return
+        return False
 
     # Run prediction
     prediction_df = predict_from_raw(
         raw_df=new_data,
-        model_path=MODEL_PATH,
-        training_features=X_train,
-        save_output_path=OUTPUT_PATH
+        model_path=args.model,
+        save_output_path=args.output,
+        intervals=args.intervals,
+        coverage=args.coverage,
+        validate=args.validate,
+        reject_path=args.rejects,
+        drift_path=args.drift_output,
+        neighbours=args.neighbours,
     )
+    if prediction_df is None:
+        return False
+    if prediction_df.empty:
+        return True
 
     print("\nSample predictions:")
-    print(prediction_df[["Predicted_LogSalePrice", "Predicted_SalePrice"]].head())
+    shown = ["Predicted_LogSalePrice", "Predicted_SalePrice"]
+    if args.intervals:
+        shown += ["Predicted_SalePrice_Lower", "Predicted_SalePrice_Upper"]
+    if args.neighbours:
+        shown += [PERCENTILE_COL]
+    print(prediction_df[shown].head())
+    return True
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
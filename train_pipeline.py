@@ -0,0 +1,84 @@
+"""
+Heritage Housing – Training Script
+
+Purpose:
+Retrains the deployment pipeline from the raw sale records without the notebooks.
+Collection, cleaning, feature engineering, splitting, training, evaluation and export
+run as content-hashed stages (see utils/training_pipeline.py): stages whose code,
+parameters and inputs are unchanged are reused from `outputs/train_cache/`, so after a
+small data change only the affected stages are recomputed.
+
+Outputs:
+- outputs/models/final_random_forest_pipeline.pkl
+- outputs/models/feature_schema.json
+- the Random Forest rows of outputs/metrics/test_set_results.csv and
+  outputs/metrics/consolidated_model_performance.csv
+- the train/test split as data/processed/final/X_*.csv / y_*.csv, with their Parquet
+  copies and the X_train.npy feature matrix
+
+Usage:
+    python train_pipeline.py
+    python train_pipeline.py --force train          # retrain even if nothing changed
+    python train_pipeline.py --download             # fetch the raw data from Kaggle first
+"""
+
+import argparse
+
+from utils.feature_matrix import FINAL_DIR
+from utils.model_registry import FINAL_PIPELINE_PATH
+from utils.schema import SCHEMA_PATH
+from utils.training_pipeline import (
+    BEST_PARAMS_PATH,
+    CACHE_DIR,
+    METRICS_DIR,
+    RAW_RECORDS_PATH,
+    build_stages,
+    run_training,
+)
+
+
+STAGE_NAMES = [stage.name for stage in build_stages(model_params={})]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Headless training pipeline for Heritage Housing.")
+    parser.add_argument("--raw", default=RAW_RECORDS_PATH, help="Raw sale records CSV.")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Where stage outputs are cached.")
+    parser.add_argument("--model", default=FINAL_PIPELINE_PATH, help="Where to write the pipeline.")
+    parser.add_argument("--schema", default=SCHEMA_PATH, help="Where to write the feature schema.")
+    parser.add_argument("--metrics-dir", default=METRICS_DIR, help="Where to update the metrics CSVs.")
+    parser.add_argument("--final-dir", default=FINAL_DIR, help="Where to write the train/test split.")
+    parser.add_argument(
+        "--params", default=BEST_PARAMS_PATH,
+        help="Tuned hyperparameters JSON (python -m utils.tuning); notebook defaults if missing.")
+    parser.add_argument(
+        "--force", nargs="+", default=[], choices=STAGE_NAMES, metavar="STAGE",
+        help=f"Recompute these stages and everything after them ({', '.join(STAGE_NAMES)}).")
+    parser.add_argument(
+        "--download", action="store_true",
+        help="Download the raw data from Kaggle if --raw does not exist.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        run_training(
+            raw_path=args.raw,
+            cache_dir=args.cache_dir,
+            model_path=args.model,
+            schema_path=args.schema,
+            metrics_dir=args.metrics_dir,
+            params_path=args.params,
+            force=args.force,
+            download=args.download,
+            final_dir=args.final_dir,
+        )
+    except FileNotFoundError as e:
+        print(e)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
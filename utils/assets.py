@@ -0,0 +1,55 @@
+"""
+Heritage Housing – Static Asset Helper
+
+Purpose:
+Serves the dashboard's header banners from memory.
+
+Each banner is opened, converted and resized once per process (on first use) and the
+resulting PNG bytes are cached, keyed by source path, target size and the source file's
+mtime. Pages pass the bytes straight to `st.image`, so nothing is re-encoded on rerun
+and nothing is ever written into `static/images` while the app is serving.
+"""
+
+import io
+import os
+import threading
+
+from PIL import Image
+
+from utils.instrumentation import instrumented
+
+
+_banner_cache = {}
+_banner_lock = threading.Lock()
+
+
+@instrumented("image_processing")
+def _render_banner(image_path, size):
+    with Image.open(image_path) as img:
+        img = img.convert("RGB")
+        if size is not None:
+            img = img.resize(size)
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def load_banner(image_path, size=None):
+    """
+    Return PNG bytes for `image_path`, resized to `size` (width, height) if given.
+    The rendered bytes are cached in memory until the source file changes.
+    """
+    key = (os.path.abspath(image_path), tuple(size) if size else None)
+    mtime = os.stat(image_path).st_mtime_ns
+
+    cached = _banner_cache.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with _banner_lock:
+        cached = _banner_cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        data = _render_banner(image_path, key[1])
+        _banner_cache[key] = (mtime, data)
+        return data
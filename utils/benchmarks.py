@@ -0,0 +1,328 @@
+"""
+Heritage Housing – Benchmark Suite
+
+Purpose:
+Times the inference and dashboard hot paths so that a library upgrade or a code change
+that slows them down is caught before deployment.
+
+Benchmarks:
+- model_load_ms:                 unpickling the final pipeline from disk
+- single_row_predict_ms:         one form submission through the page's path
+                                 (FeatureEngineer.transform + pipeline.predict, no cache)
+- predict_from_raw_<n>_rows_per_s: `predict_from_raw` throughput on synthetic records;
+                                 sizes above `--in-memory-limit` are streamed from a CSV
+                                 with `predict_csv_in_chunks` instead
+- correlation_ms:                the Feature Correlation page's matrix and ranking
+- load_csv_ms / load_columnar_ms: reading X_train from CSV vs its Parquet copy
+
+Synthetic data is sampled from `data/raw/house_prices_records.csv` with the continuous
+columns jittered by ±10% (years, ratings and counts are left alone, so every row passes
+validation), so rows are distinct and the prediction cache cannot shortcut
+the run. Latencies are medians over `--repeats` runs.
+
+Each run is saved as one JSON file in `outputs/benchmarks/` with the library versions,
+git commit and machine it ran on. `compare` checks a run against an earlier one and
+flags every benchmark that got worse by more than `--threshold`, or that failed in the
+newer run (failures are stored with the run), with exit status 1.
+
+Usage:
+    python -m utils.benchmarks run --sizes 1000 100000 1000000 10000000
+    python -m utils.benchmarks compare                 # latest run vs the one before
+    python -m utils.benchmarks compare --baseline outputs/benchmarks/<run>.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import joblib
+import pandas as pd
+
+from utils.correlation import CorrelationResult, _load_data
+from utils.data_io import columnar_path, read_dataset
+from utils.deployment_pipeline import DEFAULT_CHUNKSIZE, predict_csv_in_chunks, predict_from_raw
+from utils.feature_engineering import load_feature_engineer
+from utils.instrumentation import median_seconds
+from utils.model_registry import FINAL_PIPELINE_PATH, get_model
+from utils.prediction_cache import BATCH, get_prediction_cache
+from utils.schema import synthetic_records as schema_synthetic_records
+
+
+HISTORY_DIR = "outputs/benchmarks"
+RAW_RECORDS_PATH = "data/raw/house_prices_records.csv"
+X_TRAIN_PATH = "data/processed/final/X_train.csv"
+Y_TRAIN_PATH = "data/processed/final/y_train.csv"
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_REPEATS = 20
+DEFAULT_THRESHOLD = 0.10
+IN_MEMORY_LIMIT = 1_000_000
+JITTER = 0.10
+LIBRARIES = ["numpy", "pandas", "sklearn", "pyarrow", "joblib", "streamlit"]
+
+
+def _result(value, unit, higher_is_better=False, **extra):
+    return {"value": round(value, 4), "unit": unit, "higher_is_better": higher_is_better, **extra}
+
+
+def synthetic_records(n_rows, source_path=RAW_RECORDS_PATH, seed=0):
+    """
+    `n_rows` raw records sampled from `source_path`, with continuous columns
+    scaled by a random factor in [1 - JITTER, 1 + JITTER] (see
+    `utils.schema.synthetic_records`; years, ratings and counts are kept).
+    """
+    return schema_synthetic_records(pd.read_csv(source_path), n_rows, JITTER, seed)
+
+
+def _write_synthetic_csv(path, n_rows, chunk_rows=DEFAULT_CHUNKSIZE):
+    for i, start in enumerate(range(0, n_rows, chunk_rows)):
+        chunk = synthetic_records(min(chunk_rows, n_rows - start), seed=i)
+        chunk.to_csv(path, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+
+
+def bench_model_load(model_path, repeats):
+    seconds = median_seconds(lambda: joblib.load(model_path), max(1, repeats // 4))
+    return _result(seconds * 1000, "ms", size_kb=round(os.path.getsize(model_path) / 1024, 1))
+
+
+def bench_single_row(model_path, repeats):
+    pipeline = get_model(model_path)
+    engineer = load_feature_engineer()
+    row = synthetic_records(1)
+    seconds = median_seconds(lambda: pipeline.predict(engineer.transform(row)), repeats)
+    return _result(seconds * 1000, "ms")
+
+
+def bench_throughput(model_path, n_rows, in_memory_limit=IN_MEMORY_LIMIT):
+    get_prediction_cache(BATCH).clear()
+    if n_rows <= in_memory_limit:
+        df = synthetic_records(n_rows)
+        start = time.perf_counter()
+        if predict_from_raw(df, model_path) is None:
+            raise RuntimeError("predict_from_raw failed")
+        seconds = time.perf_counter() - start
+        mode = "in-memory"
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            input_path = os.path.join(tmp, "synthetic.csv")
+            _write_synthetic_csv(input_path, n_rows)
+            start = time.perf_counter()
+            if predict_csv_in_chunks(input_path, model_path, os.path.join(tmp, "out.csv")) is None:
+                raise RuntimeError("predict_csv_in_chunks failed")
+            seconds = time.perf_counter() - start
+        mode = "streaming"
+    get_prediction_cache(BATCH).clear()
+    return _result(n_rows / seconds, "rows/s", higher_is_better=True, mode=mode, seconds=round(seconds, 3))
+
+
+def bench_correlation(repeats):
+    data = _load_data(X_TRAIN_PATH, Y_TRAIN_PATH)
+    seconds = median_seconds(lambda: CorrelationResult("benchmark", data), repeats)
+    return _result(seconds * 1000, "ms", shape=list(data.shape))
+
+
+def bench_loads(repeats):
+    results = {"load_csv_ms": _result(
+        median_seconds(lambda: pd.read_csv(X_TRAIN_PATH), repeats) * 1000, "ms")}
+    if os.path.exists(columnar_path(X_TRAIN_PATH)):
+        results["load_columnar_ms"] = _result(
+            median_seconds(lambda: read_dataset(X_TRAIN_PATH), repeats) * 1000, "ms")
+    else:
+        print(f"[WARNING] No Parquet copy of {X_TRAIN_PATH}; run python -m utils.data_io first.")
+    return results
+
+
+def environment():
+    """Library versions, interpreter, machine and git commit of this run."""
+    versions = {}
+    for name in LIBRARIES:
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            versions[name] = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": commit,
+        "libraries": versions,
+    }
+
+
+def run_suite(model_path=FINAL_PIPELINE_PATH, sizes=DEFAULT_SIZES, repeats=DEFAULT_REPEATS,
+              in_memory_limit=IN_MEMORY_LIMIT, history_dir=HISTORY_DIR, label=None):
+    """Run every benchmark, save the run to `history_dir` and return its path."""
+    results, failures = {}, {}
+
+    def record(name, fn):
+        print(f"[INFO] Benchmark: {name}")
+        try:
+            results.update(fn())
+        except Exception as e:
+            failures[name] = f"{type(e).__name__}: {e}"
+            print(f"[ERROR] {name} failed: {e}")
+
+    record("model load", lambda: {"model_load_ms": bench_model_load(model_path, repeats)})
+    record("single-row predict", lambda: {"single_row_predict_ms": bench_single_row(model_path, repeats)})
+    for n in sizes:
+        record(f"predict_from_raw on {n:,} rows", lambda n=n: {
+            f"predict_from_raw_{n}_rows_per_s": bench_throughput(model_path, n, in_memory_limit)})
+    record("correlation", lambda: {"correlation_ms": bench_correlation(repeats)})
+    record("CSV vs columnar load", lambda: bench_loads(repeats))
+
+    timestamp = datetime.now(timezone.utc)
+    run = {
+        "timestamp": timestamp.isoformat(timespec="seconds"),
+        "label": label,
+        "model_path": model_path,
+        "environment": environment(),
+        "results": results,
+        "failures": failures,
+    }
+    os.makedirs(history_dir, exist_ok=True)
+    path = os.path.join(history_dir, f"{timestamp:%Y%m%dT%H%M%SZ}.json")
+    with open(path, "w") as f:
+        json.dump(run, f, indent=2)
+    print(pd.DataFrame(
+        [{"Benchmark": name, "Value": r["value"], "Unit": r["unit"]} for name, r in results.items()]
+    ).to_string(index=False))
+    if failures:
+        print(f"[WARNING] {len(failures)} benchmark(s) failed and were not timed: {', '.join(failures)}")
+    print(f"[SAVED] Benchmark run saved to: {path}")
+    return path
+
+
+def history(history_dir=HISTORY_DIR):
+    """Saved runs, oldest first."""
+    return sorted(glob.glob(os.path.join(history_dir, "*.json")))
+
+
+def compare_runs(baseline_path, candidate_path, threshold=DEFAULT_THRESHOLD):
+    """
+    Relative change of every benchmark in the baseline run. A benchmark is a
+    REGRESSION if it got worse by more than `threshold` (0.10 = 10%) or is missing
+    from the candidate (e.g. it failed there). Returns a DataFrame.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    with open(candidate_path) as f:
+        candidate = json.load(f)["results"]
+
+    rows = []
+    for name in baseline:
+        if name not in candidate:
+            rows.append({"Benchmark": name, "Baseline": baseline[name]["value"], "Candidate": None,
+                         "Unit": baseline[name]["unit"], "Change (%)": None, "Status": "REGRESSION"})
+            continue
+        old, new = baseline[name]["value"], candidate[name]["value"]
+        change = (new - old) / old if old else 0.0
+        worse = -change if candidate[name]["higher_is_better"] else change
+        if baseline[name].get("mode") != candidate[name].get("mode"):
+            status = "NOT COMPARABLE"  # e.g. in-memory vs streaming throughput
+        else:
+            status = "REGRESSION" if worse > threshold else "IMPROVED" if worse < -threshold else "OK"
+        rows.append({
+            "Benchmark": name,
+            "Baseline": old,
+            "Candidate": new,
+            "Unit": candidate[name]["unit"],
+            "Change (%)": round(change * 100, 1),
+            "Status": status,
+        })
+    return pd.DataFrame(rows)
+
+
+def environment_changes(baseline_path, candidate_path):
+    """{field: (baseline, candidate)} for library versions, interpreter and commit that differ."""
+    with open(baseline_path) as f:
+        old = json.load(f)["environment"]
+    with open(candidate_path) as f:
+        new = json.load(f)["environment"]
+    flat_old = {**old.get("libraries", {}), "python": old.get("python"), "git_commit": old.get("git_commit")}
+    flat_new = {**new.get("libraries", {}), "python": new.get("python"), "git_commit": new.get("git_commit")}
+    return {name: (flat_old.get(name), value) for name, value in flat_new.items()
+            if flat_old.get(name) != value}
+
+
+def compare(baseline_path=None, candidate_path=None, threshold=DEFAULT_THRESHOLD,
+            history_dir=HISTORY_DIR):
+    """Print the comparison; returns 1 if anything regressed, else 0."""
+    runs = history(history_dir)
+    candidate_path = candidate_path or (runs[-1] if runs else None)
+    if baseline_path is None:
+        earlier = [path for path in runs if path != candidate_path]
+        baseline_path = earlier[-1] if earlier else None
+    if candidate_path is None or baseline_path is None:
+        print(f"[ERROR] Need two benchmark runs to compare (found {len(runs)} in {history_dir}).")
+        return 1
+
+    report = compare_runs(baseline_path, candidate_path, threshold)
+    print(f"[INFO] Baseline:  {baseline_path}")
+    print(f"[INFO] Candidate: {candidate_path}")
+    with open(candidate_path) as f:
+        for name, error in json.load(f).get("failures", {}).items():
+            print(f"[ERROR] Candidate benchmark failed: {name} ({error})")
+    for name, (old, new) in environment_changes(baseline_path, candidate_path).items():
+        print(f"[INFO] Environment changed: {name} {old} -> {new}")
+    print(report.to_string(index=False))
+    regressions = report[report["Status"] == "REGRESSION"]
+    missing = regressions[regressions["Candidate"].isna()]
+    slower = regressions[regressions["Candidate"].notna()]
+    if len(missing):
+        print(f"[ERROR] {len(missing)} baseline benchmark(s) missing from the candidate: "
+              f"{', '.join(missing['Benchmark'])}")
+    if len(slower):
+        print(f"[ERROR] {len(slower)} benchmark(s) regressed by more than {threshold:.0%}: "
+              f"{', '.join(slower['Benchmark'])}")
+    if len(regressions):
+        return 1
+    print(f"[INFO] No regressions beyond {threshold:.0%}.")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inference and dashboard benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the suite and save it to the history.")
+    run_parser.add_argument("--model", default=FINAL_PIPELINE_PATH)
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                            help="Synthetic row counts for the throughput benchmark.")
+    run_parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    run_parser.add_argument("--in-memory-limit", type=int, default=IN_MEMORY_LIMIT,
+                            help="Larger sizes are streamed from a temporary CSV.")
+    run_parser.add_argument("--label", default=None, help="Free-text note stored with the run.")
+    run_parser.add_argument("--history-dir", default=HISTORY_DIR)
+    run_parser.add_argument("--compare", action="store_true",
+                            help="Compare against the previous run afterwards.")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    compare_parser = commands.add_parser("compare", help="Flag regressions between two runs.")
+    compare_parser.add_argument("--baseline", default=None, help="Default: the run before --candidate.")
+    compare_parser.add_argument("--candidate", default=None, help="Default: the latest run.")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="Relative slowdown that counts as a regression.")
+    compare_parser.add_argument("--history-dir", default=HISTORY_DIR)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        path = run_suite(args.model, args.sizes, args.repeats, args.in_memory_limit,
+                         args.history_dir, args.label)
+        return compare(candidate_path=path, threshold=args.threshold,
+                       history_dir=args.history_dir) if args.compare else 0
+    return compare(args.baseline, args.candidate, args.threshold, args.history_dir)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
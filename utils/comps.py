@@ -0,0 +1,271 @@
+"""
+Heritage Housing – Comparable Sales Search
+
+Purpose:
+Finds the past sales in the historical records (`data/raw/house_prices_records.csv`)
+most similar to a property, so valuers can set the model's price beside actual
+comparable sales ("comps").
+
+- Range filters narrow the records to plausible comps first: living area within ±25%,
+  overall quality within ±1 grade and year built within ±20 years by default
+- The remaining records are ranked by a weighted distance over living area, quality,
+  year built, basement, garage and lot size, each scaled by its spread in the records
+  (lot area on a log scale); similarity is `exp(-distance)`, so 1.0 is an identical match
+- If fewer than `k` records pass the filters, the windows are doubled (up to
+  `MAX_WIDENINGS` times) and finally dropped, so a search always returns `k` comps
+- The index is built once per process: the records are sorted by living area, so the
+  living-area window is a binary search, and the attribute columns are held
+  column-major, so the other filters scan contiguous slices and the ranking gathers
+  only the surviving candidates; the top `k` come from `np.argpartition`. It is
+  rebuilt when the records file changes
+- Missing attribute values in the records are filled with the column median;
+  attributes missing from the query are left out of its filters and ranking
+
+Searches take well under a millisecond on the 1,460 Ames records and a few
+milliseconds on hundreds of thousands (see `--benchmark`).
+
+Usage:
+    python -m utils.comps --GrLivArea 1500 --OverallQual 6 --YearBuilt 1970 -k 5
+    python -m utils.comps --benchmark 500000
+"""
+
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.data_io import read_dataset
+from utils.instrumentation import timed
+from utils.model_registry import file_stamp
+from utils.schema import synthetic_records
+
+
+RECORDS_PATH = "data/raw/house_prices_records.csv"
+PRICE_COL = "SalePrice"
+# Records are sorted by this attribute, so its window is a binary search
+PRIMARY_ATTRIBUTE = "GrLivArea"
+# Relative weight of each attribute in the similarity ranking
+WEIGHTS = {
+    "GrLivArea": 3.0,
+    "OverallQual": 2.0,
+    "YearBuilt": 1.5,
+    "TotalBsmtSF": 1.0,
+    "GarageArea": 0.75,
+    "LotArea": 0.75,
+}
+LOG_ATTRIBUTES = ("LotArea",)
+# Default filter windows: a fraction of the query value, or absolute units
+RELATIVE_WINDOWS = {"GrLivArea": 0.25}
+ABSOLUTE_WINDOWS = {"OverallQual": 1, "YearBuilt": 20}
+MAX_WIDENINGS = 3
+DEFAULT_K = 5
+DISTANCE_COL = "Comp_Distance"
+SIMILARITY_COL = "Comp_Similarity"
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def default_filters(query, widen=1.0):
+    """
+    Filter windows `{attribute: (low, high)}` around `query`, each `widen` times
+    the default width. Attributes missing from the query get no filter.
+    """
+    filters = {}
+    for col, fraction in RELATIVE_WINDOWS.items():
+        value = query.get(col)
+        if value is not None and not pd.isna(value):
+            filters[col] = (value * (1 - fraction * widen), value * (1 + fraction * widen))
+    for col, width in ABSOLUTE_WINDOWS.items():
+        value = query.get(col)
+        if value is not None and not pd.isna(value):
+            filters[col] = (value - width * widen, value + width * widen)
+    return filters
+
+
+class CompsIndex:
+    """
+    Filter-and-rank index over historical sales.
+
+    Parameters:
+        records (DataFrame): Past sales with the WEIGHTS attributes and SalePrice;
+            the index labels are kept as record ids (row numbers in the file).
+        weights (dict): Attribute weights for the similarity ranking.
+    """
+
+    def __init__(self, records, weights=WEIGHTS):
+        missing = [col for col in list(weights) + [PRICE_COL] if col not in records.columns]
+        if missing:
+            raise ValueError(f"[ERROR] Records are missing comps attributes: {missing}")
+        records = records[records[PRICE_COL].notna()]
+        self.attributes = list(weights)
+        self.weights = np.array([weights[col] for col in self.attributes])
+
+        values = records[self.attributes].astype(float)
+        values = values.fillna(values.median())
+        order = np.argsort(values[PRIMARY_ATTRIBUTE].to_numpy(), kind="stable")
+        self.records = records.iloc[order]
+        self.primary = np.ascontiguousarray(values[PRIMARY_ATTRIBUTE].to_numpy()[order])
+
+        matrix = values.to_numpy()[order]
+        self.log_mask = np.array([col in LOG_ATTRIBUTES for col in self.attributes])
+        matrix[:, self.log_mask] = np.log1p(matrix[:, self.log_mask])
+        # Raw values for filtering; `scaled` is what the ranking compares
+        self.values = np.asfortranarray(values.to_numpy()[order])
+        spread = matrix.std(axis=0)
+        self.spread = np.where(spread > 0, spread, 1.0)
+        self.scaled = np.asfortranarray(matrix / self.spread)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _candidates(self, filters):
+        """Positions of the records inside every filter window."""
+        lo, hi = 0, len(self)
+        if PRIMARY_ATTRIBUTE in filters:
+            low, high = filters[PRIMARY_ATTRIBUTE]
+            lo = np.searchsorted(self.primary, low, side="left")
+            hi = np.searchsorted(self.primary, high, side="right")
+        mask = np.ones(hi - lo, dtype=bool)
+        for col, (low, high) in filters.items():
+            if col == PRIMARY_ATTRIBUTE or col not in self.attributes:
+                continue
+            column = self.values[lo:hi, self.attributes.index(col)]
+            mask &= (column >= low) & (column <= high)
+        return lo + np.flatnonzero(mask)
+
+    def _query_vector(self, query):
+        vector = np.array([query.get(col, np.nan) for col in self.attributes], dtype=float)
+        vector[self.log_mask] = np.log1p(vector[self.log_mask])
+        return vector / self.spread
+
+    def search(self, query, k=DEFAULT_K, filters=None):
+        """
+        Top-`k` comparable sales for `query` (a dict or Series of raw attribute values),
+        most similar first, with distance and similarity columns.
+        Returns (comps DataFrame, filter windows actually applied).
+        """
+        with timed("comps_search", rows=1):
+            explicit = filters is not None
+            widen = 1.0
+            applied = filters if explicit else default_filters(query)
+            positions = self._candidates(applied)
+            while len(positions) < k and not explicit and applied:
+                if widen >= 2 ** MAX_WIDENINGS:
+                    applied = {}
+                else:
+                    widen *= 2
+                    applied = default_filters(query, widen)
+                positions = self._candidates(applied)
+
+            vector = self._query_vector(query)
+            distance = np.zeros(len(positions))
+            total_weight = 0.0
+            for j, weight in enumerate(self.weights):
+                if np.isnan(vector[j]):
+                    continue
+                diff = self.scaled[:, j].take(positions)
+                diff -= vector[j]
+                diff *= diff
+                diff *= weight
+                distance += diff
+                total_weight += weight
+            distance = np.sqrt(distance / total_weight)
+            if len(distance) > k:
+                top = np.argpartition(distance, k - 1)[:k]
+            else:
+                top = np.arange(len(distance))
+            top = top[np.argsort(distance[top], kind="stable")]
+
+            comps = self.records.iloc[positions[top]].copy()
+            comps[DISTANCE_COL] = distance[top]
+            comps[SIMILARITY_COL] = np.exp(-distance[top])
+            return comps, applied
+
+
+def comps_summary(comps, query):
+    """
+    Headline figures of a comps set: count, median sale price and the price implied
+    by the similarity-weighted price per square foot of living area.
+    """
+    if comps.empty:
+        return {"comps": 0, "median_price": None, "implied_price": None}
+    per_sqft = comps[PRICE_COL] / comps["GrLivArea"]
+    implied = None
+    if query.get("GrLivArea") is not None and not pd.isna(query.get("GrLivArea")):
+        implied = float(np.average(per_sqft, weights=comps[SIMILARITY_COL]) * query["GrLivArea"])
+    return {
+        "comps": len(comps),
+        "median_price": float(comps[PRICE_COL].median()),
+        "implied_price": implied,
+    }
+
+
+def get_comps_index(records_path=RECORDS_PATH):
+    """
+    Return the process-wide CompsIndex over `records_path`, rebuilt only when
+    the file changes.
+    """
+    global _index
+    key = (os.path.abspath(records_path), file_stamp(records_path))
+    with _index_lock:
+        if _index is not None and _index[0] == key:
+            return _index[1]
+    with timed("comps_index_build"):
+        index = CompsIndex(read_dataset(records_path))
+    with _index_lock:
+        _index = (key, index)
+    return index
+
+
+def benchmark(n_rows=500_000, n_queries=200, k=DEFAULT_K):
+    """Time building the index and searching it over `n_rows` synthetic records."""
+    records = read_dataset(RECORDS_PATH)
+    big = synthetic_records(records, n_rows, jitter=0.05)
+    start = time.perf_counter()
+    index = CompsIndex(big)
+    build = time.perf_counter() - start
+
+    queries = records.sample(n_queries, random_state=0)
+    samples = []
+    for _, query in queries.iterrows():
+        start = time.perf_counter()
+        index.search(query, k)
+        samples.append(time.perf_counter() - start)
+    samples = np.array(samples) * 1000
+    print(f"[INFO] Built comps index over {n_rows:,} records in {build:.2f}s")
+    print(f"[INFO] {n_queries} searches (k={k}): median {np.median(samples):.2f} ms, "
+          f"p95 {np.percentile(samples, 95):.2f} ms, max {samples.max():.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find comparable past sales for a property.")
+    for col in WEIGHTS:
+        parser.add_argument(f"--{col}", type=float, default=None)
+    parser.add_argument("-k", type=int, default=DEFAULT_K, help="Number of comps to return.")
+    parser.add_argument("--records", default=RECORDS_PATH)
+    parser.add_argument("--benchmark", type=int, default=0, metavar="ROWS",
+                        help="Time searches over this many synthetic records instead.")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark(args.benchmark, k=args.k)
+        return
+
+    query = {col: getattr(args, col) for col in WEIGHTS if getattr(args, col) is not None}
+    if not query:
+        parser.error("give at least one attribute, e.g. --GrLivArea 1500")
+    comps, filters = get_comps_index(args.records).search(query, args.k)
+    print(f"[INFO] Filters: {filters or 'none'}")
+    print(comps[list(WEIGHTS) + [PRICE_COL, SIMILARITY_COL]].round(3).to_string())
+    summary = comps_summary(comps, query)
+    if summary["implied_price"] is not None:
+        print(f"[INFO] Median comp price £{summary['median_price']:,.0f}; "
+              f"implied by price per sqft £{summary['implied_price']:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Heritage Housing – Correlation Service
+
+Purpose:
+Computes the Pearson correlation matrix used by the Feature Correlation page once per
+dataset version and shares it across reruns and sessions.
+
+A dataset version is the SHA-256 of the feature and target files actually read
+(their Parquet copies when available, see utils/data_io.py). Looking up a version
+only costs a few `os.stat` calls while the files are unchanged; the hash (and the
+matrix) is recomputed only when either file changes on disk, replacing the previous
+version's, so only the latest result per dataset is kept in memory.
+
+Custom heatmaps are slices of the full matrix (pairwise Pearson makes this identical
+to recomputing on the subset), and top-N rankings read from a precomputed index sorted
+by absolute correlation with LogSalePrice.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from utils.data_io import read_dataset, resolve_dataset
+from utils.model_registry import file_digest, file_stamp
+
+
+X_TEST_PATH = "data/processed/final/X_test.csv"
+Y_TEST_PATH = "data/processed/final/y_test.csv"
+TARGET_COL = "LogSalePrice"
+
+# Latest version and result per file pair only, so refreshed data replaces old entries
+_versions = {}
+_results = {}
+_lock = threading.Lock()
+
+
+class CorrelationResult:
+    """
+    Correlation matrix for one dataset version plus the ranking against the target.
+
+    Attributes:
+        version (str): Combined hash of the input files.
+        data (pd.DataFrame): Features with the LogSalePrice column added (read-only).
+        matrix (pd.DataFrame): Full Pearson correlation matrix.
+        target_ranking (pd.Series): Correlations with the target, excluding itself,
+            sorted by absolute value (descending).
+    """
+
+    def __init__(self, version, data, target_col=TARGET_COL):
+        self.version = version
+        self.data = data
+        self.matrix = data.corr()
+        ranking = self.matrix[target_col].drop(target_col)
+        order = np.argsort(-ranking.abs().to_numpy(), kind="stable")
+        self.target_ranking = ranking.iloc[order]
+
+    def top_correlated(self, n):
+        """Top `n` features by absolute correlation with the target."""
+        return self.target_ranking.iloc[:n]
+
+    def submatrix(self, features):
+        """Correlation matrix restricted to `features`, in the given order."""
+        return self.matrix.loc[features, features]
+
+
+def _dataset_version(paths):
+    key = tuple(os.path.abspath(p) for p in paths)
+    stamps = tuple(file_stamp(p) for p in paths)
+    cached = _versions.get(key)
+    if cached is None or cached[0] != stamps:
+        cached = _versions[key] = (stamps, "-".join(file_digest(p)[:16] for p in paths))
+    return cached[1]
+
+
+def _load_data(x_path, y_path):
+    df = read_dataset(x_path)
+    y = read_dataset(y_path)
+    df[TARGET_COL] = np.log1p(y.iloc[:, 0])
+    return df
+
+
+def get_correlation(x_path=X_TEST_PATH, y_path=Y_TEST_PATH):
+    """
+    Return the CorrelationResult for the current version of the dataset,
+    computing it only the first time that version is seen.
+    """
+    key = (os.path.abspath(x_path), os.path.abspath(y_path))
+    version = _dataset_version((resolve_dataset(x_path), resolve_dataset(y_path)))
+    result = _results.get(key)
+    if result is not None and result.version == version:
+        return result
+
+    with _lock:
+        result = _results.get(key)
+        if result is None or result.version != version:
+            print(f"[INFO] Computing correlation matrix for dataset {version}")
+            result = CorrelationResult(version, _load_data(x_path, y_path))
+            _results[key] = result
+        return result
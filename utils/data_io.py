@@ -0,0 +1,182 @@
+"""
+Heritage Housing – Columnar Dataset Storage
+
+Purpose:
+Stores the processed datasets under `data/processed/` as typed Parquet files alongside
+the CSVs, and gives every page and script one reader that prefers them.
+
+- One-hot columns (and any other True/False or 0/1 text columns) are stored as booleans
+- Readers can request a subset of columns; Parquet only decodes those columns
+- Each Parquet file records the SHA-256 of the CSV it was written from; if the CSV
+  has since changed (even by one digit), the copy is missing, or pyarrow is
+  unavailable, `read_dataset` falls back to the CSV so nothing breaks. The CSV's
+  digest is cached per process until its mtime or size changes
+
+Usage:
+    python -m utils.data_io          # (re)write Parquet copies of data/processed/**/*.csv
+"""
+
+import os
+import threading
+
+import pandas as pd
+
+from utils.instrumentation import timed, timed_iter
+from utils.model_registry import file_digest, file_stamp
+
+
+PROCESSED_DIR = "data/processed"
+COLUMNAR_EXT = ".parquet"
+
+SOURCE_DIGEST_KEY = b"heritage_source_csv_sha256"
+
+_digests = {}
+_digests_lock = threading.Lock()
+
+_TRUE_TEXT = ("True", "true", "1")
+_BOOL_TEXT = ("True", "False", "true", "false")
+
+
+def columnar_path(csv_path):
+    """Path of the Parquet copy for `csv_path`."""
+    return os.path.splitext(csv_path)[0] + COLUMNAR_EXT
+
+
+def _parquet_module():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    return pq
+
+
+def source_digest(csv_path):
+    """SHA-256 of `csv_path`, recomputed only when its mtime or size changes."""
+    abs_path = os.path.abspath(csv_path)
+    stamp = file_stamp(abs_path)
+    with _digests_lock:
+        cached = _digests.get(abs_path)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, file_digest(abs_path))
+        with _digests_lock:
+            _digests[abs_path] = cached
+    return cached[1]
+
+
+def resolve_dataset(csv_path):
+    """
+    Return the file `read_dataset` will read for `csv_path`: the Parquet copy
+    if it exists, matches the current CSV and can be read, otherwise the CSV.
+    """
+    parquet_path = columnar_path(csv_path)
+    pq = _parquet_module()
+    if pq is None or not os.path.exists(parquet_path):
+        return csv_path
+    if os.path.exists(csv_path):
+        metadata = pq.read_metadata(parquet_path).metadata or {}
+        if metadata.get(SOURCE_DIGEST_KEY) != source_digest(csv_path).encode():
+            return csv_path
+    return parquet_path
+
+
+def typed_frame(df):
+    """
+    Convert text columns holding only True/False (or a mix with 0/1) to bool.
+    Numeric 0/1 columns such as HasPorch keep their integer dtype.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]) or pd.api.types.is_bool_dtype(df[col]):
+            continue
+        values = df[col].dropna()
+        if values.empty:
+            continue
+        text = values.astype(str)
+        if text.isin(_BOOL_TEXT + ("0", "1")).all() and text.isin(_BOOL_TEXT).any():
+            flags = df[col].map(lambda v: str(v) in _TRUE_TEXT, na_action="ignore")
+            df[col] = flags.astype("boolean" if flags.isna().any() else bool)
+    return df
+
+
+def write_columnar(df, csv_path):
+    """
+    Write `df` as the typed Parquet copy of `csv_path`, tagged with the
+    CSV's content digest so stale copies are detected.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(typed_frame(df), preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SOURCE_DIGEST_KEY] = source_digest(csv_path).encode()
+    path = columnar_path(csv_path)
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+    return path
+
+
+def read_dataset(csv_path, columns=None):
+    """
+    Read a processed dataset, loading only `columns` if given.
+    Uses the Parquet copy when available, otherwise parses the CSV.
+    """
+    path = resolve_dataset(csv_path)
+    if path.endswith(COLUMNAR_EXT):
+        with timed("parquet_read"):
+            return pd.read_parquet(path, columns=columns)
+    with timed("csv_read"):
+        return pd.read_csv(path, usecols=columns)
+
+
+def read_columns(csv_path):
+    """Column names of a processed dataset without loading any rows."""
+    path = resolve_dataset(csv_path)
+    if path.endswith(COLUMNAR_EXT):
+        return _parquet_module().read_schema(path).names
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def count_rows(csv_path):
+    """Number of data rows in a processed dataset, without parsing it."""
+    path = resolve_dataset(csv_path)
+    if path.endswith(COLUMNAR_EXT):
+        return _parquet_module().read_metadata(path).num_rows
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    # The header is not a row; a final row without a trailing newline still is
+    return lines - 1 + (last != b"\n")
+
+
+def iter_dataset(csv_path, chunksize, columns=None):
+    """
+    Yield a processed dataset as DataFrames of at most `chunksize` rows,
+    so arbitrarily large files can be processed in bounded memory.
+    """
+    path = resolve_dataset(csv_path)
+    if path.endswith(COLUMNAR_EXT):
+        parquet_file = _parquet_module().ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from timed_iter("csv_read", pd.read_csv(path, usecols=columns, chunksize=chunksize))
+
+
+def convert_processed(root=PROCESSED_DIR):
+    """Write a Parquet copy next to every CSV under `root`."""
+    written = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            if not name.endswith(".csv"):
+                continue
+            csv_path = os.path.join(dirpath, name)
+            path = write_columnar(pd.read_csv(csv_path), csv_path)
+            print(f"[SAVED] {csv_path} -> {path}")
+            written.append(path)
+    return written
+
+
+if __name__ == "__main__":
+    convert_processed()
@@ -1,34 +1,178 @@
 import pandas as pd
 import numpy as np
-import joblib
 import os
+import time
 
+from utils.feature_engineering import load_feature_engineer
+from utils.instrumentation import is_active, timed, timed_iter
+from utils.intervals import (DEFAULT_COVERAGE, LOWER_COL, UPPER_COL, add_intervals,
+                             get_interval_model)
+from utils.model_registry import get_model, model_version
+from utils.neighbours import (COMPARABLES_COL, DISTANCE_COL, PERCENTILE_COL, add_neighbours,
+                              get_neighbour_index)
+from utils.prediction_cache import BATCH, get_prediction_cache
+from utils.profiling import profile_run
+from utils.validation import BatchValidation, side_paths
 
-def predict_from_raw(raw_df, model_path, save_output_path=None):
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def _check_input_columns(model_pipeline, columns):
+    """
+    Raise if any feature the pipeline's preprocessor expects is missing.
+    """
+    expected_features = model_pipeline.named_steps["preprocessor"].transformers_[0][2]
+    missing = [col for col in expected_features if col not in columns]
+    if missing:
+        raise ValueError(f"[ERROR] Missing expected input features: {missing}")
+
+
+class _StagedPipeline:
+    """
+    Stands in for a pipeline's `predict` while stages are being recorded, timing
+    the preprocessor and the final model as separate stages. The steps run
+    exactly as in `Pipeline.predict`, so predictions are unchanged.
+    """
+
+    __slots__ = ("pipeline",)
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def predict(self, features):
+        X = features
+        with timed("preprocess", rows=len(features)):
+            for _, step in self.pipeline.steps[:-1]:
+                if step is not None and step != "passthrough":
+                    X = step.transform(X)
+        with timed("model_predict", rows=len(features)):
+            return self.pipeline.steps[-1][1].predict(X)
+
+
+def _predict_raw(model_pipeline, feature_engineer, raw_df, cache=None, version=None):
+    """
+    Engineer features for raw property rows and return log-price predictions.
+    With a PredictionCache, repeated rows are served from it; `version` is the
+    model's content hash.
+    """
+    features = feature_engineer.transform(raw_df)
+    with timed("column_check"):
+        _check_input_columns(model_pipeline, features.columns)
+    if is_active():
+        model_pipeline = _StagedPipeline(model_pipeline)
+    with timed("predict", rows=len(features)):
+        if cache is not None:
+            return cache.predict(model_pipeline, features, version)
+        return model_pipeline.predict(features)
+
+
+def _predict_raw_intervals(interval_model, feature_engineer, raw_df):
+    """
+    Log-price predictions with calibrated interval bounds, from one pass over
+    the forest's trees. Returns (predictions, lower, upper).
+    """
+    features = feature_engineer.transform(raw_df)
+    missing = [col for col in interval_model.feature_names if col not in features.columns]
+    if missing:
+        raise ValueError(f"[ERROR] Missing expected input features: {missing}")
+    with timed("predict", rows=len(features)):
+        return interval_model.predict(features)
+
+
+def _add_predictions(df, predictions):
+    """
+    Append log-scale and price-scale predictions to `df` in place.
+    """
+    df["Predicted_LogSalePrice"] = predictions
+    df["Predicted_SalePrice"] = np.expm1(predictions)
+    return df
+
+
+def _empty_output(columns, intervals=False, neighbours=False):
+    """
+    An empty frame with the columns a scored chunk of `columns` would have, so
+    an output with no scored rows still gets its header.
     """
-    Run prediction using saved pipeline that includes preprocessing.
+    added = ["Predicted_LogSalePrice", "Predicted_SalePrice"]
+    if intervals:
+        added += [LOWER_COL, UPPER_COL]
+    if neighbours:
+        added += [DISTANCE_COL, PERCENTILE_COL, COMPARABLES_COL]
+    return pd.DataFrame(columns=list(columns) + added)
+
+
+def _add_neighbour_columns(df, index, feature_engineer):
     """
+    Append the out-of-distribution score and comparable training sales to `df`
+    in place, from the same engineered features the model saw.
+    """
+    return add_neighbours(df, index, feature_engineer.transform(df))
+
+
+def _start_validation(save_output_path, reject_path, drift_path):
+    default_rejects, default_drift = side_paths(save_output_path) if save_output_path else (None, None)
+    return BatchValidation(reject_path=reject_path or default_rejects), drift_path or default_drift
+
+
+def predict_from_raw(raw_df, model_path, save_output_path=None, feature_engineer=None,
+                     intervals=False, coverage=DEFAULT_COVERAGE, profile=None,
+                     validate=False, reject_path=None, drift_path=None, neighbours=False):
+    """
+    Run prediction on raw property data using saved pipeline that includes preprocessing.
+    Raw rows go through the fitted FeatureEngineer first, so the pipeline always
+    receives the training column layout.
+    The pipeline is served by the shared model registry, so repeated calls
+    in the same process do not unpickle it again, and rows seen before (or
+    repeated within `raw_df`) are answered from the shared batch prediction cache.
+    With `intervals=True`, predictions and `coverage` price intervals come from
+    the per-tree pass in utils/intervals.py instead (the cache is not used).
+    With `profile=True` (or a report path), the call is profiled stage by stage
+    and the report saved to outputs/metrics (see utils/profiling.py).
+    With `validate=True`, rows failing the schema checks in utils/validation.py are
+    left out of the result and written to `reject_path` with their reasons, and
+    input drift is reported (defaults: `<output>_rejects.csv`, `<output>_drift.csv`).
+    With `neighbours=True`, each row gets its distance to the nearest training sales,
+    that distance's percentile among the training sales and the comparable records
+    (see utils/neighbours.py).
+    """
+    if profile:
+        with profile_run(None if profile is True else profile, label="predict_from_raw"):
+            return predict_from_raw(raw_df, model_path, save_output_path, feature_engineer,
+                                    intervals, coverage, None, validate, reject_path, drift_path,
+                                    neighbours)
     try:
-        print("[INFO] Loading model pipeline...")
-        model_pipeline = joblib.load(model_path)
+        model_pipeline = get_model(model_path)
+        if feature_engineer is None:
+            feature_engineer = load_feature_engineer()
 
-        # Optional: validate input columns before prediction
-        expected_features = model_pipeline.named_steps["preprocessor"].transformers_[0][2]
-        missing = [col for col in expected_features if col not in raw_df.columns]
-        if missing:
-            raise ValueError(f"[ERROR] Missing expected input features: {missing}")
+        if validate:
+            validation, drift_path = _start_validation(save_output_path, reject_path, drift_path)
+            raw_df = validation.check(raw_df)
+            validation.print_summary(drift_path)
+            if len(raw_df) == 0:
+                print("[WARNING] No valid rows to score.")
+                return _add_predictions(raw_df.copy(), np.empty(0))
 
         print("[INFO] Generating predictions...")
-        predictions = model_pipeline.predict(raw_df)
+        if intervals:
+            predictions, lower, upper = _predict_raw_intervals(
+                get_interval_model(model_path, coverage), feature_engineer, raw_df)
+        else:
+            predictions = _predict_raw(model_pipeline, feature_engineer, raw_df,
+                                       get_prediction_cache(BATCH), model_version(model_path))
 
         # Combine predictions with original data
-        raw_df = raw_df.copy()
-        raw_df["Predicted_LogSalePrice"] = predictions
-        raw_df["Predicted_SalePrice"] = np.expm1(predictions)
+        raw_df = _add_predictions(raw_df.copy(), predictions)
+        if intervals:
+            add_intervals(raw_df, lower, upper)
+        if neighbours:
+            _add_neighbour_columns(raw_df, get_neighbour_index(model_path), feature_engineer)
 
         if save_output_path:
             os.makedirs(os.path.dirname(save_output_path), exist_ok=True)
-            raw_df.to_csv(save_output_path, index=False)
+            with timed("csv_write", rows=len(raw_df)):
+                raw_df.to_csv(save_output_path, index=False)
             print(f"[INFO] Predictions saved to: {save_output_path}")
 
         return raw_df
@@ -36,3 +180,106 @@ def predict_from_raw(raw_df, model_path, save_output_path=None):
     except Exception as e:
         print(f"[ERROR] Prediction pipeline failed: {e}")
         return None
+
+
+def predict_csv_in_chunks(input_path, model_path, save_output_path,
+                          chunksize=DEFAULT_CHUNKSIZE, feature_engineer=None, progress=None,
+                          intervals=False, coverage=DEFAULT_COVERAGE,
+                          validate=False, reject_path=None, drift_path=None, neighbours=False,
+                          raise_errors=False):
+    """
+    Stream a raw CSV through the saved pipeline `chunksize` rows at a time.
+
+    Each chunk is feature-engineered, validated, predicted and appended to the
+    output file, so peak memory is bounded by the chunk size rather than the
+    file size. Repeated rows are served from the shared batch prediction cache.
+    Output is written to a temporary `.part` file and moved into place once
+    the whole input has been scored.
+    If given, `progress(rows_read)` is called after every chunk.
+    With `intervals=True`, price interval columns are added as in `predict_from_raw`.
+    With `validate=True`, each chunk is validated first as in `predict_from_raw`;
+    rejected rows go to the reject file and drift is reported for the whole file.
+    With `neighbours=True`, out-of-distribution columns are added as in `predict_from_raw`.
+
+    Returns a summary dict (rows, chunks, seconds, rows_per_second, plus
+    rejected with validation), or None. `rows` counts the rows written, so it
+    excludes rejects; if every row is rejected the output is just the header.
+    Returns None if the run failed. With `raise_errors=True`
+    the failure is re-raised instead (after the partial output is removed), so
+    callers such as background jobs can report the real exception.
+    """
+    part_path = f"{save_output_path}.part"
+    try:
+        model_pipeline = get_model(model_path)
+        version = model_version(model_path)
+        cache = get_prediction_cache(BATCH)
+        interval_model = get_interval_model(model_path, coverage) if intervals else None
+        neighbour_index = get_neighbour_index(model_path) if neighbours else None
+        if feature_engineer is None:
+            feature_engineer = load_feature_engineer()
+        os.makedirs(os.path.dirname(save_output_path) or ".", exist_ok=True)
+        validation = None
+        if validate:
+            validation, drift_path = _start_validation(save_output_path, reject_path, drift_path)
+
+        total_rows = 0
+        rows_read = 0
+        n_chunks = 0
+        columns = None
+        header = True
+        start = time.perf_counter()
+
+        with open(part_path, "w", newline="") as out:
+            for chunk in timed_iter("csv_read", pd.read_csv(input_path, chunksize=chunksize)):
+                rows_read += len(chunk)
+                columns = chunk.columns
+                if validation is not None:
+                    chunk = validation.check(chunk)
+                if len(chunk):
+                    if intervals:
+                        predictions, lower, upper = _predict_raw_intervals(
+                            interval_model, feature_engineer, chunk)
+                        add_intervals(_add_predictions(chunk, predictions), lower, upper)
+                    else:
+                        predictions = _predict_raw(model_pipeline, feature_engineer, chunk, cache, version)
+                        _add_predictions(chunk, predictions)
+                    if neighbour_index is not None:
+                        _add_neighbour_columns(chunk, neighbour_index, feature_engineer)
+                    with timed("csv_write", rows=len(chunk)):
+                        chunk.to_csv(out, header=header, index=False)
+                    header = False
+                    total_rows += len(chunk)
+
+                n_chunks += 1
+                elapsed = time.perf_counter() - start
+                rejected = f", {rows_read - total_rows:,} rejected" if validation is not None else ""
+                print(f"[INFO] Chunk {n_chunks}: {total_rows:,} rows scored{rejected} "
+                      f"({rows_read / elapsed:,.0f} rows/s)")
+                if progress is not None:
+                    progress(rows_read)
+            if header and columns is not None:
+                _empty_output(columns, intervals, neighbour_index is not None).to_csv(out, index=False)
+
+        os.replace(part_path, save_output_path)
+        elapsed = time.perf_counter() - start
+        summary = {
+            "rows": total_rows,
+            "chunks": n_chunks,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(total_rows / elapsed, 1) if elapsed else 0.0,
+        }
+        if validation is not None:
+            summary["rejected"] = validation.rejected
+            validation.print_summary(drift_path)
+        print(f"[INFO] Predictions saved to: {save_output_path}")
+        print(f"[INFO] Scored {total_rows:,} rows in {elapsed:.2f}s "
+              f"({summary['rows_per_second']:,.0f} rows/s)")
+        return summary
+
+    except Exception as e:
+        print(f"[ERROR] Streaming prediction failed: {e}")
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        if raise_errors:
+            raise
+        return None
@@ -0,0 +1,425 @@
+"""
+Heritage Housing – Prediction Explanations
+
+Purpose:
+Explains individual price predictions ("why this price") as additive per-feature
+contributions in log sale price, so that
+
+    base value + sum(contributions) = predicted log sale price
+
+Two methods share one interface:
+- "tree_shap":  exact path-dependent TreeSHAP via the optional `shap` package
+               (as used offline in 05_Model_Training_and_Evaluation)
+- "saabas":    fast approximation computed on the flat tree engine (utils/tree_engine.py):
+               along each tree's decision path, the change in node value at every split
+               is credited to the split feature. Used when `shap` is not installed or the
+               served model is already a flat (compressed) forest. Attributions stay
+               exactly additive, and a single row takes about 2 ms (the deployment
+               imputer + scaler is applied as plain arrays rather than through the
+               ColumnTransformer).
+
+Explainer state (the flattened forest or shap's tree structures) is built once per model
+version and shared by every caller; recent single-row explanations are also kept, keyed
+like the prediction cache. Batch mode explains a whole raw CSV in parallel chunks and
+writes per-row contributions plus a mean |contribution| summary next to the predictions
+in `outputs/predictions/`, both named after the method (`<input>_saabas.csv` with
+`Saabas_<feature>` columns, or `<input>_tree_shap.csv` with `SHAP_<feature>` columns).
+With `--matrix train` it explains the training data instead (the global importance
+summary): the rows come from the memory-mapped feature matrix (utils/feature_matrix.py),
+which every worker opens itself and reads by row range, so no rows are pickled between
+processes. The matrix must be in the model's input layout (the split published by
+train_pipeline.py); a run stops if the model cannot predict its targets.
+
+Usage:
+    python -m utils.explain --input data/raw/inherited_houses.csv --workers 2
+    python -m utils.explain --matrix train --workers 2
+"""
+
+import argparse
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import r2_score
+
+from utils.deployment_pipeline import DEFAULT_CHUNKSIZE
+from utils.feature_engineering import load_feature_engineer
+from utils.feature_matrix import FINAL_DIR, load_feature_matrix
+from utils.model_registry import FINAL_PIPELINE_PATH, get_model, model_version
+from utils.prediction_cache import row_keys
+from utils.tree_engine import BLOCK_ROWS, FlatForest, final_estimator
+
+
+PREDICTIONS_DIR = "outputs/predictions"
+ROW_CACHE_SIZE = 1024
+# Matrix layout check before `--matrix` runs: rows scored and the smallest acceptable R²
+LAYOUT_CHECK_ROWS = 5_000
+MIN_LAYOUT_R2 = 0.5
+BASE_COL = "Base_LogSalePrice"
+# Output naming per method: contribution columns are `<label>_<feature>`
+METHOD_LABELS = {"tree_shap": "SHAP", "saabas": "Saabas"}
+
+_explainers = {}
+_explainers_lock = threading.Lock()
+
+
+def _shap_module():
+    try:
+        import shap
+    except ImportError:
+        return None
+    return shap
+
+
+def _tree_weight(forest):
+    return forest.scale if forest.kind == "additive" else 1.0 / forest.n_trees
+
+
+def saabas_base_value(forest):
+    """Prediction before any split: the weighted sum of the root values."""
+    base = _tree_weight(forest) * forest.node_values(forest.roots).sum()
+    return float(base + (forest.init_value if forest.kind == "additive" else 0.0))
+
+
+def saabas_contributions(forest, X):
+    """
+    Per-feature path contributions of a FlatForest for rows `X` (already
+    preprocessed), shape (n_rows, n_features).
+    """
+    X = forest._as_input(X)
+    n_rows, n_features = X.shape
+    values = forest.node_values()
+    is_leaf = forest.is_leaf
+    children = forest.children.ravel()
+
+    contributions = np.zeros(n_rows * n_features)
+    for start in range(0, n_rows, BLOCK_ROWS):
+        block = X[start:start + BLOCK_ROWS].ravel()
+        block_rows = len(block) // n_features
+        nodes = np.tile(forest.roots, block_rows)
+        row_offset = np.repeat(np.arange(block_rows) * n_features, forest.n_trees)
+        active = np.flatnonzero(~is_leaf[nodes])
+        while active.size:
+            current = nodes[active]
+            split_feature = forest.feature[current]
+            slot = row_offset[active] + split_feature
+            nxt = children[2 * current + (block[slot] > forest.threshold[current])]
+            np.add.at(contributions, start * n_features + slot, values[nxt] - values[current])
+            nodes[active] = nxt
+            active = active[~is_leaf[nxt]]
+    return _tree_weight(forest) * contributions.reshape(n_rows, n_features)
+
+
+def _array_preprocessing(preprocessor):
+    """
+    (fill, mean, scale) arrays equivalent to the deployment preprocessor
+    (median imputer + standard scaler over one column block), or None if the
+    preprocessor has another shape. Lets single rows skip the ColumnTransformer.
+    """
+    transformers = [t for t in preprocessor.transformers_ if t[0] != "remainder"]
+    if len(transformers) != 1 or preprocessor.remainder != "drop":
+        return None
+    steps = getattr(transformers[0][1], "named_steps", {})
+    imputer, scaler = steps.get("imputer"), steps.get("scaler")
+    if imputer is None or scaler is None or len(steps) != 2 or \
+            getattr(imputer, "indicator_", None) is not None:
+        return None
+    mean = scaler.mean_ if scaler.with_mean else np.zeros_like(imputer.statistics_)
+    scale = scaler.scale_ if scaler.with_std else np.ones_like(imputer.statistics_)
+    return imputer.statistics_, mean, scale
+
+
+def resolve_method(estimator, method=None):
+    """
+    `method`, or the default for `estimator`: tree_shap when `shap` is installed and
+    the model is a scikit-learn ensemble, otherwise saabas.
+    """
+    if method is None:
+        if _shap_module() is not None and not isinstance(estimator, FlatForest):
+            return "tree_shap"
+        return "saabas"
+    return method
+
+
+def contribution_prefix(method):
+    """Column prefix of `method`'s contributions, e.g. "SHAP_" or "Saabas_"."""
+    return f"{METHOD_LABELS.get(method, method)}_"
+
+
+class PredictionExplainer:
+    """
+    Additive explanations for a fitted preprocessing + tree-ensemble pipeline.
+
+    Parameters:
+        pipeline: Fitted pipeline (as served by the model registry).
+        method (str or None): "tree_shap" or "saabas"; None picks tree_shap when
+            `shap` is installed and the model is a scikit-learn ensemble.
+        row_cache_size (int): Single-row explanations kept for repeat requests.
+    """
+
+    def __init__(self, pipeline, method=None, row_cache_size=ROW_CACHE_SIZE):
+        preprocessor = pipeline.named_steps["preprocessor"]
+        self.preprocessor = pipeline[:-1]
+        self.feature_names = list(preprocessor.transformers_[0][2])
+        self._arrays = _array_preprocessing(preprocessor) if len(pipeline.steps) == 2 else None
+        estimator = final_estimator(pipeline)
+
+        shap = _shap_module()
+        method = resolve_method(estimator, method)
+        if method == "tree_shap":
+            if shap is None:
+                raise ImportError("[ERROR] method='tree_shap' needs the `shap` package.")
+            self._shap = shap.TreeExplainer(estimator)
+            self.base_value = float(np.ravel(self._shap.expected_value)[0])
+        elif method == "saabas":
+            self._forest = (estimator if isinstance(estimator, FlatForest)
+                            else FlatForest.from_estimator(estimator))
+            self.base_value = saabas_base_value(self._forest)
+        else:
+            raise ValueError(f"[ERROR] Unknown explanation method: {method}")
+        self.method = method
+        self.row_cache_size = row_cache_size
+        self._rows = OrderedDict()
+        self._rows_lock = threading.Lock()
+
+    def _transform(self, features):
+        missing = [col for col in self.feature_names if col not in features.columns]
+        if missing:
+            raise ValueError(f"[ERROR] Missing expected input features: {missing}")
+        if self._arrays is None:
+            return self.preprocessor.transform(features)
+        fill, mean, scale = self._arrays
+        X = features[self.feature_names].to_numpy(dtype=np.float64)
+        X = np.where(np.isnan(X), fill, X)
+        return (X - mean) / scale
+
+    def contributions(self, features):
+        """
+        Contributions for engineered feature rows. Returns a DataFrame with one
+        column per model feature, indexed like `features`.
+        """
+        X = np.asarray(self._transform(features), dtype=np.float64)
+        if self.method == "tree_shap":
+            values = np.asarray(self._shap.shap_values(X, check_additivity=False))
+        else:
+            values = saabas_contributions(self._forest, X)
+        return pd.DataFrame(values, index=features.index, columns=self.feature_names)
+
+    def explain_row(self, features):
+        """
+        Contributions for a single engineered row as a Series sorted by absolute
+        size; recent rows are answered from memory.
+        """
+        key = row_keys(features)[0]
+        with self._rows_lock:
+            cached = self._rows.get(key)
+            if cached is not None:
+                self._rows.move_to_end(key)
+                return cached
+        row = self.contributions(features.iloc[[0]]).iloc[0]
+        row = row.reindex(row.abs().sort_values(ascending=False).index)
+        with self._rows_lock:
+            self._rows[key] = row
+            while len(self._rows) > self.row_cache_size:
+                self._rows.popitem(last=False)
+        return row
+
+
+def get_explainer(model_path=FINAL_PIPELINE_PATH, method=None):
+    """
+    Return the process-wide explainer for the model currently at `model_path`.
+    It is built on first use and rebuilt only when the model version changes.
+    """
+    version = model_version(model_path)
+    cache_key = (os.path.abspath(model_path), method)
+    with _explainers_lock:
+        entry = _explainers.get(cache_key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+    start = time.perf_counter()
+    explainer = PredictionExplainer(get_model(model_path), method)
+    print(f"[INFO] Built {explainer.method} explainer for {model_path} "
+          f"in {time.perf_counter() - start:.2f}s")
+    with _explainers_lock:
+        _explainers[cache_key] = (version, explainer)
+    return explainer
+
+
+def explain_features(explainer, features):
+    """Base value, per-feature contributions and their sum for engineered rows."""
+    contributions = explainer.contributions(features)
+    out = contributions.add_prefix(contribution_prefix(explainer.method))
+    out.insert(0, BASE_COL, explainer.base_value)
+    out.insert(1, "Predicted_LogSalePrice", explainer.base_value + contributions.sum(axis=1))
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Batch mode
+# ---------------------------------------------------------------------------
+
+_worker_explainer = None
+_worker_engineer = None
+_worker_matrix = None
+
+
+def _init_worker(model_path, method, feature_engineer):
+    global _worker_explainer, _worker_engineer
+    _worker_explainer = get_explainer(model_path, method)
+    _worker_engineer = feature_engineer
+
+
+def _explain_shard(shard):
+    features = _worker_engineer.transform(shard)
+    return explain_features(_worker_explainer, features)
+
+
+def _init_matrix_worker(model_path, method, name, data_dir):
+    global _worker_explainer, _worker_matrix
+    _worker_explainer = get_explainer(model_path, method)
+    X, _, columns = load_feature_matrix(name, data_dir, refresh=False)
+    _worker_matrix = (X, columns)
+
+
+def _explain_rows(bounds):
+    start, stop = bounds
+    X, columns = _worker_matrix
+    features = pd.DataFrame(X[start:stop], columns=columns, index=pd.RangeIndex(start, stop))
+    return explain_features(_worker_explainer, features)
+
+
+def explanation_paths(input_path, method, output_dir=PREDICTIONS_DIR):
+    """Per-row and summary CSV paths for explaining `input_path` with `method`."""
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    return (os.path.join(output_dir, f"{stem}_{method}.csv"),
+            os.path.join(output_dir, f"{stem}_{method}_summary.csv"))
+
+
+def explain_csv(input_path, model_path=FINAL_PIPELINE_PATH, output_dir=PREDICTIONS_DIR,
+                workers=1, chunksize=DEFAULT_CHUNKSIZE, method=None):
+    """
+    Explain every row of raw CSV `input_path` in chunks of `chunksize` rows,
+    spread over `workers` processes, writing results in input order.
+    Returns (per-row path, summary path).
+    """
+    method = resolve_method(final_estimator(get_model(model_path)), method)
+    return _explain_batches(
+        explanation_paths(input_path, method, output_dir), method,
+        pd.read_csv(input_path, chunksize=chunksize), _explain_shard,
+        _init_worker, (model_path, method, load_feature_engineer()), workers)
+
+
+def explain_matrix(name="train", model_path=FINAL_PIPELINE_PATH, output_dir=PREDICTIONS_DIR,
+                   workers=1, chunksize=DEFAULT_CHUNKSIZE, method=None, data_dir=FINAL_DIR):
+    """
+    Explain every row of the engineered X_<name> matrix (e.g. the training data)
+    in row ranges of `chunksize`, spread over `workers` processes that each open
+    the shared memory-mapped matrix. Returns (per-row path, summary path).
+    Raises ValueError if the matrix is not in the model's input layout.
+    """
+    method = resolve_method(final_estimator(get_model(model_path)), method)
+    X, y, columns = load_feature_matrix(name, data_dir)
+    check_matrix_layout(get_model(model_path), X, y, columns)
+    ranges = [(start, min(start + chunksize, len(X))) for start in range(0, len(X), chunksize)]
+    return _explain_batches(
+        explanation_paths(f"X_{name}", method, output_dir), method, ranges,
+        _explain_rows, _init_matrix_worker, (model_path, method, name, data_dir), workers)
+
+
+def check_matrix_layout(pipeline, X, y, columns, sample_rows=LAYOUT_CHECK_ROWS):
+    """
+    Raise ValueError unless the model predicts the matrix's own targets (R² of at
+    least MIN_LAYOUT_R2 on its first `sample_rows` rows). The column names alone
+    cannot tell the notebook's pre-scaled X_train from FeatureEngineer output, and
+    explaining data in the wrong layout gives a meaningless importance summary.
+    """
+    n = min(len(X), sample_rows)
+    features = pd.DataFrame(X[:n], columns=columns)
+    r2 = r2_score(y[:n], pipeline.predict(features))
+    if r2 < MIN_LAYOUT_R2:
+        raise ValueError(
+            f"[ERROR] The model scores R² {r2:.2f} on this matrix, so it is not in the model's "
+            "input layout; rerun train_pipeline.py to publish the model's own split.")
+
+
+def _explain_batches(paths, method, tasks, explain_task, initializer, initargs, workers):
+    """
+    Run `explain_task` over `tasks` (in `workers` processes set up by `initializer`)
+    and write the per-row `method` explanations and their summary to `paths` in task order.
+    """
+    output_path, summary_path = paths
+    prefix = contribution_prefix(method)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    part_path = f"{output_path}.part"
+    abs_sum, n_rows = None, 0
+    start = time.perf_counter()
+
+    def write(out, shard_out):
+        nonlocal abs_sum, n_rows
+        shard_out.to_csv(out, header=(n_rows == 0), index=False)
+        contributions = shard_out.filter(like=prefix).abs().sum()
+        abs_sum = contributions if abs_sum is None else abs_sum + contributions
+        n_rows += len(shard_out)
+        print(f"[INFO] Explained {n_rows:,} rows "
+              f"({n_rows / (time.perf_counter() - start):,.0f} rows/s)")
+
+    try:
+        with open(part_path, "w", newline="") as out:
+            if workers > 1:
+                # At most two chunks per worker in flight, written back in input order
+                pending = deque()
+                with ProcessPoolExecutor(max_workers=workers, initializer=initializer,
+                                         initargs=initargs) as pool:
+                    for task in tasks:
+                        pending.append(pool.submit(explain_task, task))
+                        if len(pending) >= 2 * workers:
+                            write(out, pending.popleft().result())
+                    while pending:
+                        write(out, pending.popleft().result())
+            else:
+                initializer(*initargs)
+                for task in tasks:
+                    write(out, explain_task(task))
+        os.replace(part_path, output_path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+    summary = (abs_sum / max(n_rows, 1)).rename(f"Mean {METHOD_LABELS.get(method, method)} Value")
+    summary.index = summary.index.str.removeprefix(prefix)
+    summary.rename_axis("Feature").sort_values(ascending=False).reset_index().to_csv(
+        summary_path, index=False)
+    print(f"[SAVED] Explanations saved to: {output_path}")
+    print(f"[SAVED] Mean absolute contributions saved to: {summary_path}")
+    return output_path, summary_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Explain predictions for a raw property CSV.")
+    parser.add_argument("--input", default="data/raw/inherited_houses.csv")
+    parser.add_argument("--matrix", choices=["train", "test"], default=None,
+                        help="Explain the engineered X_train / X_test matrix instead of --input.")
+    parser.add_argument("--model", default=FINAL_PIPELINE_PATH)
+    parser.add_argument("--output-dir", default=PREDICTIONS_DIR)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--method", choices=["tree_shap", "saabas"], default=None,
+                        help="Default: tree_shap if `shap` is installed, else saabas.")
+    args = parser.parse_args(argv)
+    try:
+        if args.matrix:
+            explain_matrix(args.matrix, args.model, args.output_dir, args.workers, args.chunksize, args.method)
+        else:
+            explain_csv(args.input, args.model, args.output_dir, args.workers, args.chunksize, args.method)
+    except ValueError as e:
+        print(e)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
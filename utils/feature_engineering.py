@@ -0,0 +1,201 @@
+"""
+Heritage Housing – Feature Engineering Transformer
+
+Purpose:
+Turns raw property records (as found in `house_prices_records.csv`, `inherited_houses.csv`
+or the dashboard form) into the exact column layout the model was trained on.
+
+The transformer is fitted once, either on the cleaned training data or directly from
+the saved feature schema (see utils/schema.py), learning the category levels used for
+one-hot encoding, and then applies the same steps to any number of rows:
+- Engineered features: HouseAge, LivingLotRatio, FinishedBsmtRatio, OverallScore, HasPorch
+- One-hot encoding with the first (alphabetical) level dropped, as in training
+- Column alignment to the training layout, with unseen levels encoded as all zeros
+
+All steps are column-wise NumPy operations, so a single form submission and a
+million-row batch follow the same code path.
+"""
+
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from utils.data_io import read_columns, read_dataset
+from utils.instrumentation import timed
+from utils.schema import (
+    CATEGORICAL_COLS,
+    CLEANED_DATA_PATH,
+    REFERENCE_YEAR,
+    SCHEMA_PATH,
+    TARGET_COL,
+    X_TRAIN_PATH,
+    feature_names as schema_feature_names,
+    load_feature_schema,
+)
+
+
+ENGINEERED_FEATURES = [
+    "HouseAge", "LivingLotRatio", "FinishedBsmtRatio", "OverallScore", "HasPorch"]
+ENGINEERING_INPUTS = [
+    "YearBuilt", "GrLivArea", "LotArea", "BsmtFinSF1", "TotalBsmtSF",
+    "OverallQual", "OverallCond", "OpenPorchSF"]
+
+
+def _as_float(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+class FeatureEngineer(BaseEstimator, TransformerMixin):
+    """
+    Fitted, picklable replacement for the hand-rolled feature engineering
+    previously duplicated in the prediction page and notebooks.
+
+    Parameters:
+        feature_names (list or None): Training column layout to produce.
+            If None, the layout is numeric inputs + engineered features + dummies.
+        reference_year (int or None): Year used for HouseAge. Defaults to
+            REFERENCE_YEAR so inference matches the training features.
+        categorical_cols (list): Raw categorical columns to one-hot encode.
+    """
+
+    def __init__(self, feature_names=None, reference_year=None,
+                 categorical_cols=CATEGORICAL_COLS):
+        self.feature_names = feature_names
+        self.reference_year = reference_year
+        self.categorical_cols = categorical_cols
+
+    def fit(self, X, y=None):
+        """
+        Learn category levels from raw training data `X`.
+        """
+        levels = {
+            col: sorted(pd.Series(X[col]).dropna().astype(str).unique())
+            for col in self.categorical_cols
+        }
+        excluded = set(self.categorical_cols) | {TARGET_COL}
+        numeric_inputs = [
+            col for col in X.columns
+            if col not in excluded and pd.api.types.is_numeric_dtype(X[col])
+        ]
+        return self._fit_levels(levels, numeric_inputs)
+
+    @classmethod
+    def from_schema(cls, schema):
+        """
+        Build a fitted FeatureEngineer from a feature schema dict, without
+        reading any training data.
+        """
+        engineer = cls(
+            feature_names=schema_feature_names(schema),
+            reference_year=schema["reference_year"],
+            categorical_cols=list(schema["categories"]),
+        )
+        return engineer._fit_levels(schema["categories"], list(schema["raw_inputs"]))
+
+    def _fit_levels(self, levels, numeric_inputs):
+        self.reference_year_ = int(self.reference_year or REFERENCE_YEAR)
+
+        # Sorted levels with the first dropped mirrors get_dummies(drop_first=True)
+        self.categories_ = {
+            col: list(levels[col])[1:] for col in self.categorical_cols
+        }
+        self.numeric_inputs_ = list(numeric_inputs)
+        dummies = [
+            f"{col}_{level}"
+            for col, levels in self.categories_.items() for level in levels
+        ]
+
+        if self.feature_names is None:
+            self.feature_names_out_ = self.numeric_inputs_ + ENGINEERED_FEATURES + dummies
+        else:
+            self.feature_names_out_ = list(self.feature_names)
+            producible = set(self.numeric_inputs_) | set(ENGINEERED_FEATURES) | set(dummies)
+            unknown = [col for col in self.feature_names_out_ if col not in producible]
+            if unknown:
+                print(f"[WARNING] Layout columns that will be filled with 0: {unknown}")
+
+        self.required_inputs_ = sorted(
+            (set(self.numeric_inputs_) & set(self.feature_names_out_))
+            | set(ENGINEERING_INPUTS) | set(self.categorical_cols)
+        )
+        return self
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(self.feature_names_out_, dtype=object)
+
+    def engineer(self, X):
+        """
+        Return a dict of the engineered feature arrays for raw frame `X`.
+        """
+        year_built = _as_float(X["YearBuilt"])
+        overall = _as_float(X["OverallQual"]) * _as_float(X["OverallCond"])
+        return {
+            "HouseAge": self.reference_year_ - year_built,
+            "LivingLotRatio": _as_float(X["GrLivArea"]) / (_as_float(X["LotArea"]) + 1),
+            "FinishedBsmtRatio": _as_float(X["BsmtFinSF1"]) / (_as_float(X["TotalBsmtSF"]) + 1),
+            "OverallScore": overall,
+            "HasPorch": (_as_float(X["OpenPorchSF"]) > 0).astype(np.int64),
+        }
+
+    def transform(self, X):
+        """
+        Apply feature engineering, one-hot encoding and alignment to raw frame `X`.
+        Returns a DataFrame with exactly `feature_names_out_` columns, in order.
+        """
+        missing = [col for col in self.required_inputs_ if col not in X.columns]
+        if missing:
+            raise ValueError(f"[ERROR] Missing expected input features: {missing}")
+
+        n_rows = len(X)
+        with timed("feature_engineering", rows=n_rows):
+            columns = self.engineer(X)
+            for col in self.numeric_inputs_:
+                if col in X.columns:
+                    columns[col] = _as_float(X[col])
+            for col, levels in self.categories_.items():
+                values = np.asarray(X[col], dtype=object)
+                for level in levels:
+                    columns[f"{col}_{level}"] = values == level
+
+        with timed("column_alignment", rows=n_rows):
+            zeros = np.zeros(n_rows, dtype=np.int64)
+            data = {col: columns.get(col, zeros) for col in self.feature_names_out_}
+            return pd.DataFrame(data, index=X.index, columns=self.feature_names_out_)
+
+
+def build_feature_engineer(cleaned_path=CLEANED_DATA_PATH, layout_path=X_TRAIN_PATH):
+    """
+    Fit a FeatureEngineer on the cleaned training data, targeting the
+    column layout of X_train (only the CSV header is read for the layout).
+    """
+    feature_names = read_columns(layout_path)
+    cleaned = read_dataset(cleaned_path)
+    return FeatureEngineer(feature_names=feature_names).fit(cleaned)
+
+
+@functools.lru_cache(maxsize=8)
+def _engineer_for_schema(path, mtime_ns):
+    return FeatureEngineer.from_schema(load_feature_schema(path))
+
+
+@functools.lru_cache(maxsize=None)
+def _engineer_from_data():
+    print(f"[WARNING] {SCHEMA_PATH} not found; fitting feature engineering from training data.")
+    return build_feature_engineer()
+
+
+def load_feature_engineer(schema_path=SCHEMA_PATH):
+    """
+    Return the process-wide fitted FeatureEngineer.
+
+    It is built from the saved feature schema and cached until the schema file
+    changes. If no schema has been saved yet, it is fitted from the training
+    CSVs once per process instead.
+    """
+    if os.path.exists(schema_path):
+        return _engineer_for_schema(os.path.abspath(schema_path),
+                                    os.stat(schema_path).st_mtime_ns)
+    return _engineer_from_data()
@@ -0,0 +1,138 @@
+"""
+Heritage Housing – Memory-Mapped Feature Matrix
+
+Purpose:
+Materialises the numeric training matrix and target as `.npy` files under
+`data/processed/final/` (plus a JSON sidecar with the column names), and opens them as
+read-only memory maps.
+
+Every consumer that opens the same files shares the same OS page-cache pages instead of
+holding its own DataFrame copy:
+- Cross-validation workers (utils/tuning.py): the parent builds the files, and each
+  worker opens them itself and only receives fold indices, so X and y are never
+  pickled into the worker processes
+- Explainer batch mode over the training data (`python -m utils.explain --matrix
+  train`): workers open the same maps and explain row ranges of them
+
+The files are written chunk by chunk through `open_memmap`, so building them needs
+memory for one chunk only and works for training sets of tens of millions of rows.
+They are rebuilt automatically when the source dataset changes.
+
+Usage:
+    python -m utils.feature_matrix          # build X_train.npy / y_train.npy
+
+    X, y, columns = load_feature_matrix()                 # parent: build if stale
+    X, y, columns = load_feature_matrix(refresh=False)    # worker: just open
+"""
+
+import json
+import os
+
+import numpy as np
+
+from utils.data_io import count_rows, iter_dataset, read_columns, resolve_dataset
+
+
+FINAL_DIR = "data/processed/final"
+CHUNKSIZE = 250_000
+
+
+def _paths(name, out_dir):
+    return {
+        "X": os.path.join(out_dir, f"X_{name}.npy"),
+        "y": os.path.join(out_dir, f"y_{name}.npy"),
+        "meta": os.path.join(out_dir, f"X_{name}.columns.json"),
+    }
+
+
+def source_paths(name="train", out_dir=FINAL_DIR):
+    """The processed X_<name> / y_<name> datasets the matrix is built from."""
+    return os.path.join(out_dir, f"X_{name}.csv"), os.path.join(out_dir, f"y_{name}.csv")
+
+
+def _source_stamp(csv_path):
+    path = resolve_dataset(csv_path)
+    stat = os.stat(path)
+    return {"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _write_matrix(csv_path, out_path, dtype, chunksize):
+    columns = read_columns(csv_path)
+    n_rows = count_rows(csv_path)
+    matrix = np.lib.format.open_memmap(out_path, mode="w+", dtype=dtype,
+                                       shape=(n_rows, len(columns)))
+    start = 0
+    for chunk in iter_dataset(csv_path, chunksize):
+        stop = start + len(chunk)
+        matrix[start:stop] = chunk[columns].to_numpy(dtype=dtype)
+        start = stop
+    matrix.flush()
+    del matrix
+    return columns, n_rows
+
+
+def materialise_feature_matrix(name="train", out_dir=FINAL_DIR, dtype="float64",
+                               chunksize=CHUNKSIZE):
+    """
+    Write X_<name>.npy, y_<name>.npy and X_<name>.columns.json from the
+    processed X_<name> / y_<name> datasets. Boolean columns become 0.0/1.0.
+    """
+    paths = _paths(name, out_dir)
+    x_source, y_source = source_paths(name, out_dir)
+
+    columns, n_rows = _write_matrix(x_source, paths["X"], dtype, chunksize)
+    target_columns, n_target = _write_matrix(y_source, paths["y"], dtype, chunksize)
+    if n_target != n_rows:
+        raise ValueError(f"[ERROR] X_{name} has {n_rows} rows but y_{name} has {n_target}.")
+
+    # Store the target as a 1-D array, as estimators expect
+    y = np.load(paths["y"], mmap_mode="r")
+    if y.ndim == 2 and y.shape[1] == 1:
+        flat = np.lib.format.open_memmap(paths["y"] + ".tmp", mode="w+", dtype=dtype, shape=(n_rows,))
+        flat[:] = y[:, 0]
+        flat.flush()
+        del flat, y
+        os.replace(paths["y"] + ".tmp", paths["y"])
+
+    meta = {
+        "columns": columns,
+        "target": target_columns[0],
+        "rows": n_rows,
+        "dtype": dtype,
+        "sources": {"X": _source_stamp(x_source), "y": _source_stamp(y_source)},
+    }
+    with open(paths["meta"], "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"[SAVED] Feature matrix ({n_rows:,} x {len(columns)}) saved to: {paths['X']}")
+    return meta
+
+
+def _is_current(name, out_dir):
+    paths = _paths(name, out_dir)
+    if not all(os.path.exists(p) for p in paths.values()):
+        return False
+    with open(paths["meta"]) as f:
+        meta = json.load(f)
+    sources = dict(zip(("X", "y"), source_paths(name, out_dir)))
+    return all(meta["sources"][key] == _source_stamp(path) for key, path in sources.items())
+
+
+def load_feature_matrix(name="train", out_dir=FINAL_DIR, mmap_mode="r", refresh=True):
+    """
+    Return (X, y, columns) with X and y opened as memory maps, building the
+    .npy files first if they are missing or older than the source data.
+    Worker processes pass `refresh=False` to open what their parent built.
+    """
+    if refresh and not _is_current(name, out_dir):
+        materialise_feature_matrix(name, out_dir)
+    paths = _paths(name, out_dir)
+    with open(paths["meta"]) as f:
+        columns = json.load(f)["columns"]
+    X = np.load(paths["X"], mmap_mode=mmap_mode)
+    y = np.load(paths["y"], mmap_mode=mmap_mode)
+    return X, y, columns
+
+
+if __name__ == "__main__":
+    for split in ("train", "test"):
+        materialise_feature_matrix(split)
@@ -0,0 +1,247 @@
+"""
+Heritage Housing – Incremental Correlation Statistics
+
+Purpose:
+Keeps running counts, means, second moments and co-moments for the numeric columns of
+the sales history, so the Pearson correlation matrix and VIF scores can be refreshed
+after a monthly append by reading only the new rows.
+
+Statistics are tracked pairwise (for each pair of columns, over the rows where both are
+present), which reproduces `DataFrame.corr()` with its pairwise handling of missing
+values. New rows are folded in chunk by chunk using the parallel Welford update
+(Chan et al.), which stays numerically stable over long histories.
+
+The state is persisted as `.npz` arrays plus a JSON sidecar recording how far into each
+source file it has read, with a SHA-256 of every byte consumed so far. A refresh
+re-hashes that prefix (far cheaper than parsing it) to confirm the file was only
+appended to, then seeks straight to the offset, so it should run once the month's
+append has been fully written.
+
+Usage:
+    python -m utils.incremental_stats update              # fold in new rows
+    python -m utils.incremental_stats report              # write correlation + VIF CSVs
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+RECORDS_PATH = "data/raw/house_prices_records.csv"
+STATE_DIR = "outputs/metrics/stats_state"
+CORRELATION_OUTPUT_PATH = "outputs/metrics/pearson_correlation.csv"
+# Kept apart from vif_scores.csv, which the feature engineering notebook computes on transformed features
+VIF_OUTPUT_PATH = "outputs/metrics/incremental_vif_scores.csv"
+TARGET_COL = "LogSalePrice"
+PRICE_COL = "SalePrice"
+HASH_BLOCK_BYTES = 1 << 20
+READ_CHUNKSIZE = 100_000
+
+
+def _hash_bytes(hasher, f, n_bytes):
+    """Feed the next `n_bytes` of open file `f` to `hasher`."""
+    while n_bytes > 0:
+        block = f.read(min(HASH_BLOCK_BYTES, n_bytes))
+        if not block:
+            break
+        hasher.update(block)
+        n_bytes -= len(block)
+    return hasher
+
+
+def _numeric_frame(df, columns):
+    """Select `columns` as floats, deriving LogSalePrice from SalePrice."""
+    if TARGET_COL in columns and TARGET_COL not in df.columns and PRICE_COL in df.columns:
+        df = df.assign(**{TARGET_COL: np.log1p(pd.to_numeric(df[PRICE_COL], errors="coerce"))})
+    return df.reindex(columns=columns).apply(pd.to_numeric, errors="coerce")
+
+
+class IncrementalStats:
+    """
+    Pairwise running moments for a fixed set of numeric columns.
+
+    For columns i, j (p x p arrays):
+        n[i, j]    rows where both i and j are present
+        mean[i, j] mean of column i over those rows
+        m2[i, j]   sum of squared deviations of column i over those rows
+        c[i, j]    co-moment of i and j over those rows
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        p = len(self.columns)
+        self.n = np.zeros((p, p))
+        self.mean = np.zeros((p, p))
+        self.m2 = np.zeros((p, p))
+        self.c = np.zeros((p, p))
+        self.sources = {}
+
+    @classmethod
+    def for_frame(cls, df):
+        """Track every numeric column of `df` (plus LogSalePrice if SalePrice exists)."""
+        columns = df.select_dtypes(include=[np.number]).columns.tolist()
+        if PRICE_COL in columns:
+            columns.append(TARGET_COL)
+        return cls(columns)
+
+    @property
+    def n_rows(self):
+        return int(self.n.diagonal().max()) if self.n.size else 0
+
+    def update(self, df):
+        """Fold the rows of `df` into the running statistics."""
+        x = _numeric_frame(df, self.columns).to_numpy(dtype=np.float64)
+        if len(x) == 0:
+            return self
+
+        present = ~np.isnan(x)
+        mask = present.astype(np.float64)
+
+        # Shift by the chunk's column means before forming sums; moments are
+        # shift-invariant and this keeps the products well conditioned.
+        shift = np.where(present.any(axis=0), np.nanmean(np.where(present, x, np.nan), axis=0), 0.0)
+        x0 = np.where(present, x - shift, 0.0)
+
+        n_b = mask.T @ mask
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = np.where(n_b > 0, (x0.T @ mask) / n_b, 0.0)
+            m2_b = (x0 ** 2).T @ mask - n_b * mean_b ** 2
+            c_b = x0.T @ x0 - n_b * mean_b * mean_b.T
+        mean_b = mean_b + shift[:, None]
+
+        n_a = self.n
+        n = n_a + n_b
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frac = np.where(n > 0, n_b / n, 0.0)
+            weight = np.where(n > 0, n_a * n_b / n, 0.0)
+        delta = np.where(n_b > 0, mean_b - self.mean, 0.0)
+        self.mean = self.mean + delta * frac
+        self.m2 = self.m2 + np.maximum(m2_b, 0.0) + delta ** 2 * weight
+        self.c = self.c + c_b + delta * delta.T * weight
+        self.n = n
+        return self
+
+    def correlation(self, min_periods=2):
+        """Pearson correlation matrix as a DataFrame (pairwise complete)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = self.c / np.sqrt(self.m2 * self.m2.T)
+        corr[self.n < min_periods] = np.nan
+        corr = np.clip(corr, -1.0, 1.0)
+        np.fill_diagonal(corr, np.where(self.n.diagonal() >= min_periods, 1.0, np.nan))
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+    def vif(self, exclude=(TARGET_COL, PRICE_COL)):
+        """
+        Variance inflation factors from the inverse of the correlation matrix
+        (VIF_i = [R^-1]_ii), sorted like the notebook's outputs/metrics/vif_scores.csv.
+        """
+        features = [col for col in self.columns if col not in exclude]
+        corr = self.correlation().loc[features, features].to_numpy()
+        values = np.diag(np.linalg.pinv(corr))
+        return (pd.DataFrame({"Feature": features, "VIF": values})
+                .sort_values(by="VIF", ascending=False)
+                .reset_index(drop=True))
+
+    def update_from_csv(self, path, chunksize=READ_CHUNKSIZE):
+        """
+        Fold in rows appended to `path` since the last update. The first call
+        reads the whole file; later calls seek to the recorded byte offset.
+        Returns the number of new rows.
+        """
+        key = os.path.abspath(path)
+        record = self.sources.get(key)
+        size = os.path.getsize(path)
+
+        # Rows are only ever appended: the bytes already consumed must be unchanged.
+        # The same hash then runs on over the new bytes, so the file is hashed once.
+        hasher = hashlib.sha256()
+        hashed = record["prefix_bytes"] if record else 0
+        with open(path, "rb") as f:
+            _hash_bytes(hasher, f, hashed)
+        if record is not None and (
+                size < record["offset"] or hasher.hexdigest() != record["prefix_sha256"]):
+            raise ValueError(
+                f"[ERROR] {path} was rewritten since the last update; rebuild the statistics from scratch.")
+
+        with open(path, "rb") as f:
+            header = f.readline()
+            names = pd.read_csv(io.BytesIO(header)).columns.tolist()
+            offset = record["offset"] if record else f.tell()
+            f.seek(offset)
+            new_rows = 0
+            if offset < size:
+                for chunk in pd.read_csv(f, header=None, names=names, chunksize=chunksize):
+                    self.update(chunk)
+                    new_rows += len(chunk)
+
+        with open(path, "rb") as f:
+            f.seek(hashed)
+            _hash_bytes(hasher, f, size - hashed)
+        self.sources[key] = {
+            "offset": size,
+            "rows": (record["rows"] if record else 0) + new_rows,
+            "prefix_bytes": size,
+            "prefix_sha256": hasher.hexdigest(),
+        }
+        return new_rows
+
+    def save(self, state_dir=STATE_DIR):
+        os.makedirs(state_dir, exist_ok=True)
+        np.savez(os.path.join(state_dir, "moments.npz"),
+                 n=self.n, mean=self.mean, m2=self.m2, c=self.c)
+        with open(os.path.join(state_dir, "state.json"), "w") as f:
+            json.dump({"columns": self.columns, "sources": self.sources}, f, indent=2)
+
+    @classmethod
+    def load(cls, state_dir=STATE_DIR):
+        with open(os.path.join(state_dir, "state.json")) as f:
+            meta = json.load(f)
+        stats = cls(meta["columns"])
+        arrays = np.load(os.path.join(state_dir, "moments.npz"))
+        stats.n, stats.mean, stats.m2, stats.c = (
+            arrays["n"], arrays["mean"], arrays["m2"], arrays["c"])
+        stats.sources = meta["sources"]
+        return stats
+
+
+def load_or_create(source=RECORDS_PATH, state_dir=STATE_DIR):
+    """Load the persisted state, or start an empty one tracking `source`'s columns."""
+    if os.path.exists(os.path.join(state_dir, "state.json")):
+        return IncrementalStats.load(state_dir)
+    return IncrementalStats.for_frame(pd.read_csv(source, nrows=1000))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental correlation / VIF statistics.")
+    parser.add_argument("command", choices=["update", "report"])
+    parser.add_argument("--source", default=RECORDS_PATH)
+    parser.add_argument("--state-dir", default=STATE_DIR)
+    parser.add_argument("--correlation-output", default=CORRELATION_OUTPUT_PATH)
+    parser.add_argument("--vif-output", default=VIF_OUTPUT_PATH)
+    args = parser.parse_args(argv)
+
+    stats = load_or_create(args.source, args.state_dir)
+
+    if args.command == "update":
+        new_rows = stats.update_from_csv(args.source)
+        stats.save(args.state_dir)
+        print(f"[INFO] Folded in {new_rows:,} new rows ({stats.n_rows:,} total).")
+        return 0
+
+    if not stats.n_rows:
+        print("[ERROR] No rows folded in yet; run `python -m utils.incremental_stats update` first.")
+        return 1
+    stats.correlation().to_csv(args.correlation_output)
+    stats.vif().to_csv(args.vif_output, index=False)
+    print(f"[SAVED] Correlation matrix saved to: {args.correlation_output}")
+    print(f"[SAVED] VIF scores saved to: {args.vif_output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
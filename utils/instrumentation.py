@@ -0,0 +1,375 @@
+"""
+Heritage Housing – Instrumentation
+
+Purpose:
+Low-overhead timers and counters showing where time goes in the dashboard, the batch
+scripts and the prediction service: artefact load, CSV read, feature engineering,
+column alignment, predict, CSV write and banner image processing.
+
+- Stages are wrapped with `with timed("predict", rows=len(X)):`, `@instrumented("stage")`
+  or `timed_iter("csv_read", reader)` (times each item of an iterator, e.g. CSV chunks)
+- Each stage keeps its call, error and row counts, total/min/max seconds and a
+  fixed-bucket latency histogram (cumulative buckets from 0.5 ms to 60 s, as Prometheus
+  expects); an exception raised inside a stage counts as an error and is re-raised
+- Plain event counters (`increment`) record things like errors a page showed the user
+- `snapshot()` returns everything as a JSON-serialisable dict and `prometheus_text()`
+  renders a snapshot in the Prometheus text exposition format
+- Instrumentation is off unless HERITAGE_INSTRUMENTATION=1 is set (or `set_enabled(True)`
+  is called). When off, `timed` hands back one shared no-op context manager and
+  `timed_iter` returns the iterator itself, so wrapped stages cost a flag check
+
+While a run profiler (utils/profiling.py) is attached, the same stage wrappers report
+to it instead, with CPU time and memory as well as wall time.
+
+Figures are per process. The dashboard shows its own on the Instrumentation page,
+the prediction service serves them at /metrics/stages and /metrics/prometheus, and
+`run_pipeline.py --metrics-output` saves a batch run's snapshot.
+
+Usage:
+    HERITAGE_INSTRUMENTATION=1 streamlit run Home.py
+    python run_pipeline.py --metrics-output outputs/metrics/inference_instrumentation.json
+    python -m utils.instrumentation outputs/metrics/inference_instrumentation.json --format prometheus
+"""
+
+import argparse
+import bisect
+import functools
+import json
+import math
+import os
+import statistics
+import threading
+import time
+
+
+ENV_FLAG = "HERITAGE_INSTRUMENTATION"
+METRIC_PREFIX = "heritage"
+# Upper bounds (seconds) of the latency histogram buckets; a final +Inf bucket is implied
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_enabled = os.environ.get(ENV_FLAG, "").strip().lower() in ("1", "true", "yes", "on")
+_stages = {}
+_counters = {}
+_lock = threading.Lock()
+_started_at = time.time()
+_profiler = None
+
+
+class _StageStats:
+    """Running totals and histogram counts for one stage."""
+
+    __slots__ = ("calls", "errors", "rows", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def as_dict(self):
+        cumulative = []
+        running = 0
+        for count in self.buckets:
+            running += count
+            cumulative.append(running)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "total_seconds": self.total,
+            "min_seconds": self.min if self.calls else 0.0,
+            "max_seconds": self.max,
+            "buckets": [[le, count] for le, count in zip(BUCKETS + ("+Inf",), cumulative)],
+        }
+
+
+def _record(stage, seconds, rows, failed):
+    with _lock:
+        stats = _stages.get(stage)
+        if stats is None:
+            stats = _stages[stage] = _StageStats()
+        stats.calls += 1
+        stats.errors += failed
+        if rows:
+            stats.rows += rows
+        stats.total += seconds
+        stats.min = min(stats.min, seconds)
+        stats.max = max(stats.max, seconds)
+        stats.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+
+class _Timer:
+    __slots__ = ("stage", "rows", "start")
+
+    def __init__(self, stage, rows):
+        self.stage = stage
+        self.rows = rows
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _record(self.stage, time.perf_counter() - self.start, self.rows, exc_type is not None)
+        return False
+
+    def discard(self):
+        """Abandon an entered timer without recording it."""
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def discard(self):
+        pass
+
+
+_NOOP = _NoopTimer()
+
+
+def is_enabled():
+    return _enabled
+
+
+def is_active():
+    """True if stages are being recorded (instrumentation on or a profiler attached)."""
+    return _enabled or _profiler is not None
+
+
+def set_enabled(enabled=True):
+    """Switch instrumentation on or off for this process."""
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def attach_profiler(profiler):
+    """
+    Route every stage to `profiler` (whose `stage(name, rows)` returns a timer)
+    until `detach_profiler` is called. Returns False if one is already attached.
+    """
+    global _profiler
+    with _lock:
+        if _profiler is not None:
+            return False
+        _profiler = profiler
+        return True
+
+
+def detach_profiler():
+    global _profiler
+    with _lock:
+        _profiler = None
+
+
+def timed(stage, rows=None):
+    """
+    Context manager timing one run of `stage`; `rows` is added to the stage's
+    row count. A no-op when instrumentation is off and no profiler is attached.
+    """
+    if _profiler is not None:
+        return _profiler.stage(stage, rows)
+    if not _enabled:
+        return _NOOP
+    return _Timer(stage, rows)
+
+
+def instrumented(stage):
+    """Decorator timing every call of the wrapped function as `stage`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled and _profiler is None:
+                return fn(*args, **kwargs)
+            with timed(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_iter(stage, iterable):
+    """
+    Yield from `iterable`, timing how long each item takes to produce
+    (e.g. reading the next CSV chunk) as one run of `stage`.
+    """
+    if not _enabled and _profiler is None:
+        return iterable
+    return _timed_iter(stage, iter(iterable))
+
+
+def _timed_iter(stage, iterator):
+    while True:
+        timer = timed(stage)
+        timer.__enter__()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            timer.discard()
+            return
+        except BaseException as e:
+            timer.__exit__(type(e), e, e.__traceback__)
+            raise
+        timer.rows = len(item) if hasattr(item, "__len__") else None
+        timer.__exit__(None, None, None)
+        yield item
+
+
+def median_seconds(fn, repeats):
+    """Median wall time of `repeats` calls of `fn`, in seconds (for benchmarks)."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(statistics.median(timings))
+
+
+def increment(name, value=1):
+    """Add `value` to the event counter `name` (when instrumentation is on)."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def reset():
+    """Forget every stage and counter recorded so far."""
+    global _started_at
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _started_at = time.time()
+
+
+def snapshot():
+    """Return all stage statistics and counters as a JSON-serialisable dict."""
+    with _lock:
+        stages = {stage: stats.as_dict() for stage, stats in sorted(_stages.items())}
+        counters = dict(sorted(_counters.items()))
+        started_at = _started_at
+    return {
+        "enabled": _enabled,
+        "pid": os.getpid(),
+        "started_at": started_at,
+        "taken_at": time.time(),
+        "stages": stages,
+        "counters": counters,
+    }
+
+
+def estimate_quantile(stage, q):
+    """
+    Estimate quantile `q` (seconds) of a stage from its snapshot histogram,
+    interpolating linearly inside the bucket it falls in.
+    """
+    if not stage["calls"]:
+        return 0.0
+    target = q * stage["calls"]
+    lower_bound, lower_count = 0.0, 0
+    for le, count in stage["buckets"]:
+        if count >= target:
+            upper_bound = stage["max_seconds"] if le == "+Inf" else min(le, stage["max_seconds"])
+            lower_bound = max(lower_bound, stage["min_seconds"])
+            if count == lower_count or upper_bound <= lower_bound:
+                return upper_bound
+            return lower_bound + (upper_bound - lower_bound) * (target - lower_count) / (count - lower_count)
+        lower_bound, lower_count = le, count
+    return stage["max_seconds"]
+
+
+def summary_rows(snap=None):
+    """One dict per stage (calls, errors, rows, mean/p50/p95/max ms, total s) for display."""
+    snap = snap or snapshot()
+    rows = []
+    for name, stage in snap["stages"].items():
+        calls = stage["calls"]
+        rows.append({
+            "Stage": name,
+            "Calls": calls,
+            "Errors": stage["errors"],
+            "Rows": stage["rows"],
+            "Mean (ms)": round(stage["total_seconds"] / calls * 1000, 3) if calls else 0.0,
+            "p50 (ms)": round(estimate_quantile(stage, 0.5) * 1000, 3),
+            "p95 (ms)": round(estimate_quantile(stage, 0.95) * 1000, 3),
+            "Max (ms)": round(stage["max_seconds"] * 1000, 3),
+            "Total (s)": round(stage["total_seconds"], 4),
+        })
+    return rows
+
+
+def _metric_name(name):
+    return "".join(ch if ch.isalnum() else "_" for ch in name)
+
+
+def prometheus_text(snap=None):
+    """Render a snapshot (the current one by default) in Prometheus text format."""
+    snap = snap or snapshot()
+    seconds = f"{METRIC_PREFIX}_stage_duration_seconds"
+    lines = [
+        f"# HELP {seconds} Time spent in each instrumented stage.",
+        f"# TYPE {seconds} histogram",
+    ]
+    for name, stage in snap["stages"].items():
+        for le, count in stage["buckets"]:
+            lines.append(f'{seconds}_bucket{{stage="{name}",le="{le}"}} {count}')
+        lines.append(f'{seconds}_sum{{stage="{name}"}} {stage["total_seconds"]:.9f}')
+        lines.append(f'{seconds}_count{{stage="{name}"}} {stage["calls"]}')
+
+    for metric, key, help_text in (
+        ("stage_errors_total", "errors", "Runs of each stage that raised an exception."),
+        ("stage_rows_total", "rows", "Rows processed by each stage."),
+    ):
+        lines.append(f"# HELP {METRIC_PREFIX}_{metric} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{metric} counter")
+        for name, stage in snap["stages"].items():
+            lines.append(f'{METRIC_PREFIX}_{metric}{{stage="{name}"}} {stage[key]}')
+
+    for name, value in snap["counters"].items():
+        metric = f"{METRIC_PREFIX}_{_metric_name(name)}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def save_snapshot(path):
+    """Write the current snapshot to `path` as JSON."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(snapshot(), f, indent=2)
+    print(f"[SAVED] Instrumentation snapshot saved to: {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show a saved instrumentation snapshot.")
+    parser.add_argument("snapshot", help="JSON snapshot written by save_snapshot / --metrics-output.")
+    parser.add_argument("--format", choices=["table", "prometheus", "json"], default="table")
+    args = parser.parse_args(argv)
+
+    with open(args.snapshot) as f:
+        snap = json.load(f)
+    if args.format == "prometheus":
+        print(prometheus_text(snap), end="")
+    elif args.format == "json":
+        print(json.dumps(snap, indent=2))
+    else:
+        import pandas as pd
+        rows = summary_rows(snap)
+        if rows:
+            print(pd.DataFrame(rows).to_string(index=False))
+        else:
+            print("[INFO] No stages recorded in this snapshot.")
+        for name, value in snap["counters"].items():
+            print(f"[INFO] {name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
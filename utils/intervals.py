@@ -0,0 +1,256 @@
+"""
+Heritage Housing – Prediction Intervals
+
+Purpose:
+Adds a likely price range to every Random Forest estimate, using the spread of the
+forest's own trees, without training or loading another model.
+
+- All per-tree predictions come from one vectorised pass, not a Python loop over
+  `estimators_`: the forest's `apply` gives every row's leaf in every tree, and one
+  gather from a (trees x nodes) table of node values turns them into predictions.
+  Flat (compressed) forests use the flat tree engine's `apply` instead. The point
+  estimate is the mean of that same pass, so it is identical to `pipeline.predict`
+- The raw interval is the (1 - coverage) / 2 and (1 + coverage) / 2 quantiles of the tree
+  predictions. Tree spread alone is not a calibrated interval, so it is widened by a
+  conformal margin (conformalised quantile regression): the margin is the
+  ceil((n + 1) * coverage) / n quantile of how far held-out sale prices fall outside
+  their raw interval. The held-out rows are the same 80/20 test split used in training.
+- The calibration is saved next to the model, one file per coverage
+  (`<model>_intervals_<coverage>.json`, e.g.
+  `outputs/models/final_random_forest_pipeline_intervals_0.9.json`), with the model's
+  content hash, and redone automatically when the model changes. Runs at different
+  coverages (the dashboard at 0.9, a `--coverage 0.8` batch) keep separate files
+  instead of overwriting each other's
+
+Intervals are computed on the log scale and reported as `Predicted_SalePrice_Lower` /
+`Predicted_SalePrice_Upper`.
+
+Usage:
+    python -m utils.intervals --calibrate --coverage 0.9
+    python -m utils.intervals --benchmark     # overhead vs a plain pipeline.predict
+"""
+
+import argparse
+import json
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from utils.data_io import read_dataset
+from utils.feature_engineering import load_feature_engineer
+from utils.instrumentation import median_seconds
+from utils.model_registry import FINAL_PIPELINE_PATH, get_model, model_version
+from utils.schema import CLEANED_DATA_PATH, RANDOM_STATE, TARGET_COL, TEST_SIZE
+from utils.tree_engine import FlatForest, final_estimator
+
+
+BENCHMARK_OUTPUT_PATH = "outputs/metrics/prediction_intervals_benchmark.csv"
+DEFAULT_COVERAGE = 0.9
+LOWER_COL = "Predicted_SalePrice_Lower"
+UPPER_COL = "Predicted_SalePrice_Upper"
+
+_interval_models = {}
+_interval_models_lock = threading.Lock()
+
+
+def _quantile_levels(coverage):
+    return (1 - coverage) / 2, (1 + coverage) / 2
+
+
+class ForestIntervals:
+    """
+    Point predictions and calibrated intervals from a preprocessing + Random
+    Forest pipeline (or its flat export).
+
+    Parameters:
+        pipeline: Fitted pipeline whose last step is a forest.
+        calibration (dict or None): Output of `calibrate`; without it intervals
+            are the raw tree quantiles for `coverage`.
+        coverage (float): Nominal coverage used when there is no calibration.
+    """
+
+    def __init__(self, pipeline, calibration=None, coverage=DEFAULT_COVERAGE):
+        estimator = final_estimator(pipeline)
+        if isinstance(estimator, FlatForest):
+            if estimator.kind != "mean":
+                raise ValueError("[ERROR] Tree-spread intervals need an averaging forest.")
+            self.n_trees = estimator.n_trees
+        elif hasattr(estimator, "estimators_") and not hasattr(estimator, "learning_rate"):
+            trees = [tree.tree_ for tree in estimator.estimators_]
+            self.n_trees = len(trees)
+            # Node values of every tree, padded to the largest tree
+            self._node_values = np.zeros((self.n_trees, max(t.node_count for t in trees)))
+            for i, tree in enumerate(trees):
+                self._node_values[i, :tree.node_count] = tree.value[:, 0, 0]
+        else:
+            raise ValueError("[ERROR] Tree-spread intervals need an averaging forest, "
+                             f"not {type(estimator).__name__}.")
+        self.estimator = estimator
+        self.preprocessor = pipeline[:-1]
+        self.feature_names = list(pipeline.named_steps["preprocessor"].transformers_[0][2])
+        self.calibration = calibration
+        self.coverage = calibration["coverage"] if calibration else coverage
+
+    def tree_predictions(self, features):
+        """Prediction of every tree, shape (n_rows, n_trees), in one pass."""
+        X = self.preprocessor.transform(features)
+        if isinstance(self.estimator, FlatForest):
+            return self.estimator.tree_predictions(X)
+        leaves = self.estimator.apply(X)
+        return self._node_values[np.arange(self.n_trees), leaves]
+
+    def predict(self, features):
+        """Return (log prediction, log lower bound, log upper bound) arrays."""
+        per_tree = self.tree_predictions(features)
+        # Sum trees in order, as the forest's own predict does
+        point = np.zeros(len(per_tree))
+        for values in np.ascontiguousarray(per_tree.T):
+            point += values
+        point /= self.n_trees
+
+        lower, upper = np.quantile(per_tree, _quantile_levels(self.coverage), axis=1)
+        margin = self.calibration["margin"] if self.calibration else 0.0
+        return point, lower - margin, upper + margin
+
+
+def calibration_set(cleaned_path=CLEANED_DATA_PATH, feature_engineer=None):
+    """Engineered features and log sale prices of the held-out test split."""
+    cleaned = read_dataset(cleaned_path)
+    _, test = train_test_split(cleaned, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+    features = (feature_engineer or load_feature_engineer()).transform(test)
+    return features, np.log1p(test[TARGET_COL].to_numpy(dtype=np.float64))
+
+
+def calibrate(pipeline, features, y, coverage=DEFAULT_COVERAGE):
+    """
+    Conformal margin for `coverage` on held-out rows. Returns the calibration
+    dict (margin, coverage before/after calibration and mean width).
+    """
+    raw = ForestIntervals(pipeline, coverage=coverage)
+    _, lower, upper = raw.predict(features)
+    scores = np.maximum(lower - y, y - upper)
+    n = len(y)
+    level = min(1.0, math.ceil((n + 1) * coverage) / n)
+    margin = float(np.quantile(scores, level, method="higher"))
+    return {
+        "coverage": coverage,
+        "margin": margin,
+        "n_calibration": n,
+        "raw_coverage": round(float(np.mean((y >= lower) & (y <= upper))), 4),
+        "calibrated_coverage": round(float(np.mean((y >= lower - margin) & (y <= upper + margin))), 4),
+        "mean_log_width": round(float(np.mean(upper - lower + 2 * margin)), 4),
+    }
+
+
+def calibration_path(model_path, coverage=DEFAULT_COVERAGE):
+    """Where the `coverage` interval calibration of the model at `model_path` is kept."""
+    return f"{os.path.splitext(model_path)[0]}_intervals_{coverage:g}.json"
+
+
+def save_calibration(model_path=FINAL_PIPELINE_PATH, coverage=DEFAULT_COVERAGE, output_path=None):
+    """Calibrate the model at `model_path` and save the result next to it."""
+    output_path = output_path or calibration_path(model_path, coverage)
+    features, y = calibration_set()
+    calibration = calibrate(get_model(model_path), features, y, coverage)
+    calibration["model_sha256"] = model_version(model_path)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(calibration, f, indent=2)
+    print(f"[INFO] {coverage:.0%} intervals: margin {calibration['margin']:.4f} (log), "
+          f"held-out coverage {calibration['raw_coverage']:.1%} raw -> "
+          f"{calibration['calibrated_coverage']:.1%} calibrated")
+    print(f"[SAVED] Interval calibration saved to: {output_path}")
+    return calibration
+
+
+def load_calibration(model_path=FINAL_PIPELINE_PATH, coverage=DEFAULT_COVERAGE):
+    """The saved calibration if it matches the model and coverage, else a fresh one."""
+    path = calibration_path(model_path, coverage)
+    if os.path.exists(path):
+        with open(path) as f:
+            calibration = json.load(f)
+        if calibration.get("model_sha256") == model_version(model_path) \
+                and calibration.get("coverage") == coverage:
+            return calibration
+    print(f"[INFO] No interval calibration for the current model; calibrating {model_path}")
+    return save_calibration(model_path, coverage)
+
+
+def get_interval_model(model_path=FINAL_PIPELINE_PATH, coverage=DEFAULT_COVERAGE):
+    """
+    Return the process-wide ForestIntervals for the model at `model_path`,
+    rebuilt only when the model version changes.
+    """
+    version = model_version(model_path)
+    cache_key = (os.path.abspath(model_path), coverage)
+    with _interval_models_lock:
+        entry = _interval_models.get(cache_key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+    model = ForestIntervals(get_model(model_path), load_calibration(model_path, coverage))
+    with _interval_models_lock:
+        _interval_models[cache_key] = (version, model)
+    return model
+
+
+def add_intervals(df, lower, upper):
+    """Append price-scale interval bounds to `df` in place."""
+    df[LOWER_COL] = np.expm1(lower)
+    df[UPPER_COL] = np.expm1(upper)
+    return df
+
+
+def benchmark(model_path=FINAL_PIPELINE_PATH, coverage=DEFAULT_COVERAGE,
+              batch_rows=(1, 1_000, 100_000), repeats=20):
+    """
+    Time `pipeline.predict` against the interval pass on engineered rows.
+    Returns a DataFrame with one row per batch size.
+    """
+    pipeline = get_model(model_path)
+    intervals = get_interval_model(model_path, coverage)
+    features = load_feature_engineer().transform(read_dataset(CLEANED_DATA_PATH))
+
+    rows = []
+    for n in batch_rows:
+        batch = features.iloc[np.resize(np.arange(len(features)), n)]
+        n_repeats = repeats if n <= 1_000 else 3
+        pipeline.predict(batch)
+        intervals.predict(batch)
+        plain = median_seconds(lambda: pipeline.predict(batch), n_repeats)
+        with_intervals = median_seconds(lambda: intervals.predict(batch), n_repeats)
+        rows.append({
+            "Rows": n,
+            "Plain predict (ms)": round(plain * 1000, 3),
+            "Predict + intervals (ms)": round(with_intervals * 1000, 3),
+            "Overhead (x)": round(with_intervals / plain, 2),
+        })
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrated prediction intervals from tree spread.")
+    parser.add_argument("--model", default=FINAL_PIPELINE_PATH)
+    parser.add_argument("--coverage", type=float, default=DEFAULT_COVERAGE)
+    parser.add_argument("--calibrate", action="store_true",
+                        help="(Re)calibrate the intervals for --model on the held-out split.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare the interval pass with a plain predict.")
+    parser.add_argument("--benchmark-output", default=BENCHMARK_OUTPUT_PATH)
+    args = parser.parse_args(argv)
+
+    if args.calibrate:
+        save_calibration(args.model, args.coverage)
+    if args.benchmark:
+        report = benchmark(args.model, args.coverage)
+        os.makedirs(os.path.dirname(args.benchmark_output), exist_ok=True)
+        report.to_csv(args.benchmark_output, index=False)
+        print(report.to_string(index=False))
+        print(f"[SAVED] Benchmark results saved to: {args.benchmark_output}")
+
+
+if __name__ == "__main__":
+    main()
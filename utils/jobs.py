@@ -0,0 +1,226 @@
+"""
+Heritage Housing – Batch Scoring Jobs
+
+Purpose:
+Runs large revaluation batches in the background so neither `run_pipeline.py` users
+nor the dashboard have to wait on them.
+
+- `submit_job(input_path)` validates the CSV header against the feature schema, queues
+  a scoring job and returns its job ID immediately
+- Jobs run on an asyncio event loop owned by a background thread; at most
+  `max_workers` jobs score at once (the rest wait in the queue), each one streaming the
+  input through `predict_csv_in_chunks` in a worker thread
+- Progress (rows done, rows/s, ETA) is updated after every chunk and can be polled
+  with `get_job(job_id)` from any thread, e.g. a Streamlit fragment
+- Results are written to `outputs/predictions/<job_id>.csv`, with a `<job_id>.json`
+  status file, so finished jobs stay retrievable after a restart
+- Inputs submitted with `remove_input=True` (e.g. dashboard uploads) are deleted once
+  the job completes or fails
+
+The job manager is a process-wide singleton (`get_job_manager()`), shared by every
+Streamlit session.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.data_io import count_rows
+from utils.deployment_pipeline import DEFAULT_CHUNKSIZE, predict_csv_in_chunks
+from utils.model_registry import FINAL_PIPELINE_PATH
+from utils.schema import check_raw_columns, load_feature_schema
+
+
+PREDICTIONS_DIR = "outputs/predictions"
+DEFAULT_MAX_WORKERS = 2
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+class Job:
+    """State of one scoring job; read it through `to_dict()`."""
+
+    def __init__(self, job_id, input_path, model_path, output_path, chunksize, remove_input=False):
+        self.job_id = job_id
+        self.input_path = input_path
+        self.model_path = model_path
+        self.output_path = output_path
+        self.chunksize = chunksize
+        self.remove_input = remove_input
+        self.status = QUEUED
+        self.total_rows = None
+        self.rows_done = 0
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def _update_progress(self, rows_done):
+        self.rows_done = rows_done
+
+    def to_dict(self):
+        now = self.finished_at or time.time()
+        elapsed = now - self.started_at if self.started_at else 0.0
+        rate = self.rows_done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.status == RUNNING and self.total_rows and rate > 0:
+            eta = max(self.total_rows - self.rows_done, 0) / rate
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "input_path": self.input_path,
+            "output_path": self.output_path,
+            "total_rows": self.total_rows,
+            "rows_done": self.rows_done,
+            "progress": (self.rows_done / self.total_rows) if self.total_rows else None,
+            "rows_per_second": round(rate, 1),
+            "elapsed_seconds": round(elapsed, 2),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Queue of scoring jobs served by an asyncio loop on a background thread.
+
+    Parameters:
+        max_workers (int): Jobs scored concurrently; later jobs wait their turn.
+        output_dir (str): Where result CSVs and status files are written.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, output_dir=PREDICTIONS_DIR):
+        self.max_workers = max(1, int(max_workers))
+        self.output_dir = output_dir
+        self.jobs = {}
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="scoring-job")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        name="job-manager", daemon=True)
+        self._thread.start()
+        self._slots = self._call(self._make_semaphore)
+
+    async def _make_semaphore(self):
+        return asyncio.Semaphore(self.max_workers)
+
+    def _call(self, coroutine_fn, *args):
+        return asyncio.run_coroutine_threadsafe(coroutine_fn(*args), self._loop).result()
+
+    def submit(self, input_path, model_path=FINAL_PIPELINE_PATH, chunksize=DEFAULT_CHUNKSIZE,
+               remove_input=False):
+        """
+        Validate `input_path` and queue it for scoring. Returns the job ID.
+        Raises FileNotFoundError / ValueError for missing files or columns.
+        With `remove_input`, the input file is deleted once the job has finished.
+        """
+        header = pd.read_csv(input_path, nrows=0).columns
+        check_raw_columns(header, load_feature_schema())
+
+        job_id = uuid.uuid4().hex[:12]
+        output_path = os.path.join(self.output_dir, f"{job_id}.csv")
+        job = Job(job_id, input_path, model_path, output_path, chunksize, remove_input)
+        self.jobs[job_id] = job
+        asyncio.run_coroutine_threadsafe(self._run(job), self._loop)
+        print(f"[INFO] Queued scoring job {job_id} for {input_path}")
+        return job_id
+
+    async def _run(self, job):
+        async with self._slots:
+            job.status = RUNNING
+            job.started_at = time.time()
+            loop = asyncio.get_running_loop()
+            try:
+                job.total_rows = await loop.run_in_executor(self._executor, count_rows, job.input_path)
+                summary = await loop.run_in_executor(
+                    self._executor, self._score, job)
+                job.rows_done = summary["rows"]
+                job.status = COMPLETED
+            except Exception as e:
+                job.status = FAILED
+                job.error = f"{type(e).__name__}: {e}"
+            job.finished_at = time.time()
+            if job.remove_input and os.path.exists(job.input_path):
+                os.remove(job.input_path)
+            self._write_status(job)
+            print(f"[INFO] Scoring job {job.job_id} {job.status} "
+                  f"({job.rows_done:,} rows in {job.finished_at - job.started_at:.1f}s)")
+
+    def _score(self, job):
+        return predict_csv_in_chunks(
+            input_path=job.input_path,
+            model_path=job.model_path,
+            save_output_path=job.output_path,
+            chunksize=job.chunksize,
+            progress=job._update_progress,
+            raise_errors=True,
+        )
+
+    def _write_status(self, job):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, f"{job.job_id}.json"), "w") as f:
+            json.dump(job.to_dict(), f, indent=2)
+
+    def get(self, job_id):
+        """Status dict for `job_id` (from memory, or its status file), or None."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        status_path = os.path.join(self.output_dir, f"{job_id}.json")
+        if os.path.exists(status_path):
+            with open(status_path) as f:
+                return json.load(f)
+        return None
+
+    def list(self):
+        """Status of every job submitted in this process, newest first."""
+        jobs = sorted(self.jobs.values(), key=lambda job: job.submitted_at, reverse=True)
+        return [job.to_dict() for job in jobs]
+
+    def result(self, job_id):
+        """DataFrame of predictions for a completed job, or None if not available."""
+        status = self.get(job_id)
+        if status is None or status["status"] != COMPLETED:
+            return None
+        return pd.read_csv(status["output_path"])
+
+    def shutdown(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+
+def get_job_manager(max_workers=DEFAULT_MAX_WORKERS):
+    """Return the process-wide JobManager, starting it on first use."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(max_workers)
+        return _manager
+
+
+def submit_job(input_path, model_path=FINAL_PIPELINE_PATH, chunksize=DEFAULT_CHUNKSIZE):
+    return get_job_manager().submit(input_path, model_path, chunksize)
+
+
+def get_job(job_id):
+    return get_job_manager().get(job_id)
+
+
+def job_result(job_id):
+    return get_job_manager().result(job_id)
@@ -0,0 +1,297 @@
+"""
+Heritage Housing – Model Compression
+
+Purpose:
+Produces smaller variants of the final Random Forest pipeline for the dashboard
+deployment, where slug size and memory are limited, and promotes one only if its
+accuracy on the test set stays within a configured tolerance.
+
+Variants (all built on the flat tree engine, see utils/tree_engine.py):
+- flat:              the exported forest as-is (compact index dtypes)
+- float32:           thresholds stored as float32
+- quantised:         float32 thresholds + leaf values quantised to uint16
+- pruned_<k>:        quantised, keeping only k trees chosen by greedy forward
+                     selection on out-of-bag R² (trees are added one at a time,
+                     each time picking the tree that most improves the ensemble);
+                     k is the smallest size within `--prune-tolerance` of the
+                     full forest's out-of-bag R². Out-of-bag rows come from the
+                     forest's `estimators_samples_` (scikit-learn >= 1.4); older
+                     versions prune on in-sample R²
+
+The train/test split is rebuilt from the cleaned data through the deployment
+FeatureEngineer (as in utils/intervals.py and utils/neighbours.py), so it matches the
+layout the model is served. Each variant is scored on the test split (log sale price)
+and reported with artefact size, load time and single-row latency, next to its change
+in R² and MAE against the Random Forest row of `outputs/metrics/test_set_results.csv`.
+If the uncompressed model itself is more than `BASELINE_R2_TOLERANCE` away from that
+row, the data does not match the model and the run stops. The smallest variant
+within `--max-r2-drop` and `--max-mae-increase` is saved as the slim pipeline, which
+the dashboard serves when present (see `serving_pipeline_path`). Once a variant is
+promoted, the full pickle can be listed in `.slugignore`.
+
+Usage:
+    python -m utils.model_compression --max-r2-drop 0.005 --max-mae-increase 0.005
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+
+from utils.data_io import read_dataset
+from utils.feature_engineering import load_feature_engineer
+from utils.model_registry import FINAL_PIPELINE_PATH, SLIM_PIPELINE_PATH
+from utils.schema import CLEANED_DATA_PATH, RANDOM_STATE, TARGET_COL, TEST_SIZE
+from utils.tree_engine import FlatForest, final_estimator, flatten_model, replace_final_estimator
+
+
+TEST_RESULTS_PATH = "outputs/metrics/test_set_results.csv"
+REPORT_PATH = "outputs/metrics/model_compression_report.csv"
+BASELINE_MODEL = "Random Forest"
+
+DEFAULT_MAX_R2_DROP = 0.005
+DEFAULT_MAX_MAE_INCREASE = 0.005
+# Largest gap between the uncompressed model's test R² and the recorded baseline
+BASELINE_R2_TOLERANCE = 0.02
+DEFAULT_PRUNE_TOLERANCE = 0.002
+QUANTISATION_LEVELS = np.iinfo(np.uint16).max
+
+
+def compact_indices(forest):
+    """Store feature indices in the smallest unsigned dtype that fits."""
+    params = forest.get_params()
+    params["feature"] = forest.feature.astype(np.min_scalar_type(max(forest.n_features - 1, 0)))
+    return FlatForest(**params)
+
+
+def float32_thresholds(forest):
+    params = forest.get_params()
+    params["threshold"] = forest.threshold.astype(np.float32)
+    return FlatForest(**params)
+
+
+def quantise_leaves(forest, levels=QUANTISATION_LEVELS):
+    """
+    Store node values as uint16 on an even grid between their min and max;
+    the largest error per tree is half a grid step.
+    """
+    values = forest.node_values()
+    low, high = float(values.min()), float(values.max())
+    step = (high - low) / levels or 1.0
+    params = forest.get_params()
+    params["value"] = np.round((values - low) / step).astype(np.uint16)
+    params["value_scale"] = step
+    params["value_offset"] = low
+    return FlatForest(**params)
+
+
+def _oob_mask(forest_estimator, n_samples):
+    """(n_samples, n_trees) mask of rows each tree did not see during training."""
+    samples = forest_estimator.estimators_samples_
+    mask = np.ones((n_samples, len(samples)), dtype=bool)
+    for t, in_bag in enumerate(samples):
+        mask[in_bag, t] = False
+    return mask
+
+
+def _ensemble_r2(y, sums, counts):
+    covered = counts > 0
+    return r2_score(y[covered], sums[covered] / counts[covered])
+
+
+def greedy_tree_order(per_tree, y, mask):
+    """
+    Forward selection: repeatedly add the tree that gives the lowest mean
+    squared error of the (masked) ensemble mean. Returns (order, r2_by_size).
+    """
+    n_rows, n_trees = per_tree.shape
+    weighted = per_tree * mask
+    sums = np.zeros(n_rows)
+    counts = np.zeros(n_rows)
+    remaining = list(range(n_trees))
+    order, r2_by_size = [], []
+    while remaining:
+        cand_sums = sums[:, None] + weighted[:, remaining]
+        cand_counts = counts[:, None] + mask[:, remaining]
+        covered = cand_counts > 0
+        residual = np.where(covered, y[:, None] - cand_sums / np.maximum(cand_counts, 1), 0.0)
+        mse = (residual ** 2).sum(axis=0) / np.maximum(covered.sum(axis=0), 1)
+        best = remaining.pop(int(np.argmin(mse)))
+        order.append(best)
+        sums += weighted[:, best]
+        counts += mask[:, best]
+        r2_by_size.append(_ensemble_r2(y, sums, counts))
+    return order, r2_by_size
+
+
+def prune_forest(pipeline, forest, X_train, y_train, tolerance=DEFAULT_PRUNE_TOLERANCE):
+    """
+    Keep the fewest trees whose out-of-bag R² is within `tolerance` of the
+    full forest. Falls back to in-sample R² if the forest has no bootstrap or
+    does not expose its bootstrap samples (scikit-learn < 1.4).
+    """
+    estimator = final_estimator(pipeline)
+    features = pipeline[:-1].transform(X_train)
+    per_tree = forest.tree_predictions(features)
+    if not getattr(estimator, "bootstrap", False):
+        print("[WARNING] Forest was fitted without bootstrap; pruning on in-sample R².")
+        mask = np.ones_like(per_tree)
+    elif not hasattr(estimator, "estimators_samples_"):
+        print("[WARNING] This scikit-learn does not expose bootstrap samples; pruning on in-sample R².")
+        mask = np.ones_like(per_tree)
+    else:
+        mask = _oob_mask(estimator, len(features)).astype(np.float64)
+
+    order, r2_by_size = greedy_tree_order(per_tree, y_train, mask)
+    full_r2 = r2_by_size[-1]
+    k = next(size for size, r2 in enumerate(r2_by_size, start=1) if r2 >= full_r2 - tolerance)
+    print(f"[INFO] Pruning: {k}/{forest.n_trees} trees keep out-of-bag R² "
+          f"{r2_by_size[k - 1]:.4f} (full forest {full_r2:.4f})")
+    return forest.select_trees(sorted(order[:k]))
+
+
+def build_variants(pipeline, X_train, y_train, prune_tolerance=DEFAULT_PRUNE_TOLERANCE):
+    """Return {name: pipeline} for every compressed variant, largest first."""
+    flat = compact_indices(final_estimator(flatten_model(pipeline)))
+    small = float32_thresholds(flat)
+    quantised = quantise_leaves(small)
+    pruned = prune_forest(pipeline, quantised, X_train, y_train, prune_tolerance)
+    forests = {"flat": flat, "float32": small, "quantised": quantised,
+               f"pruned_{pruned.n_trees}": pruned}
+    return {name: replace_final_estimator(pipeline, forest) for name, forest in forests.items()}
+
+
+def _file_stats(model, path, repeats=3):
+    joblib.dump(model, path, compress=3)
+    load_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        joblib.load(path)
+        load_times.append(time.perf_counter() - start)
+    return os.path.getsize(path), float(np.median(load_times))
+
+
+def _row_latency(model, row, repeats=100):
+    model.predict(row)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def _n_trees(model):
+    estimator = final_estimator(model)
+    return estimator.n_trees if isinstance(estimator, FlatForest) else len(estimator.estimators_)
+
+
+def evaluate_variant(name, model, X_test, y_test, baseline, work_dir):
+    """Size, load time, latency and test metrics of one variant."""
+    size, load_seconds = _file_stats(model, os.path.join(work_dir, f"{name}.joblib"))
+    predictions = model.predict(X_test)
+    r2 = r2_score(y_test, predictions)
+    mae = mean_absolute_error(y_test, predictions)
+    return {
+        "Variant": name,
+        "Trees": _n_trees(model),
+        "Size (KB)": round(size / 1024, 1),
+        "Load time (ms)": round(load_seconds * 1000, 2),
+        "Single-row latency (ms)": round(_row_latency(model, X_test.iloc[[0]]) * 1000, 3),
+        "Test R2": round(r2, 4),
+        "Test MAE": round(mae, 4),
+        "Test RMSE": round(float(np.sqrt(mean_squared_error(y_test, predictions))), 4),
+        "Delta R2": round(r2 - baseline["Test R2"], 4),
+        "Delta MAE": round(mae - baseline["Test MAE"], 4),
+    }
+
+
+def split_data(cleaned_path=CLEANED_DATA_PATH, feature_engineer=None):
+    """
+    Engineered features and log sale prices of the training split and the
+    held-out test split: (X_train, y_train, X_test, y_test).
+    """
+    cleaned = read_dataset(cleaned_path)
+    train, test = train_test_split(cleaned, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+    feature_engineer = feature_engineer or load_feature_engineer()
+    return (feature_engineer.transform(train), np.log1p(train[TARGET_COL].to_numpy(dtype=np.float64)),
+            feature_engineer.transform(test), np.log1p(test[TARGET_COL].to_numpy(dtype=np.float64)))
+
+
+def load_baseline(path=TEST_RESULTS_PATH, model_name=BASELINE_MODEL):
+    """The reported test metrics of the deployed model."""
+    results = pd.read_csv(path)
+    return results.loc[results["Model"] == model_name].iloc[0].to_dict()
+
+
+def compress(model_path=FINAL_PIPELINE_PATH, output_path=SLIM_PIPELINE_PATH,
+             report_path=REPORT_PATH, max_r2_drop=DEFAULT_MAX_R2_DROP,
+             max_mae_increase=DEFAULT_MAX_MAE_INCREASE, prune_tolerance=DEFAULT_PRUNE_TOLERANCE):
+    """
+    Build, evaluate and report every variant; promote the smallest one within
+    tolerance to `output_path`. Returns the report DataFrame.
+    """
+    pipeline = joblib.load(model_path)
+    X_train, y_train, X_test, y_test = split_data()
+    baseline = load_baseline()
+    original_r2 = r2_score(y_test, pipeline.predict(X_test))
+    if abs(original_r2 - baseline["Test R2"]) > BASELINE_R2_TOLERANCE:
+        raise ValueError(
+            f"[ERROR] {model_path} scores test R² {original_r2:.4f} on the rebuilt test split, but "
+            f"{TEST_RESULTS_PATH} records {baseline['Test R2']:.4f}; the model and the data do not "
+            "match (retrain with train_pipeline.py).")
+
+    candidates = {"original": pipeline, **build_variants(pipeline, X_train, y_train, prune_tolerance)}
+    with tempfile.TemporaryDirectory() as work_dir:
+        rows = [evaluate_variant(name, model, X_test, y_test, baseline, work_dir)
+                for name, model in candidates.items()]
+    report = pd.DataFrame(rows)
+    report["Within tolerance"] = (report["Delta R2"] >= -max_r2_drop) & (report["Delta MAE"] <= max_mae_increase)
+
+    eligible = report[(report["Variant"] != "original") & report["Within tolerance"]]
+    report["Promoted"] = False
+    if eligible.empty:
+        print("[WARNING] No compressed variant stayed within tolerance; nothing promoted.")
+    else:
+        best = eligible.sort_values("Size (KB)").iloc[0]["Variant"]
+        report.loc[report["Variant"] == best, "Promoted"] = True
+        joblib.dump(candidates[best], output_path, compress=3)
+        print(f"[SAVED] Promoted variant '{best}' saved to: {output_path}")
+
+    report.to_csv(report_path, index=False)
+    print(report.to_string(index=False))
+    print(f"[SAVED] Compression report saved to: {report_path}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and evaluate compressed model variants.")
+    parser.add_argument("--model", default=FINAL_PIPELINE_PATH)
+    parser.add_argument("--output", default=SLIM_PIPELINE_PATH)
+    parser.add_argument("--report", default=REPORT_PATH)
+    parser.add_argument("--max-r2-drop", type=float, default=DEFAULT_MAX_R2_DROP,
+                        help="Largest allowed fall in test R² vs test_set_results.csv.")
+    parser.add_argument("--max-mae-increase", type=float, default=DEFAULT_MAX_MAE_INCREASE,
+                        help="Largest allowed rise in test MAE (log scale).")
+    parser.add_argument("--prune-tolerance", type=float, default=DEFAULT_PRUNE_TOLERANCE,
+                        help="Out-of-bag R² the pruned forest may give up.")
+    args = parser.parse_args(argv)
+    try:
+        compress(args.model, args.output, args.report, args.max_r2_drop,
+                 args.max_mae_increase, args.prune_tolerance)
+    except ValueError as e:
+        print(e)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    # Import through the package so pickled variants reference utils.tree_engine
+    from utils.model_compression import main as _main
+    raise SystemExit(_main())
@@ -0,0 +1,154 @@
+"""
+Heritage Housing – Model Registry
+
+Purpose:
+Loads serialized artefacts from `outputs/models/` once per process and shares the
+same instance with every caller (all Streamlit sessions, batch scripts and helpers).
+
+Each artefact is keyed by its absolute path plus the file's mtime and size. A lookup
+only costs an `os.stat`; when the file on disk changes (e.g. a retrained pipeline is
+written over the old one) the next lookup reloads it, so the dashboard picks up new
+models without a restart.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+import joblib
+
+from utils.instrumentation import timed
+
+
+MODEL_DIR = "outputs/models"
+FINAL_PIPELINE_PATH = os.path.join(MODEL_DIR, "final_random_forest_pipeline.pkl")
+# Compressed variant promoted by utils/model_compression.py, if any
+SLIM_PIPELINE_PATH = os.path.join(MODEL_DIR, "final_random_forest_pipeline_slim.joblib")
+ARTIFACT_EXTENSIONS = (".pkl", ".joblib")
+
+_registry = {}
+_registry_lock = threading.Lock()
+_load_locks = {}
+
+
+class _Entry:
+    """A loaded artefact together with the file version it was loaded from."""
+
+    __slots__ = ("path", "stamp", "digest", "artifact", "load_seconds", "loaded_at")
+
+    def __init__(self, path, stamp, digest, artifact, load_seconds):
+        self.path = path
+        self.stamp = stamp
+        self.digest = digest
+        self.artifact = artifact
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+
+
+def file_stamp(path):
+    """Return the (mtime_ns, size) pair used to detect a changed artefact."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def file_digest(path, block_size=1 << 20):
+    """Return the SHA-256 hex digest of a file, read in blocks."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _load_lock(path):
+    with _registry_lock:
+        return _load_locks.setdefault(path, threading.Lock())
+
+
+def _get_entry(path):
+    abs_path = os.path.abspath(path)
+    entry = _registry.get(abs_path)
+    if entry is not None and entry.stamp == file_stamp(abs_path):
+        return entry
+
+    # One loader per path: concurrent sessions wait for the first load
+    # instead of each unpickling the same file.
+    with _load_lock(abs_path):
+        stamp = file_stamp(abs_path)
+        entry = _registry.get(abs_path)
+        if entry is not None and entry.stamp == stamp:
+            return entry
+
+        action = "Reloading" if entry is not None else "Loading"
+        print(f"[INFO] {action} model artefact: {path}")
+        start = time.perf_counter()
+        with timed("artifact_load"):
+            artifact = joblib.load(abs_path)
+        elapsed = time.perf_counter() - start
+
+        entry = _Entry(abs_path, stamp, file_digest(abs_path), artifact, elapsed)
+        _registry[abs_path] = entry
+        return entry
+
+
+def get_model(path=FINAL_PIPELINE_PATH):
+    """
+    Return the shared artefact stored at `path`, loading it on first use
+    and reloading it whenever the file changes on disk.
+    """
+    return _get_entry(path).artifact
+
+
+def model_version(path=FINAL_PIPELINE_PATH):
+    """
+    Return the content hash of the artefact currently served for `path`.
+    Useful as a cache key for anything derived from the model.
+    """
+    return _get_entry(path).digest
+
+
+def serving_pipeline_path():
+    """
+    Pipeline the dashboard should serve: the promoted slim variant when one
+    exists, otherwise the full final pipeline.
+    """
+    return SLIM_PIPELINE_PATH if os.path.exists(SLIM_PIPELINE_PATH) else FINAL_PIPELINE_PATH
+
+
+def preload(model_dir=MODEL_DIR):
+    """
+    Warm the registry with every artefact in `model_dir`.
+    Returns the list of paths that loaded successfully.
+    """
+    loaded = []
+    for name in sorted(os.listdir(model_dir)):
+        if not name.endswith(ARTIFACT_EXTENSIONS):
+            continue
+        path = os.path.join(model_dir, name)
+        try:
+            get_model(path)
+            loaded.append(path)
+        except Exception as e:
+            print(f"[WARNING] Could not preload {path}: {e}")
+    return loaded
+
+
+def loaded_models():
+    """Return a summary of the artefacts currently held in memory."""
+    return [
+        {
+            "path": entry.path,
+            "sha256": entry.digest,
+            "size_bytes": entry.stamp[1],
+            "load_seconds": round(entry.load_seconds, 4),
+            "loaded_at": entry.loaded_at,
+        }
+        for entry in list(_registry.values())
+    ]
+
+
+def clear():
+    """Drop every cached artefact (the next lookup reloads from disk)."""
+    with _registry_lock:
+        _registry.clear()
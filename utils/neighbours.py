@@ -0,0 +1,235 @@
+"""
+Heritage Housing – Nearest-Neighbour Index
+
+Purpose:
+Measures how closely a property matches the sales the model was trained on, and finds
+the most comparable training sales, so "confidence is higher for inputs that closely
+match the training data" becomes a number shown with every prediction.
+
+- A KD-tree is built once over the training sales (the 80/20 training split of the
+  cleaned data) in the model's own scaled feature space: raw rows go through the
+  FeatureEngineer and the pipeline's preprocessor (imputer + standard scaler), exactly
+  as they do before `predict`
+- The out-of-distribution score of a property is its mean distance to its 5 nearest
+  training sales, reported with its percentile among the same distance for every
+  training sale (leave-one-out). 95 means only 5% of training sales sit further from
+  their neighbours; above `OOD_PERCENTILE` the property is flagged as unusual
+- Queries are one vectorised `KDTree.query` call per batch
+- The index is saved next to the model (`<model>_neighbours.joblib`) with the model's
+  and the training data's content hashes, and rebuilt only when either changes
+
+Batch outputs gain `NN_Distance`, `OOD_Percentile` and `Comparable_Records` (row numbers
+of the nearest sales in the cleaned data, nearest first).
+
+Usage:
+    python -m utils.neighbours --build
+    python -m utils.neighbours --benchmark
+"""
+
+import argparse
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.neighbors import KDTree
+
+from utils.data_io import read_dataset, resolve_dataset
+from utils.feature_engineering import load_feature_engineer
+from utils.instrumentation import timed
+from utils.model_registry import FINAL_PIPELINE_PATH, file_digest, file_stamp, get_model, model_version
+from utils.schema import CLEANED_DATA_PATH, RANDOM_STATE, TEST_SIZE
+
+
+N_NEIGHBOURS = 5
+OOD_PERCENTILE = 95.0
+DISTANCE_COL = "NN_Distance"
+PERCENTILE_COL = "OOD_Percentile"
+COMPARABLES_COL = "Comparable_Records"
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+_data_digests = {}
+
+
+def index_path(model_path):
+    """Where the neighbour index of the model at `model_path` is kept."""
+    return os.path.splitext(model_path)[0] + "_neighbours.joblib"
+
+
+def data_version(path=CLEANED_DATA_PATH):
+    """
+    Content hash of the file `read_dataset` reads for `path` (its Parquet copy or
+    the CSV), recomputed only when that file changes.
+    """
+    abs_path = os.path.abspath(resolve_dataset(path))
+    stamp = file_stamp(abs_path)
+    cached = _data_digests.get(abs_path)
+    if cached is None or cached[0] != stamp:
+        cached = _data_digests[abs_path] = (stamp, file_digest(abs_path))
+    return cached[1]
+
+
+class NeighbourIndex:
+    """
+    KD-tree over the scaled training sales of one model.
+
+    Parameters:
+        pipeline: Fitted pipeline whose steps before the last scale the features.
+        tree (KDTree): Tree over the scaled training sales.
+        reference (ndarray): Sorted leave-one-out distance scores of the training sales.
+        sales (DataFrame): Cleaned training rows (raw columns and SalePrice);
+            the index labels are the row numbers in the cleaned data.
+        n_neighbours (int): Neighbours averaged into the distance score.
+    """
+
+    def __init__(self, pipeline, tree, reference, sales, n_neighbours=N_NEIGHBOURS):
+        self.preprocessor = pipeline[:-1]
+        self.tree = tree
+        self.reference = reference
+        self.sales = sales
+        self.n_neighbours = n_neighbours
+
+    @classmethod
+    def build(cls, pipeline, sales, feature_engineer, n_neighbours=N_NEIGHBOURS):
+        """Scale the training sales with the pipeline's preprocessor and index them."""
+        points = np.ascontiguousarray(pipeline[:-1].transform(feature_engineer.transform(sales)),
+                                      dtype=np.float64)
+        tree = KDTree(points)
+        # Leave-one-out score of every training sale: its first neighbour is itself
+        distances, _ = tree.query(points, k=n_neighbours + 1)
+        return cls(pipeline, tree, np.sort(distances[:, 1:].mean(axis=1)), sales, n_neighbours)
+
+    def state(self):
+        """What is saved to disk; the preprocessor comes from the model itself."""
+        return {"tree": self.tree, "reference": self.reference, "sales": self.sales,
+                "n_neighbours": self.n_neighbours}
+
+    def _scale(self, features):
+        return np.ascontiguousarray(self.preprocessor.transform(features), dtype=np.float64)
+
+    def query(self, features, k=None):
+        """
+        Score engineered feature rows. Returns (distance score, percentile among
+        training sales, (n_rows, k) cleaned-data row numbers of the nearest sales).
+        """
+        k = k or self.n_neighbours
+        with timed("neighbours", rows=len(features)):
+            distances, positions = self.tree.query(self._scale(features), k=max(k, self.n_neighbours))
+            score = distances[:, :self.n_neighbours].mean(axis=1)
+            percentile = 100.0 * np.searchsorted(self.reference, score, side="right") / len(self.reference)
+            return score, percentile, self.sales.index.to_numpy()[positions[:, :k]]
+
+    def comparables(self, features, k=None):
+        """Nearest training sales of the first row of `features`, nearest first."""
+        _, _, records = self.query(features.iloc[:1], k)
+        return self.sales.loc[records[0]]
+
+
+def training_sales(cleaned_path=CLEANED_DATA_PATH):
+    """Training split of the cleaned data, indexed by row number in the file."""
+    cleaned = read_dataset(cleaned_path)
+    train, _ = train_test_split(cleaned, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+    return train.sort_index()
+
+
+def build_index(model_path=FINAL_PIPELINE_PATH, cleaned_path=CLEANED_DATA_PATH, output_path=None):
+    """Build the neighbour index for the model at `model_path` and save it next to it."""
+    output_path = output_path or index_path(model_path)
+    start = time.perf_counter()
+    index = NeighbourIndex.build(get_model(model_path), training_sales(cleaned_path), load_feature_engineer())
+    payload = {
+        "model_sha256": model_version(model_path),
+        "data_sha256": data_version(cleaned_path),
+        **index.state(),
+    }
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    joblib.dump(payload, output_path)
+    print(f"[INFO] Neighbour index over {len(index.sales):,} training sales built in "
+          f"{time.perf_counter() - start:.2f}s")
+    print(f"[SAVED] Neighbour index saved to: {output_path}")
+    return index
+
+
+def load_index(model_path=FINAL_PIPELINE_PATH, cleaned_path=CLEANED_DATA_PATH):
+    """The saved index if it matches the model and training data, else a fresh one."""
+    path = index_path(model_path)
+    if os.path.exists(path):
+        payload = joblib.load(path)
+        if payload.get("model_sha256") == model_version(model_path) \
+                and payload.get("data_sha256") == data_version(cleaned_path):
+            return NeighbourIndex(get_model(model_path), payload["tree"], payload["reference"],
+                                  payload["sales"], payload["n_neighbours"])
+    print(f"[INFO] Neighbour index missing or stale; rebuilding for {model_path}")
+    return build_index(model_path, cleaned_path)
+
+
+def get_neighbour_index(model_path=FINAL_PIPELINE_PATH, cleaned_path=CLEANED_DATA_PATH):
+    """
+    Return the process-wide NeighbourIndex for the model at `model_path`,
+    reloaded only when the model or the training data changes.
+    """
+    version = (model_version(model_path), data_version(cleaned_path))
+    cache_key = os.path.abspath(model_path)
+    with _indexes_lock:
+        entry = _indexes.get(cache_key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+    index = load_index(model_path, cleaned_path)
+    with _indexes_lock:
+        _indexes[cache_key] = (version, index)
+    return index
+
+
+def add_neighbours(df, index, features):
+    """Append the distance score, its percentile and comparable records to `df` in place."""
+    score, percentile, records = index.query(features)
+    df[DISTANCE_COL] = score
+    df[PERCENTILE_COL] = np.round(percentile, 1)
+    df[COMPARABLES_COL] = [";".join(map(str, row)) for row in records]
+    return df
+
+
+def benchmark(model_path=FINAL_PIPELINE_PATH, batch_rows=(1, 1_000, 100_000), repeats=5):
+    """Time index queries against a plain pipeline.predict on engineered rows."""
+    pipeline = get_model(model_path)
+    index = get_neighbour_index(model_path)
+    features = load_feature_engineer().transform(read_dataset(CLEANED_DATA_PATH))
+    rows = []
+    for n in batch_rows:
+        batch = features.iloc[np.resize(np.arange(len(features)), n)]
+        timings = {}
+        for name, fn in (("predict", pipeline.predict), ("neighbours", index.query)):
+            fn(batch)
+            samples = []
+            for _ in range(repeats if n <= 1_000 else 2):
+                start = time.perf_counter()
+                fn(batch)
+                samples.append(time.perf_counter() - start)
+            timings[name] = float(np.median(samples))
+        rows.append({
+            "Rows": n,
+            "Predict (ms)": round(timings["predict"] * 1000, 3),
+            "Neighbours (ms)": round(timings["neighbours"] * 1000, 3),
+        })
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nearest-neighbour index over the training sales.")
+    parser.add_argument("--model", default=FINAL_PIPELINE_PATH)
+    parser.add_argument("--build", action="store_true", help="(Re)build the index for --model.")
+    parser.add_argument("--benchmark", action="store_true", help="Time queries against predict.")
+    args = parser.parse_args(argv)
+
+    if args.build:
+        build_index(args.model)
+    if args.benchmark:
+        print(benchmark(args.model).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Heritage Housing – Parallel Batch Scoring
+
+Purpose:
+Scores large raw CSV files across a pool of worker processes.
+
+The parent process reads the input in shards (pandas chunks), hands each shard to a
+worker and writes results back in input order. Each worker loads the pipeline once in
+its initializer through the model registry, receives the fitted FeatureEngineer
+once, and keeps both for every shard it receives.
+
+Workers run the forest single-threaded so that tree outputs are summed in a fixed
+order; this keeps results bit-for-bit identical to a sequential single-threaded run,
+which `verify=True` checks shard by shard.
+"""
+
+import copy
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.deployment_pipeline import (
+    DEFAULT_CHUNKSIZE,
+    _add_predictions,
+    _predict_raw,
+)
+from utils.feature_engineering import load_feature_engineer
+from utils.model_registry import get_model
+
+
+_worker_pipeline = None
+_worker_engineer = None
+
+
+def single_threaded(model_pipeline):
+    """
+    Return a shallow copy of `model_pipeline` whose final estimator uses n_jobs=1.
+    Fitted attributes (trees, scaler statistics) are shared, not copied.
+    """
+    pipeline = copy.copy(model_pipeline)
+    pipeline.steps = list(model_pipeline.steps)
+    name, estimator = pipeline.steps[-1]
+    if hasattr(estimator, "n_jobs"):
+        estimator = copy.copy(estimator)
+        estimator.n_jobs = 1
+        pipeline.steps[-1] = (name, estimator)
+    return pipeline
+
+
+def _init_worker(model_path, feature_engineer):
+    global _worker_pipeline, _worker_engineer
+    _worker_pipeline = single_threaded(get_model(model_path))
+    _worker_engineer = feature_engineer
+
+
+def _score_shard(shard):
+    return _predict_raw(_worker_pipeline, _worker_engineer, shard)
+
+
+def _same_bits(a, b):
+    a = np.ascontiguousarray(a, dtype=np.float64)
+    b = np.ascontiguousarray(b, dtype=np.float64)
+    return a.shape == b.shape and np.array_equal(a.view(np.uint64), b.view(np.uint64))
+
+
+def predict_csv_parallel(input_path, model_path, save_output_path, workers,
+                         chunksize=DEFAULT_CHUNKSIZE, verify=False):
+    """
+    Score `input_path` with `workers` processes and write predictions in input order.
+
+    At most two shards per worker are in flight at any time, so memory stays
+    bounded by roughly `2 * workers * chunksize` rows. With `verify=True` every
+    shard is also scored sequentially in the parent and compared bit for bit.
+
+    If verification finds any mismatch the output is not published: the partial
+    file is removed and None is returned.
+
+    Returns a summary dict (rows, shards, workers, seconds, rows_per_second and,
+    when verifying, mismatched_rows), or None if the run failed.
+    """
+    part_path = f"{save_output_path}.part"
+    try:
+        feature_engineer = load_feature_engineer()
+        reference = single_threaded(get_model(model_path)) if verify else None
+        os.makedirs(os.path.dirname(save_output_path) or ".", exist_ok=True)
+
+        total_rows = 0
+        n_shards = 0
+        mismatched = 0
+        max_in_flight = 2 * workers
+        pending = deque()
+        start = time.perf_counter()
+
+        def write_next(out):
+            nonlocal total_rows, n_shards, mismatched
+            shard, future = pending.popleft()
+            predictions = future.result()
+            if verify:
+                expected = _predict_raw(reference, feature_engineer, shard)
+                if not _same_bits(predictions, expected):
+                    mismatched += int(np.sum(predictions != expected))
+            _add_predictions(shard, predictions)
+            shard.to_csv(out, header=(n_shards == 0), index=False)
+            n_shards += 1
+            total_rows += len(shard)
+            elapsed = time.perf_counter() - start
+            print(f"[INFO] Shard {n_shards}: {total_rows:,} rows scored "
+                  f"({total_rows / elapsed:,.0f} rows/s)")
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model_path, feature_engineer)) as pool, \
+                open(part_path, "w", newline="") as out:
+            for shard in pd.read_csv(input_path, chunksize=chunksize):
+                pending.append((shard, pool.submit(_score_shard, shard)))
+                if len(pending) >= max_in_flight:
+                    write_next(out)
+            while pending:
+                write_next(out)
+
+        if verify and mismatched:
+            os.remove(part_path)
+            print(f"[ERROR] Verification failed: {mismatched} rows differ from the sequential path; "
+                  f"output not written to {save_output_path}.")
+            return None
+
+        os.replace(part_path, save_output_path)
+        elapsed = time.perf_counter() - start
+        summary = {
+            "rows": total_rows,
+            "shards": n_shards,
+            "workers": workers,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(total_rows / elapsed, 1) if elapsed else 0.0,
+        }
+        print(f"[INFO] Predictions saved to: {save_output_path}")
+        print(f"[INFO] Scored {total_rows:,} rows with {workers} workers in {elapsed:.2f}s "
+              f"({summary['rows_per_second']:,.0f} rows/s)")
+
+        if verify:
+            summary["mismatched_rows"] = mismatched
+            print("[INFO] Verification passed: parallel output matches the sequential path bit for bit.")
+        return summary
+
+    except Exception as e:
+        print(f"[ERROR] Parallel prediction failed: {e}")
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return None
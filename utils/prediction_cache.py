@@ -0,0 +1,208 @@
+"""
+Heritage Housing – Prediction Cache
+
+Purpose:
+Remembers recent predictions so identical property profiles are not re-scored by the
+Random Forest, whether they come from repeated form submits or repeated rows in a
+batch file.
+
+- Keys are the raw bytes of the engineered feature row exactly as passed to
+  `pipeline.predict` (float64, with -0.0 folded into 0.0 and one NaN bit pattern),
+  taken for a whole frame at once through a void view, so two raw inputs that
+  engineer to the same features share an entry
+- Within one batch, duplicate rows are collapsed (`pd.factorize`) before the cache is
+  consulted, and only the remaining misses are sent to `predict`
+- Large batches probe the cache with their first `PROBE_ROWS` distinct rows; if
+  almost none hit, the rest of the batch skips the lookups and only the probe rows
+  are stored, so scoring a file of unique rows costs little more than `predict`
+- Entries are stored per model version (the artefact's content hash, see
+  utils/model_registry.py), so a retrained model never serves stale predictions and
+  callers using different models (e.g. the slim serving model and the full model)
+  do not evict each other's entries by switching. Entries are evicted
+  least-recently-used beyond `maxsize` (oldest versions first) and expire after
+  `ttl_seconds`
+
+There are two process-wide instances: `get_prediction_cache()` (INTERACTIVE) for the
+dashboard form and the prediction service, and `get_prediction_cache(BATCH)` for batch
+scoring, so one large batch cannot evict the interactive entries. `stats()` reports
+hits, misses and evictions for sizing.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_MAXSIZE = 100_000
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+INTERACTIVE = "interactive"
+BATCH = "batch"
+# Distinct rows looked up before deciding whether a large batch uses the cache at all
+PROBE_ROWS = 1024
+MIN_PROBE_HIT_RATE = 0.01
+
+_caches = {}
+_cache_lock = threading.Lock()
+
+
+def row_keys(features):
+    """
+    Canonical cache key (bytes) for every row of an engineered feature frame.
+    """
+    # DataFrame.to_numpy takes the fast per-block path; np.array(frame) does not
+    rows = features.to_numpy(dtype=np.float64) if hasattr(features, "to_numpy") else features
+    rows = np.ascontiguousarray(rows, dtype=np.float64) + 0.0
+    rows[np.isnan(rows)] = np.nan
+    if rows.ndim == 1:
+        rows = rows.reshape(1, -1)
+    return rows.view(np.dtype((np.void, rows.shape[1] * rows.itemsize))).ravel().tolist()
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU + TTL cache of single-row predictions.
+
+    Parameters:
+        maxsize (int): Most rows kept; the least recently used are evicted first.
+        ttl_seconds (float or None): Age after which an entry is ignored.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl_seconds = ttl_seconds
+        # model version -> OrderedDict(row key -> (value, stored at)); least recently used version first
+        self._versions = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.bypassed_rows = 0
+
+    def _entries(self, version):
+        entries = self._versions.get(version)
+        if entries is None:
+            entries = self._versions[version] = OrderedDict()
+        self._versions.move_to_end(version)
+        return entries
+
+    def lookup(self, keys, version):
+        """Cached values for `keys` (None where missing), counting hits and misses."""
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            entries = self._entries(version)
+            for key in keys:
+                entry = entries.get(key)
+                if entry is not None and self.ttl_seconds is not None and now - entry[1] > self.ttl_seconds:
+                    del entries[key]
+                    self._size -= 1
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    values.append(None)
+                else:
+                    self.hits += 1
+                    entries.move_to_end(key)
+                    values.append(entry[0])
+        return values
+
+    def store(self, keys, values, version):
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries(version)
+            for key, value in zip(keys, values):
+                if key not in entries:
+                    self._size += 1
+                entries[key] = (value, now)
+                entries.move_to_end(key)
+            while self._size > self.maxsize:
+                oldest_version, oldest = next(iter(self._versions.items()))
+                if oldest:
+                    oldest.popitem(last=False)
+                    self._size -= 1
+                    self.evictions += 1
+                if not oldest:
+                    del self._versions[oldest_version]
+
+    def predict(self, model_pipeline, features, version):
+        """
+        Predict every row of `features` with `model_pipeline`, serving repeated
+        and previously seen rows from the cache. `version` identifies the model.
+        """
+        if len(features) == 0:
+            return model_pipeline.predict(features)
+
+        # Collapse duplicate rows so each distinct profile is looked up once
+        keys = np.empty(len(features), dtype=object)
+        keys[:] = row_keys(features)
+        inverse, unique_keys = pd.factorize(keys)
+        first_rows = np.full(len(unique_keys), len(keys), dtype=np.intp)
+        np.minimum.at(first_rows, inverse, np.arange(len(keys)))
+        unique_keys = unique_keys.tolist()
+
+        # Large batches that miss on a probe of their rows skip the remaining lookups
+        probe = unique_keys[:PROBE_ROWS]
+        cached = self.lookup(probe, version)
+        if len(unique_keys) > len(probe):
+            if sum(value is not None for value in cached) >= MIN_PROBE_HIT_RATE * len(probe):
+                cached += self.lookup(unique_keys[len(probe):], version)
+                store_upto = len(unique_keys)
+            else:
+                cached += [None] * (len(unique_keys) - len(probe))
+                store_upto = len(probe)
+                with self._lock:
+                    self.bypassed_rows += len(unique_keys) - len(probe)
+        else:
+            store_upto = len(unique_keys)
+        missing = np.array([slot for slot, value in enumerate(cached) if value is None], dtype=np.intp)
+
+        values = np.array([np.nan if value is None else value for value in cached], dtype=np.float64)
+        if len(missing):
+            # All rows distinct and uncached: predict the frame as it is, without a copy
+            rows = features if len(missing) == len(keys) else features.iloc[first_rows[missing]]
+            fresh = np.asarray(model_pipeline.predict(rows), dtype=np.float64)
+            values[missing] = fresh
+            stored = missing[missing < store_upto]
+            self.store([unique_keys[slot] for slot in stored], fresh[:len(stored)].tolist(), version)
+
+        # Rows that are duplicates within this batch count as hits too
+        with self._lock:
+            self.hits += len(keys) - len(unique_keys)
+        return values[inverse]
+
+    def clear(self):
+        with self._lock:
+            self._versions.clear()
+            self._size = 0
+
+    def stats(self):
+        """Counters for sizing the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self._size,
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "bypassed_rows": self.bypassed_rows,
+                "model_versions": {str(version)[:12]: len(entries) for version, entries in self._versions.items()},
+            }
+
+
+def get_prediction_cache(name=INTERACTIVE):
+    """Return the process-wide PredictionCache `name` (INTERACTIVE or BATCH)."""
+    with _cache_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = _caches[name] = PredictionCache()
+        return cache
@@ -0,0 +1,360 @@
+"""
+Heritage Housing – Local Prediction Service
+
+Purpose:
+Serves price predictions over HTTP/JSON for other internal systems (e.g. case
+management), using the same deployment pipeline as the dashboard and `run_pipeline.py`.
+
+- The pipeline and FeatureEngineer are loaded once and kept warm in the process
+  (through the model registry, so a retrained model is picked up without a restart)
+- Concurrent single-property requests are collected into micro-batches: the batcher
+  waits at most `max_wait_ms` after the first request, or until `max_batch_size`
+  requests are queued, then scores them all with one vectorised `predict` call
+- If a batch fails (e.g. one request has an unusable value), its requests are
+  re-scored one by one so only the bad request gets an error; a property whose
+  prediction is not a finite number gets a 422 rather than invalid JSON
+- A request not answered within `request_timeout` seconds gets a 503 and is dropped
+  from the queue, so a stuck batcher cannot hold handler threads forever
+- The listen backlog is `REQUEST_BACKLOG` connections (socketserver's default is 5),
+  so bursts of concurrent clients queue up instead of being reset
+- Request latency percentiles, throughput and batch sizes are exposed at /metrics;
+  with HERITAGE_INSTRUMENTATION=1, per-stage timings (feature engineering, predict, ...)
+  are exposed too (see utils/instrumentation.py)
+
+Endpoints:
+    POST /predict    one property (JSON object) or several (JSON array of objects)
+    GET  /metrics    p50/p99 latency, throughput, batch and prediction-cache statistics
+    GET  /metrics/stages       per-stage timing snapshot (JSON)
+    GET  /metrics/prometheus   per-stage timings in Prometheus text format
+    GET  /health     model path and version currently served
+
+Usage:
+    python -m utils.prediction_service --port 8502 --max-batch-size 64 --max-wait-ms 5 --timeout 30
+
+    curl -X POST localhost:8502/predict -d '{"GrLivArea": 1500, "LotArea": 8000, ...}'
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from utils.deployment_pipeline import _predict_raw
+from utils.feature_engineering import load_feature_engineer
+from utils.instrumentation import prometheus_text, snapshot
+from utils.model_registry import FINAL_PIPELINE_PATH, get_model, model_version
+from utils.prediction_cache import get_prediction_cache
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8502
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 5.0
+DEFAULT_REQUEST_TIMEOUT = 30.0
+REQUEST_BACKLOG = 128
+LATENCY_WINDOW = 10_000
+THROUGHPUT_WINDOW_SECONDS = 60.0
+
+
+class LatencyStats:
+    """
+    Rolling request latency and throughput figures.
+
+    Keeps the last `window` request latencies for percentiles, and the
+    completion times within `throughput_window` seconds for requests/s.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW, throughput_window=THROUGHPUT_WINDOW_SECONDS):
+        self.throughput_window = throughput_window
+        self._latencies = deque(maxlen=window)
+        self._completed = deque()
+        self._batch_sizes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.started_at = time.time()
+
+    def record_request(self, seconds, ok=True):
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            self.errors += not ok
+            self._latencies.append(seconds)
+            self._completed.append(now)
+            while self._completed and now - self._completed[0] > self.throughput_window:
+                self._completed.popleft()
+
+    def record_batch(self, size):
+        with self._lock:
+            self.batches += 1
+            self._batch_sizes.append(size)
+
+    def snapshot(self):
+        """Return the current figures as a JSON-serialisable dict."""
+        now = time.monotonic()
+        with self._lock:
+            latencies = np.array(self._latencies)
+            completed = [t for t in self._completed if now - t <= self.throughput_window]
+            batch_sizes = np.array(self._batch_sizes)
+            summary = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "batches": self.batches,
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+            }
+
+        window = min(self.throughput_window, summary["uptime_seconds"]) or 1.0
+        summary["throughput_rps"] = round(len(completed) / window, 2)
+        if latencies.size:
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+            summary["latency_ms"] = {
+                "p50": round(float(p50), 3),
+                "p99": round(float(p99), 3),
+                "max": round(float(latencies.max()) * 1000, 3),
+            }
+        if batch_sizes.size:
+            summary["batch_size"] = {
+                "mean": round(float(batch_sizes.mean()), 2),
+                "max": int(batch_sizes.max()),
+            }
+        return summary
+
+
+class MicroBatcher:
+    """
+    Collects single-property requests from many threads and scores them
+    together on one background thread.
+
+    Parameters:
+        model_path (str): Serialized pipeline, served by the model registry.
+        max_batch_size (int): Most requests scored by one predict call.
+        max_wait_ms (float): Longest a request waits for others to join its batch.
+        request_timeout (float): Longest `predict` waits for its results (seconds).
+    """
+
+    def __init__(self, model_path=FINAL_PIPELINE_PATH, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, stats=None, request_timeout=DEFAULT_REQUEST_TIMEOUT):
+        self.model_path = model_path
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.request_timeout = request_timeout
+        self.stats = stats or LatencyStats()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Load the model and feature engineering, then start the batching thread."""
+        get_model(self.model_path)
+        load_feature_engineer()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join()
+
+    def submit(self, record):
+        """Queue one raw property (dict of column -> value); returns a Future."""
+        future = Future()
+        self._queue.put((record, future))
+        return future
+
+    def predict(self, records, timeout=None):
+        """
+        Score raw properties through the batcher, blocking for at most `timeout`
+        seconds in total (default `request_timeout`). On timeout the unscored
+        requests are cancelled and concurrent.futures.TimeoutError is raised.
+        """
+        timeout = self.request_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        futures = [self.submit(record) for record in records]
+        try:
+            return [future.result(max(0.0, deadline - time.monotonic())) for future in futures]
+        except FutureTimeout:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def _next_batch(self):
+        item = self._queue.get()
+        if item is None:
+            return []
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopped.set()
+                break
+            batch.append(item)
+        return batch
+
+    def _score(self, records):
+        model_pipeline = get_model(self.model_path)
+        predictions = _predict_raw(model_pipeline, load_feature_engineer(), pd.DataFrame(records),
+                                   get_prediction_cache(), model_version(self.model_path))
+        return [
+            {"Predicted_LogSalePrice": float(pred), "Predicted_SalePrice": float(np.expm1(pred))}
+            if np.isfinite(pred) else ValueError("The model did not return a finite price for this property.")
+            for pred in predictions
+        ]
+
+    def _run(self):
+        while not self._stopped.is_set():
+            # Requests cancelled after a timeout are dropped; the rest can no longer be cancelled
+            batch = [(record, future) for record, future in self._next_batch()
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self.stats.record_batch(len(batch))
+            records = [record for record, _ in batch]
+            try:
+                results = self._score(records)
+            except Exception:
+                # Isolate the failing request(s) instead of failing the whole batch
+                results = []
+                for record in records:
+                    try:
+                        results.extend(self._score([record]))
+                    except Exception as e:
+                        results.append(e)
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    """JSON request handler; `server.batcher` is the shared MicroBatcher."""
+
+    server_version = "HeritageHousingPrediction/1.0"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status, text):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        batcher = self.server.batcher
+        if self.path == "/metrics":
+            self._send_json(200, {**batcher.stats.snapshot(), "cache": get_prediction_cache().stats()})
+        elif self.path == "/metrics/stages":
+            self._send_json(200, snapshot())
+        elif self.path == "/metrics/prometheus":
+            self._send_text(200, prometheus_text())
+        elif self.path == "/health":
+            self._send_json(200, {
+                "status": "ok",
+                "model_path": batcher.model_path,
+                "model_version": model_version(batcher.model_path),
+            })
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+            return
+
+        start = time.perf_counter()
+        batcher = self.server.batcher
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"null")
+            single = isinstance(payload, dict)
+            records = [payload] if single else payload
+            if not isinstance(records, list) or not records or not all(isinstance(r, dict) for r in records):
+                raise ValueError("Expected a JSON object or a non-empty array of objects.")
+        except ValueError as e:
+            batcher.stats.record_request(time.perf_counter() - start, ok=False)
+            self._send_json(400, {"error": str(e)})
+            return
+
+        try:
+            results = batcher.predict(records)
+        except FutureTimeout:
+            batcher.stats.record_request(time.perf_counter() - start, ok=False)
+            self._send_json(503, {"error": f"Prediction timed out after {batcher.request_timeout:g}s."})
+            return
+        except Exception as e:
+            batcher.stats.record_request(time.perf_counter() - start, ok=False)
+            self._send_json(422, {"error": str(e)})
+            return
+
+        batcher.stats.record_request(time.perf_counter() - start)
+        self._send_json(200, results[0] if single else {"predictions": results})
+
+    def log_message(self, format, *args):
+        # Per-request access logs would dominate the output; /metrics covers it
+        pass
+
+
+class PredictionServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a listen backlog sized for bursts of clients."""
+
+    request_queue_size = REQUEST_BACKLOG
+    daemon_threads = True
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, model_path=FINAL_PIPELINE_PATH,
+          max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+          request_timeout=DEFAULT_REQUEST_TIMEOUT):
+    """Start the batcher and serve requests until interrupted."""
+    batcher = MicroBatcher(model_path, max_batch_size, max_wait_ms,
+                           request_timeout=request_timeout).start()
+    server = PredictionServer((host, port), PredictionHandler)
+    server.batcher = batcher
+    print(f"[INFO] Prediction service listening on http://{host}:{port} "
+          f"(max batch {batcher.max_batch_size}, max wait {max_wait_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("[INFO] Shutting down prediction service.")
+    finally:
+        server.server_close()
+        batcher.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP prediction service.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--model", default=FINAL_PIPELINE_PATH, help="Serialized pipeline to serve.")
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_REQUEST_TIMEOUT,
+                        help="Seconds before an unanswered request gets a 503.")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.model, args.max_batch_size, args.max_wait_ms, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+"""
+Heritage Housing – Run Profiler
+
+Purpose:
+Shows where a slow batch scoring run spends its time and memory, without guessing between
+CSV parsing, the input column check, the pipeline's preprocessor and the forest itself.
+
+- While a `RunProfiler` is active, every stage wrapped by utils/instrumentation.py
+  (csv_read, feature_engineering, column_alignment, column_check, predict, preprocess,
+  model_predict, csv_write, ...) records wall time, CPU time, rows, the tracemalloc
+  net/peak allocation and the process peak RSS. Stages nest: `predict` contains
+  `preprocess` and `model_predict`, and each stage also reports its self time
+  (excluding nested stages), so the self times and "unstaged" add up to the run's wall time
+- At the end of the run the largest live allocation sites (size and block count) are
+  taken from one tracemalloc snapshot
+- With a sampling interval, a background thread samples the profiled thread's call
+  stack; the report lists the functions most often on CPU and the folded stacks are
+  written next to it (`<report>_stacks.txt`, for flamegraph.pl or speedscope)
+- The report is JSON in `outputs/metrics/` (`profile_<UTC timestamp>.json` by default),
+  and a short summary table is printed at the end of the run
+
+Allocation tracing slows Python-level code down (pandas' CSV writer most of all, by up
+to 10x), so profile without it (`--profile-no-alloc`) when the stage timings matter more
+than the allocations. Only the thread that started the profiler is measured (in parallel
+mode, the coordinating process, not the workers).
+
+Usage:
+    python run_pipeline.py --profile
+    python run_pipeline.py --input big.csv --chunksize 100000 --profile --profile-sample-ms 5
+    python -m utils.profiling outputs/metrics/profile_20250101T120000Z.json   # re-print a summary
+"""
+
+import argparse
+import collections
+import contextlib
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from utils.instrumentation import attach_profiler, detach_profiler
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+PROFILE_DIR = "outputs/metrics"
+TOP_ALLOCATIONS = 10
+TOP_FUNCTIONS = 15
+_MB = 1024 * 1024
+
+
+def peak_rss_mb():
+    """High-water mark of this process's resident memory in MB (None if unknown)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return round(peak / (_MB if sys.platform == "darwin" else 1024), 1)
+
+
+def default_report_path(profile_dir=PROFILE_DIR):
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return os.path.join(profile_dir, f"profile_{stamp}.json")
+
+
+class _StageTotals:
+    __slots__ = ("calls", "errors", "rows", "wall", "self_wall", "cpu", "alloc_net",
+                 "alloc_peak", "rss_peak", "rss_growth")
+
+    def __init__(self):
+        self.calls = self.errors = self.rows = 0
+        self.wall = self.self_wall = self.cpu = 0.0
+        self.alloc_net = self.alloc_peak = 0
+        self.rss_peak = self.rss_growth = 0.0
+
+
+class _ProfiledStage:
+    __slots__ = ("profiler", "name", "rows", "wall_start", "cpu_start", "alloc_start",
+                 "alloc_peak", "rss_start", "child_wall")
+
+    def __init__(self, profiler, name, rows):
+        self.profiler = profiler
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self.profiler._enter(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler._exit(self, exc_type is not None)
+        return False
+
+    def discard(self):
+        self.profiler._stack.pop()
+
+
+class _Untracked:
+    """Stage timer handed to threads other than the profiled one."""
+
+    __slots__ = ("rows",)
+
+    def __init__(self):
+        self.rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def discard(self):
+        pass
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's call stack every `interval` seconds."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="heritage-stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._finished = threading.Event()
+
+    def run(self):
+        while not self._finished.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._finished.set()
+        self.join()
+
+    def top_functions(self, n=TOP_FUNCTIONS):
+        own = collections.Counter()
+        inclusive = collections.Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for function in set(frames):
+                inclusive[function] += count
+        total = self.samples or 1
+        return [
+            {
+                "function": function,
+                "self_samples": count,
+                "inclusive_samples": inclusive[function],
+                "self_pct": round(100 * count / total, 1),
+                "inclusive_pct": round(100 * inclusive[function] / total, 1),
+            }
+            for function, count in own.most_common(n)
+        ]
+
+    def write_folded(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RunProfiler:
+    """
+    Per-stage wall/CPU/memory profile of one run on the calling thread.
+
+    Parameters:
+        trace_allocations (bool): Trace allocations with tracemalloc.
+        sample_interval (float or None): Seconds between call-stack samples;
+            None disables sampling.
+    """
+
+    def __init__(self, trace_allocations=True, sample_interval=None):
+        self.trace_allocations = trace_allocations
+        self.sample_interval = sample_interval
+        self.stages = {}
+        self._stack = []
+        self._untracked = _Untracked()
+        self._sampler = None
+        self._started_tracing = False
+        # Every `_enter` resets tracemalloc's peak, so the run's peak is kept here
+        self._traced_peak = 0
+
+    # --- stage hooks (called through utils.instrumentation.timed) ---
+
+    def stage(self, name, rows=None):
+        if threading.get_ident() != self.thread_id:
+            return self._untracked
+        return _ProfiledStage(self, name, rows)
+
+    def _enter(self, stage):
+        if self.trace_allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            self._traced_peak = max(self._traced_peak, peak)
+            if self._stack:
+                # Keep the parent's peak so far before resetting it for the child
+                parent = self._stack[-1]
+                parent.alloc_peak = max(parent.alloc_peak, peak)
+            tracemalloc.reset_peak()
+            stage.alloc_start = current
+        else:
+            stage.alloc_start = 0
+        stage.alloc_peak = 0
+        stage.child_wall = 0.0
+        stage.rss_start = peak_rss_mb() or 0.0
+        self._stack.append(stage)
+        stage.cpu_start = time.process_time()
+        stage.wall_start = time.perf_counter()
+
+    def _exit(self, stage, failed):
+        wall = time.perf_counter() - stage.wall_start
+        cpu = time.process_time() - stage.cpu_start
+        self._stack.pop()
+        alloc_net = 0
+        if self.trace_allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            self._traced_peak = max(self._traced_peak, peak)
+            stage.alloc_peak = max(stage.alloc_peak, peak)
+            alloc_net = current - stage.alloc_start
+        rss = peak_rss_mb() or 0.0
+
+        totals = self.stages.get(stage.name)
+        if totals is None:
+            totals = self.stages[stage.name] = _StageTotals()
+        totals.calls += 1
+        totals.errors += failed
+        totals.rows += stage.rows or 0
+        totals.wall += wall
+        totals.self_wall += wall - stage.child_wall
+        totals.cpu += cpu
+        totals.alloc_net += alloc_net
+        totals.alloc_peak = max(totals.alloc_peak, stage.alloc_peak - stage.alloc_start)
+        totals.rss_peak = max(totals.rss_peak, rss)
+        totals.rss_growth += rss - stage.rss_start
+
+        if self._stack:
+            parent = self._stack[-1]
+            parent.child_wall += wall
+            parent.alloc_peak = max(parent.alloc_peak, stage.alloc_peak)
+
+    # --- run control ---
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        if not attach_profiler(self):
+            raise RuntimeError("[ERROR] Another run profiler is already active in this process.")
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self.trace_allocations:
+            tracemalloc.reset_peak()
+        self._traced_peak = 0
+        self.started_at = time.time()
+        self._cpu_start = time.process_time()
+        self._wall_start = time.perf_counter()
+        if self.sample_interval:
+            self._sampler = _StackSampler(self.thread_id, self.sample_interval)
+            self._sampler.start()
+        return self
+
+    def stop(self):
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        self.cpu_seconds = time.process_time() - self._cpu_start
+        detach_profiler()
+        if self._sampler is not None:
+            self._sampler.stop()
+        self.top_allocations = []
+        self.peak_traced_mb = None
+        if self.trace_allocations:
+            self._traced_peak = max(self._traced_peak, tracemalloc.get_traced_memory()[1])
+            self.peak_traced_mb = round(self._traced_peak / _MB, 2)
+            statistics = tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCATIONS]
+            self.top_allocations = [
+                {
+                    "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "size_mb": round(stat.size / _MB, 3),
+                    "blocks": stat.count,
+                }
+                for stat in statistics
+            ]
+            if self._started_tracing:
+                tracemalloc.stop()
+
+    def report(self, label=None):
+        """The profile as a JSON-serialisable dict."""
+        stages = {}
+        for name, totals in sorted(self.stages.items(), key=lambda item: -item[1].self_wall):
+            stages[name] = {
+                "calls": totals.calls,
+                "errors": totals.errors,
+                "rows": totals.rows,
+                "wall_seconds": round(totals.wall, 6),
+                "self_wall_seconds": round(totals.self_wall, 6),
+                "cpu_seconds": round(totals.cpu, 6),
+                "cpu_utilisation": round(totals.cpu / totals.wall, 3) if totals.wall else None,
+                "alloc_net_mb": round(totals.alloc_net / _MB, 3) if self.trace_allocations else None,
+                "alloc_peak_mb": round(totals.alloc_peak / _MB, 3) if self.trace_allocations else None,
+                "rss_peak_mb": totals.rss_peak or None,
+                "rss_growth_mb": round(totals.rss_growth, 1),
+            }
+        staged = sum(totals.self_wall for totals in self.stages.values())
+        report = {
+            "label": label,
+            "command": sys.argv,
+            "started_at": datetime.datetime.fromtimestamp(
+                self.started_at, datetime.timezone.utc).isoformat(timespec="seconds"),
+            "wall_seconds": round(self.wall_seconds, 6),
+            "cpu_seconds": round(self.cpu_seconds, 6),
+            "unstaged_wall_seconds": round(max(self.wall_seconds - staged, 0.0), 6),
+            "peak_rss_mb": peak_rss_mb(),
+            "tracemalloc": self.trace_allocations,
+            "peak_traced_mb": self.peak_traced_mb,
+            "stages": stages,
+            "top_allocations": self.top_allocations,
+            "sampling": None,
+        }
+        if self._sampler is not None:
+            report["sampling"] = {
+                "interval_ms": round(self.sample_interval * 1000, 3),
+                "samples": self._sampler.samples,
+                "top_functions": self._sampler.top_functions(),
+                "stacks_path": None,
+            }
+        return report
+
+    def save(self, path, label=None):
+        """Write the report (and folded stacks, if sampled) and return the report."""
+        report = self.report(label)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if self._sampler is not None:
+            stacks_path = os.path.splitext(path)[0] + "_stacks.txt"
+            self._sampler.write_folded(stacks_path)
+            report["sampling"]["stacks_path"] = stacks_path
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+
+def format_summary(report):
+    """Short human-readable summary of a profile report."""
+    rss = f", peak RSS {report['peak_rss_mb']:,.1f} MB" if report["peak_rss_mb"] else ""
+    lines = [f"[INFO] Profile: {report['wall_seconds']:.3f}s wall, "
+             f"{report['cpu_seconds']:.3f}s CPU{rss}"]
+    if report["tracemalloc"]:
+        lines.append(f"[INFO] Allocation tracing on (peak traced {report['peak_traced_mb']:,.1f} MB); "
+                     "timings include its overhead")
+    if report["stages"]:
+        import pandas as pd
+
+        wall = report["wall_seconds"] or 1.0
+        table = pd.DataFrame([
+            {
+                "Stage": name,
+                "Calls": stage["calls"],
+                "Rows": stage["rows"],
+                "Self (s)": round(stage["self_wall_seconds"], 3),
+                "% of run": round(100 * stage["self_wall_seconds"] / wall, 1),
+                "Wall (s)": round(stage["wall_seconds"], 3),
+                "CPU (s)": round(stage["cpu_seconds"], 3),
+                "Alloc peak (MB)": stage["alloc_peak_mb"],
+            }
+            for name, stage in report["stages"].items()
+        ])
+        if not report["tracemalloc"]:
+            table = table.drop(columns="Alloc peak (MB)")
+        lines.append(table.to_string(index=False))
+        lines.append(f"Unstaged: {report['unstaged_wall_seconds']:.3f}s "
+                     f"({100 * report['unstaged_wall_seconds'] / wall:.1f}% of run)")
+    if report["sampling"]:
+        sampling = report["sampling"]
+        lines.append(f"Most sampled functions ({sampling['samples']} samples):")
+        for entry in sampling["top_functions"][:5]:
+            lines.append(f"  {entry['self_pct']:5.1f}%  {entry['function']}")
+    return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def profile_run(report_path=None, sample_interval=None, trace_allocations=True, label=None):
+    """
+    Profile the enclosed block, then save the report to `report_path` (a new
+    file in outputs/metrics by default) and print the summary. If a profiler
+    is already running in this process, the block is left to that one.
+    """
+    profiler = RunProfiler(trace_allocations, sample_interval)
+    try:
+        profiler.start()
+    except RuntimeError:
+        yield None
+        return
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        report_path = report_path or default_report_path()
+        report = profiler.save(report_path, label)
+        print(format_summary(report))
+        print(f"[SAVED] Profile report saved to: {report_path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the summary of a saved profile report.")
+    parser.add_argument("report", help="JSON report written by run_pipeline.py --profile.")
+    args = parser.parse_args(argv)
+    with open(args.report) as f:
+        print(format_summary(json.load(f)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Heritage Housing – Feature Schema
+
+Purpose:
+Describes the model's inputs in a small JSON artefact saved next to the model
+(`outputs/models/feature_schema.json`), so consumers never need to parse X_train.csv
+just to learn its columns.
+
+The schema records:
+- The training feature layout (column names and dtypes, in order)
+- Raw input columns with dtype and observed value range
+- Category levels for each raw categorical column
+- The reference year used for HouseAge
+- The training distribution of every raw input (decile and percentile bins for numeric
+  columns, level frequencies for categorical ones), used for drift checks. These are
+  taken from the raw records before cleaning imputes them, since scoring batches are
+  compared before imputation too (missing values are left out of numeric bins and
+  counted as their own level for categorical columns). Saving the schema checks the
+  training records against these bins, and every column must come out stable
+
+Usage:
+    python -m utils.schema        # rebuild the schema from the processed data
+"""
+
+import functools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.data_io import read_dataset
+
+
+RAW_RECORDS_PATH = "data/raw/house_prices_records.csv"
+CLEANED_DATA_PATH = "data/processed/cleaned/house_prices_cleaned.csv"
+X_TRAIN_PATH = "data/processed/final/X_train.csv"
+SCHEMA_PATH = "outputs/models/feature_schema.json"
+SCHEMA_VERSION = 2
+TARGET_COL = "SalePrice"
+# The 80/20 train/test split of the cleaned data, shared by training and the serving
+# helpers that rebuild it (intervals, neighbours), so they need not import training code
+RANDOM_STATE = 42
+TEST_SIZE = 0.2
+
+# Year the training features were engineered in (HouseAge = year - YearBuilt)
+REFERENCE_YEAR = 2025
+
+CATEGORICAL_COLS = ["BsmtExposure", "BsmtFinType1", "GarageFinish", "KitchenQual"]
+YEAR_COLS = ["YearBuilt", "YearRemodAdd", "GarageYrBlt"]
+# Ratings and counts: whole numbers on a fixed scale
+DISCRETE_COLS = ["OverallQual", "OverallCond", "BedroomAbvGr"]
+MISSING_LEVEL = "<missing>"
+
+# Bin edges for drift checks: training percentiles for KS, and every tenth of them
+# (the deciles) for PSI, so PSI bins are unions of KS bins
+KS_LEVELS = np.arange(1, 100) / 100
+PSI_EVERY = 10
+
+
+def synthetic_records(records, n_rows, jitter=0.10, seed=0):
+    """
+    `n_rows` rows resampled from `records` (for benchmarks), with the continuous
+    numeric columns scaled by a random factor in [1 - jitter, 1 + jitter] and
+    rounded, so rows are distinct. Years, ratings and counts keep their sampled
+    values, so the rows stay within the domain the validator accepts.
+    """
+    rng = np.random.default_rng(seed)
+    sample = records.iloc[rng.integers(0, len(records), n_rows)].reset_index(drop=True)
+    for col in sample.select_dtypes(include=[np.number]).columns:
+        if col in YEAR_COLS or col in DISCRETE_COLS:
+            continue
+        sample[col] = (sample[col] * rng.uniform(1 - jitter, 1 + jitter, n_rows)).round()
+    return sample
+
+
+def bin_counts(values, edges):
+    """
+    Count float `values` in the bins (-inf, e1), [e1, e2), ..., [ek, inf) of
+    the sorted `edges`. Returns len(edges) + 1 counts.
+    """
+    return np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+
+
+def _distribution(values):
+    values = values.dropna().to_numpy(dtype=np.float64)
+    percentiles = np.quantile(values, KS_LEVELS)
+    distribution = {}
+    for name, edges in (("psi", np.unique(percentiles[PSI_EVERY - 1::PSI_EVERY])),
+                        ("ks", np.unique(percentiles))):
+        distribution[f"{name}_edges"] = edges.tolist()
+        distribution[f"{name}_fractions"] = (bin_counts(values, edges) / len(values)).round(6).tolist()
+    return distribution
+
+
+def build_feature_schema(cleaned_path=CLEANED_DATA_PATH, layout_path=X_TRAIN_PATH,
+                         reference_year=REFERENCE_YEAR, records_path=RAW_RECORDS_PATH):
+    """
+    Build the schema dict from the cleaned raw data and the training layout, with
+    drift reference distributions from the unimputed records at `records_path`.
+    """
+    cleaned = read_dataset(cleaned_path).drop(columns=[TARGET_COL], errors="ignore")
+    layout = read_dataset(layout_path)
+    records = read_dataset(records_path)
+
+    raw_inputs = {}
+    for col in cleaned.columns:
+        if col in CATEGORICAL_COLS:
+            continue
+        values = cleaned[col]
+        raw_inputs[col] = {
+            "dtype": str(values.dtype),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "nullable": bool(values.isna().any()),
+            "distribution": _distribution(records[col]),
+        }
+
+    categories = {
+        col: sorted(cleaned[col].dropna().astype(str).unique())
+        for col in CATEGORICAL_COLS
+    }
+
+    category_fractions = {
+        col: {
+            str(level): round(float(fraction), 6)
+            for level, fraction in records[col].astype(object).fillna(MISSING_LEVEL)
+            .value_counts(normalize=True).sort_index().items()
+        }
+        for col in CATEGORICAL_COLS
+    }
+
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "reference_year": int(reference_year),
+        "n_train": int(len(cleaned)),
+        "features": [
+            {"name": col, "dtype": str(dtype)} for col, dtype in layout.dtypes.items()
+        ],
+        "raw_inputs": raw_inputs,
+        "categories": categories,
+        "category_fractions": category_fractions,
+    }
+
+
+def save_feature_schema(path=SCHEMA_PATH, **kwargs):
+    """
+    Build the schema and write it to `path` as JSON.
+    """
+    schema = build_feature_schema(**kwargs)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(schema, f, indent=2)
+    print(f"[SAVED] Feature schema saved to: {path}")
+    verify_reference(schema, kwargs.get("records_path", RAW_RECORDS_PATH))
+    return schema
+
+
+def verify_reference(schema, records_path=RAW_RECORDS_PATH):
+    """
+    Check the training records against the schema's drift bins; every column
+    should come out stable. Returns the columns that did not.
+    """
+    from utils.validation import reference_drift  # validation imports this module
+
+    report = reference_drift(schema, read_dataset(records_path))
+    unstable = report[report["Status"] != "stable"]
+    if len(unstable):
+        print("[WARNING] Training records drift against their own schema distributions:")
+        print(unstable.to_string(index=False))
+    else:
+        print(f"[INFO] Drift reference check: all {len(report)} columns of {records_path} are stable.")
+    return list(unstable["Feature"])
+
+
+@functools.lru_cache(maxsize=8)
+def _load_schema(path, mtime_ns):
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_feature_schema(path=SCHEMA_PATH):
+    """
+    Return the schema stored at `path`. It is parsed once and cached until
+    the file changes on disk.
+    """
+    return _load_schema(os.path.abspath(path), os.stat(path).st_mtime_ns)
+
+
+def feature_names(schema):
+    """Training column layout, in order."""
+    return [feature["name"] for feature in schema["features"]]
+
+
+def required_raw_columns(schema):
+    """Raw columns a property record must provide to be scored."""
+    return list(schema["raw_inputs"]) + list(schema["categories"])
+
+
+def check_raw_columns(columns, schema):
+    """
+    Raise if any raw input column required by the schema is missing.
+    """
+    missing = [col for col in required_raw_columns(schema) if col not in columns]
+    if missing:
+        raise ValueError(f"[ERROR] Missing expected input features: {missing}")
+
+
+def out_of_range(raw_df, schema):
+    """
+    Return {column: (value, min, max)} for values in the first row of `raw_df`
+    that fall outside the range seen in training.
+    """
+    flagged = {}
+    row = raw_df.iloc[0]
+    for col, spec in schema["raw_inputs"].items():
+        if col in raw_df.columns and pd.notna(row[col]):
+            value = float(row[col])
+            if value < spec["min"] or value > spec["max"]:
+                flagged[col] = (value, spec["min"], spec["max"])
+    return flagged
+
+
+if __name__ == "__main__":
+    save_feature_schema()
@@ -0,0 +1,488 @@
+"""
+Heritage Housing – Training Pipeline
+
+Purpose:
+Rebuilds the deployed model headlessly, without running the notebooks, as a chain of
+stages: collect -> clean -> engineer -> split -> train -> evaluate -> export.
+
+Every stage is content-hashed. Its key is a SHA-256 over the stage's source code (and
+that of the helpers and modules it calls), its parameters and the digests of the files
+it reads, and its outputs are stored under `outputs/train_cache/<stage>/<key>/` together
+with their own digests. On a rerun a stage whose key already has complete outputs is skipped. Downstream keys are built from the
+*output* digests of upstream stages, not from their keys, so a change that does not
+alter a stage's output (e.g. an edit to a column dropped during cleaning) stops there
+and nothing after it is recomputed.
+
+The steps follow the notebooks:
+- collect:   snapshot of `data/raw/house_prices_records.csv` (optionally downloaded
+             from Kaggle first, as in 01_Data_Collection)
+- clean:     drop EnclosedPorch/WoodDeckSF, impute as in 02_Data_Cleaning, drop duplicates
+- engineer:  the deployment FeatureEngineer (utils/feature_engineering.py), so the model
+             is trained on exactly the features it is served; target is log1p(SalePrice)
+- split:     80/20 train_test_split with random_state=42
+- train:     median imputer + scaler over the numeric columns + Random Forest, using the
+             tuned parameters from `outputs/metrics/best_hyperparameters.json` if present
+- evaluate:  test-set R², MAE and RMSE (log sale price)
+- export:    the pipeline, its feature schema, the Random Forest rows of
+             `test_set_results.csv` / `consolidated_model_performance.csv` and the
+             train/test split, which is published to `data/processed/final/` (with
+             fresh Parquet copies and feature matrix), so the tools evaluating on
+             that data (tuning, compression, explanations, benchmarks) see exactly
+             the layout the published model was trained on
+
+Usage:
+    python train_pipeline.py                  # run, skipping unchanged stages
+    python train_pipeline.py --force train    # rerun `train` and everything after it
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import zipfile
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from utils import feature_engineering, schema
+from utils.data_io import columnar_path, write_columnar
+from utils.feature_engineering import FeatureEngineer
+from utils.feature_matrix import FINAL_DIR, load_feature_matrix
+from utils.model_registry import FINAL_PIPELINE_PATH, file_digest
+from utils.schema import RANDOM_STATE, SCHEMA_PATH, TARGET_COL, TEST_SIZE, save_feature_schema
+
+
+RAW_RECORDS_PATH = "data/raw/house_prices_records.csv"
+KAGGLE_DATASET = "codeinstitute/housing-prices-data"
+CACHE_DIR = "outputs/train_cache"
+METRICS_DIR = "outputs/metrics"
+BEST_PARAMS_PATH = os.path.join(METRICS_DIR, "best_hyperparameters.json")
+MODEL_NAME = "Random Forest"
+SPLIT_FILES = ["X_train.csv", "X_test.csv", "y_train.csv", "y_test.csv"]
+
+DROPPED_COLUMNS = ["EnclosedPorch", "WoodDeckSF"]
+MEDIAN_IMPUTED = ["LotFrontage", "MasVnrArea"]
+MISSING_LABEL_IMPUTED = ["GarageFinish", "BsmtFinType1"]
+ZERO_IMPUTED = ["GarageYrBlt", "2ndFlrSF", "BedroomAbvGr"]
+# Parameters of the final pipeline in 06_Final_Pipeline_and_Deployment_Preparation
+DEFAULT_RF_PARAMS = {"n_estimators": 100, "random_state": RANDOM_STATE}
+
+
+class Stage:
+    """
+    One step of the training DAG.
+
+    Parameters:
+        name (str): Stage name, also its cache sub-directory.
+        run (callable): run(inputs, outputs, params) reading the paths in `inputs`
+            and writing every path in `outputs` (both dicts of name -> path).
+        inputs (dict): Input name -> (upstream stage, output name), or a file path
+            for inputs from outside the DAG.
+        outputs (list): Names of the files the stage writes.
+        params (dict): JSON-serialisable parameters, part of the stage key.
+        code_deps (list): Functions, classes or modules `run` calls; their source
+            (the file digest, for a module) is part of the stage key too.
+    """
+
+    def __init__(self, name, run, inputs, outputs, params=None, code_deps=None):
+        self.name = name
+        self.run = run
+        self.inputs = inputs
+        self.outputs = outputs
+        self.params = params or {}
+        self.code_deps = code_deps or []
+
+    def dependency_sources(self):
+        sources = {}
+        for dep in self.code_deps:
+            if inspect.ismodule(dep):
+                sources[dep.__name__] = file_digest(inspect.getsourcefile(dep))
+            else:
+                sources[f"{dep.__module__}.{dep.__qualname__}"] = inspect.getsource(dep)
+        return sources
+
+    def key(self, input_digests):
+        payload = {
+            "stage": self.name,
+            "code": inspect.getsource(self.run),
+            "code_deps": self.dependency_sources(),
+            "params": self.params,
+            "inputs": input_digests,
+        }
+        text = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+
+class StageCache:
+    """
+    Content-addressed stage outputs under `cache_dir/<stage>/<key>/`, each
+    directory holding the output files plus a `manifest.json` of their digests.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def directory(self, stage, key):
+        return os.path.join(self.cache_dir, stage.name, key)
+
+    def manifest(self, stage, key):
+        """The stored manifest for (stage, key), or None if it is missing or incomplete."""
+        path = os.path.join(self.directory(stage, key), self.MANIFEST)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            manifest = json.load(f)
+        directory = self.directory(stage, key)
+        if not all(os.path.exists(os.path.join(directory, name)) for name in stage.outputs):
+            return None
+        return manifest
+
+    def commit(self, stage, key, work_dir, manifest):
+        """Move a finished stage's work directory into place."""
+        with open(os.path.join(work_dir, self.MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        target = self.directory(stage, key)
+        shutil.rmtree(target, ignore_errors=True)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(work_dir, target)
+
+
+class TrainingDAG:
+    """
+    Runs stages in declaration order (each stage may only read from stages
+    declared before it), skipping those whose key is already cached.
+    """
+
+    def __init__(self, stages, cache=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.cache = cache or StageCache()
+
+    def downstream(self, name):
+        """`name` and every stage that depends on it, directly or not."""
+        affected = {name}
+        for stage in self.stages.values():
+            if any(isinstance(src, tuple) and src[0] in affected for src in stage.inputs.values()):
+                affected.add(stage.name)
+        return affected
+
+    def run(self, force=()):
+        """
+        Execute the DAG. Stages named in `force` (and their dependants) are
+        recomputed even if cached. Returns {stage: summary dict}.
+        """
+        forced = set()
+        for name in force:
+            if name not in self.stages:
+                raise ValueError(f"[ERROR] Unknown stage: {name}")
+            forced |= self.downstream(name)
+
+        paths, digests, summary = {}, {}, {}
+        for stage in self.stages.values():
+            inputs, input_digests = {}, {}
+            for input_name, source in stage.inputs.items():
+                if isinstance(source, tuple):
+                    inputs[input_name] = paths[source]
+                    input_digests[input_name] = digests[source]
+                else:
+                    inputs[input_name] = source
+                    input_digests[input_name] = file_digest(source)
+
+            key = stage.key(input_digests)
+            manifest = None if stage.name in forced else self.cache.manifest(stage, key)
+            start = time.perf_counter()
+            if manifest is not None:
+                status = "skipped"
+                print(f"[INFO] {stage.name}: unchanged (key {key[:12]}), reusing cached outputs.")
+            else:
+                status = "ran"
+                print(f"[INFO] {stage.name}: running (key {key[:12]})...")
+                manifest = self._execute(stage, key, inputs)
+
+            directory = self.cache.directory(stage, key)
+            for output_name in stage.outputs:
+                paths[(stage.name, output_name)] = os.path.join(directory, output_name)
+                digests[(stage.name, output_name)] = manifest["outputs"][output_name]
+            summary[stage.name] = {
+                "status": status,
+                "key": key,
+                "seconds": round(time.perf_counter() - start, 3),
+                "outputs": manifest["outputs"],
+            }
+        self.paths = paths
+        return summary
+
+    def _execute(self, stage, key, inputs):
+        os.makedirs(self.cache.cache_dir, exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix=f".{stage.name}-", dir=self.cache.cache_dir)
+        try:
+            outputs = {name: os.path.join(work_dir, name) for name in stage.outputs}
+            stage.run(inputs, outputs, stage.params)
+            missing = [name for name, path in outputs.items() if not os.path.exists(path)]
+            if missing:
+                raise RuntimeError(f"[ERROR] Stage '{stage.name}' did not write: {missing}")
+            manifest = {
+                "stage": stage.name,
+                "key": key,
+                "params": stage.params,
+                "inputs": {name: file_digest(path) for name, path in inputs.items()},
+                "outputs": {name: file_digest(path) for name, path in outputs.items()},
+                "created_at": time.time(),
+            }
+            self.cache.commit(stage, key, work_dir, manifest)
+            return manifest
+        except BaseException:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+
+
+# ---------------------------------------------------------------------------
+# Stage implementations
+# ---------------------------------------------------------------------------
+
+def download_raw_data(destination="data/raw", dataset=KAGGLE_DATASET):
+    """Download and extract the Kaggle dataset (needs the kaggle CLI and kaggle.json)."""
+    os.makedirs(destination, exist_ok=True)
+    subprocess.run(["kaggle", "datasets", "download", "-d", dataset, "-p", destination], check=True)
+    for name in os.listdir(destination):
+        if name.endswith(".zip"):
+            zip_path = os.path.join(destination, name)
+            with zipfile.ZipFile(zip_path) as z:
+                z.extractall(destination)
+            os.remove(zip_path)
+    print(f"[SAVED] Raw data downloaded to: {destination}")
+
+
+def collect(inputs, outputs, params):
+    records = pd.read_csv(inputs["records"])
+    records.columns = records.columns.str.replace(" ", "_")
+    records.to_csv(outputs["records.csv"], index=False)
+    print(f"[INFO] Collected {len(records)} sale records.")
+
+
+def clean(inputs, outputs, params):
+    df = pd.read_csv(inputs["records"])
+    df = df.drop(columns=params["dropped"], errors="ignore")
+    for col in params["median"]:
+        df[col] = df[col].fillna(df[col].median())
+    for col in params["missing_label"]:
+        df[col] = df[col].fillna("None")
+    for col in params["zero"]:
+        df[col] = df[col].fillna(0)
+    before = len(df)
+    df = df.drop_duplicates()
+    df.to_csv(outputs["cleaned.csv"], index=False)
+    print(f"[INFO] Cleaned data: {df.shape}, {before - len(df)} duplicates removed.")
+
+
+def engineer(inputs, outputs, params):
+    cleaned = pd.read_csv(inputs["cleaned"])
+    feature_engineer = FeatureEngineer().fit(cleaned)
+    features = feature_engineer.transform(cleaned)
+    features.to_csv(outputs["features.csv"], index=False)
+    target = np.log1p(cleaned[TARGET_COL]).rename(TARGET_COL)
+    target.to_csv(outputs["target.csv"], index=False)
+    print(f"[INFO] Engineered {features.shape[1]} features for {len(features)} rows.")
+
+
+def split(inputs, outputs, params):
+    X = pd.read_csv(inputs["features"])
+    y = pd.read_csv(inputs["target"])
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=params["test_size"], random_state=params["random_state"])
+    X_train.to_csv(outputs["X_train.csv"], index=False)
+    X_test.to_csv(outputs["X_test.csv"], index=False)
+    y_train.to_csv(outputs["y_train.csv"], index=False)
+    y_test.to_csv(outputs["y_test.csv"], index=False)
+    print(f"[INFO] Train: {X_train.shape}, test: {X_test.shape}")
+
+
+def build_pipeline(numerical_cols, model_params):
+    """Preprocessing + Random Forest, as serialised by the final-pipeline notebook."""
+    numerical_pipeline = Pipeline([
+        ("imputer", SimpleImputer(strategy="median")),
+        ("scaler", StandardScaler()),
+    ])
+    preprocessor = ColumnTransformer([("num", numerical_pipeline, numerical_cols)])
+    return Pipeline([
+        ("preprocessor", preprocessor),
+        ("model", RandomForestRegressor(**model_params)),
+    ])
+
+
+def train(inputs, outputs, params):
+    X_train = pd.read_csv(inputs["X_train"])
+    y_train = pd.read_csv(inputs["y_train"]).iloc[:, 0].to_numpy()
+    numerical_cols = X_train.select_dtypes(include=[np.number]).columns.tolist()
+    pipeline = build_pipeline(numerical_cols, params["model"])
+    pipeline.fit(X_train, y_train)
+    joblib.dump(pipeline, outputs["pipeline.pkl"])
+    print(f"[INFO] Trained {MODEL_NAME} on {len(numerical_cols)} numeric features "
+          f"with {params['model']}.")
+
+
+def evaluate(inputs, outputs, params):
+    pipeline = joblib.load(inputs["pipeline"])
+    X_test = pd.read_csv(inputs["X_test"])
+    y_test = pd.read_csv(inputs["y_test"]).iloc[:, 0].to_numpy()
+    predictions = pipeline.predict(X_test)
+    metrics = {
+        "Model": MODEL_NAME,
+        "Test R2": round(float(r2_score(y_test, predictions)), 4),
+        "Test MAE": round(float(mean_absolute_error(y_test, predictions)), 4),
+        "Test RMSE": round(float(np.sqrt(mean_squared_error(y_test, predictions))), 4),
+    }
+    pd.DataFrame([metrics]).to_csv(outputs["test_metrics.csv"], index=False)
+    print(f"[INFO] Test R2 {metrics['Test R2']}, MAE {metrics['Test MAE']}, "
+          f"RMSE {metrics['Test RMSE']}")
+
+
+def export(inputs, outputs, params):
+    shutil.copyfile(inputs["pipeline"], outputs["final_random_forest_pipeline.pkl"])
+    shutil.copyfile(inputs["metrics"], outputs["test_metrics.csv"])
+    for name in SPLIT_FILES:
+        shutil.copyfile(inputs[name.removesuffix(".csv")], outputs[name])
+    save_feature_schema(outputs["feature_schema.json"],
+                        cleaned_path=inputs["cleaned"], layout_path=inputs["X_train"],
+                        records_path=inputs["records"])
+
+
+# ---------------------------------------------------------------------------
+# Wiring and publishing
+# ---------------------------------------------------------------------------
+
+def load_model_params(path=BEST_PARAMS_PATH):
+    """Tuned Random Forest parameters (see utils/tuning.py), or the notebook defaults."""
+    params = dict(DEFAULT_RF_PARAMS)
+    if path and os.path.exists(path):
+        with open(path) as f:
+            tuned = json.load(f).get(MODEL_NAME)
+        if tuned:
+            params.update(tuned)
+            print(f"[INFO] Using tuned {MODEL_NAME} parameters from {path}")
+    return params
+
+
+def build_stages(raw_path=RAW_RECORDS_PATH, model_params=None):
+    """The training DAG, in execution order."""
+    if model_params is None:
+        model_params = load_model_params()
+    return [
+        Stage("collect", collect, {"records": raw_path}, ["records.csv"]),
+        Stage("clean", clean, {"records": ("collect", "records.csv")}, ["cleaned.csv"],
+              {"dropped": DROPPED_COLUMNS, "median": MEDIAN_IMPUTED,
+               "missing_label": MISSING_LABEL_IMPUTED, "zero": ZERO_IMPUTED}),
+        Stage("engineer", engineer, {"cleaned": ("clean", "cleaned.csv")},
+              ["features.csv", "target.csv"], code_deps=[feature_engineering]),
+        Stage("split", split,
+              {"features": ("engineer", "features.csv"), "target": ("engineer", "target.csv")},
+              ["X_train.csv", "X_test.csv", "y_train.csv", "y_test.csv"],
+              {"test_size": TEST_SIZE, "random_state": RANDOM_STATE}),
+        Stage("train", train,
+              {"X_train": ("split", "X_train.csv"), "y_train": ("split", "y_train.csv")},
+              ["pipeline.pkl"],
+              {"model": model_params, "sklearn": sklearn.__version__,
+               "pandas": pd.__version__, "numpy": np.__version__},
+              code_deps=[build_pipeline]),
+        Stage("evaluate", evaluate,
+              {"pipeline": ("train", "pipeline.pkl"), "X_test": ("split", "X_test.csv"),
+               "y_test": ("split", "y_test.csv")},
+              ["test_metrics.csv"]),
+        Stage("export", export,
+              {"pipeline": ("train", "pipeline.pkl"), "metrics": ("evaluate", "test_metrics.csv"),
+               "cleaned": ("clean", "cleaned.csv"), "records": ("collect", "records.csv"),
+               **{name.removesuffix(".csv"): ("split", name) for name in SPLIT_FILES}},
+              ["final_random_forest_pipeline.pkl", "feature_schema.json", "test_metrics.csv"] + SPLIT_FILES,
+              code_deps=[schema]),
+    ]
+
+
+def _publish_file(source, target):
+    if os.path.exists(target) and file_digest(target) == file_digest(source):
+        return False
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    shutil.copyfile(source, target)
+    print(f"[SAVED] {target}")
+    return True
+
+
+def _upsert_metrics(path, row, columns):
+    """Replace (or add) the MODEL_NAME row of a metrics CSV, keeping the other models."""
+    table = pd.read_csv(path) if os.path.exists(path) else pd.DataFrame(columns=columns)
+    values = [row[col] for col in columns]
+    match = table.index[table["Model"] == row["Model"]]
+    if len(match) and table.loc[match[0], columns].tolist() == values:
+        return
+    if len(match):
+        table.loc[match[0], columns] = values
+    else:
+        table = pd.concat([table, pd.DataFrame([row], columns=columns)], ignore_index=True)
+    table.to_csv(path, index=False)
+    print(f"[SAVED] {row['Model']} metrics updated in: {path}")
+
+
+def publish(export_paths, model_path=FINAL_PIPELINE_PATH, schema_path=SCHEMA_PATH,
+            metrics_dir=METRICS_DIR, final_dir=FINAL_DIR):
+    """Copy the export stage's artefacts to where the app and scripts read them."""
+    _publish_file(export_paths["final_random_forest_pipeline.pkl"], model_path)
+    _publish_file(export_paths["feature_schema.json"], schema_path)
+
+    # The split replaces the notebook's processed data, with its Parquet copies and
+    # feature matrices, so offline tools evaluate on the model's own layout
+    for name in SPLIT_FILES:
+        target = os.path.join(final_dir, name)
+        if _publish_file(export_paths[name], target) or not os.path.exists(columnar_path(target)):
+            print(f"[SAVED] {target} -> {write_columnar(pd.read_csv(target), target)}")
+    load_feature_matrix("train", final_dir)
+    if os.path.exists(os.path.join(final_dir, "X_test.npy")):  # built by `explain --matrix test`
+        load_feature_matrix("test", final_dir)
+
+    row = pd.read_csv(export_paths["test_metrics.csv"]).iloc[0].to_dict()
+    os.makedirs(metrics_dir, exist_ok=True)
+    _upsert_metrics(os.path.join(metrics_dir, "test_set_results.csv"), row,
+                    ["Model", "Test R2", "Test MAE", "Test RMSE"])
+    _upsert_metrics(os.path.join(metrics_dir, "consolidated_model_performance.csv"),
+                    {"Model": row["Model"], "R2": row["Test R2"], "MAE": row["Test MAE"],
+                     "RMSE": row["Test RMSE"]},
+                    ["Model", "R2", "MAE", "RMSE"])
+
+
+def run_training(raw_path=RAW_RECORDS_PATH, cache_dir=CACHE_DIR, model_path=FINAL_PIPELINE_PATH,
+                 schema_path=SCHEMA_PATH, metrics_dir=METRICS_DIR, params_path=BEST_PARAMS_PATH,
+                 force=(), download=False, final_dir=FINAL_DIR):
+    """
+    Run the DAG and publish its artefacts. Returns {stage: summary dict}, which
+    is also written to `cache_dir/last_run.json`.
+    """
+    if not os.path.exists(raw_path):
+        if not download:
+            raise FileNotFoundError(
+                f"[ERROR] {raw_path} not found; rerun with --download to fetch it from Kaggle.")
+        download_raw_data(os.path.dirname(raw_path) or ".")
+
+    start = time.perf_counter()
+    dag = TrainingDAG(build_stages(raw_path, load_model_params(params_path)), StageCache(cache_dir))
+    summary = dag.run(force)
+    export_paths = {name: dag.paths[("export", name)] for name in dag.stages["export"].outputs}
+    publish(export_paths, model_path, schema_path, metrics_dir, final_dir)
+
+    with open(os.path.join(cache_dir, "last_run.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    ran = [name for name, info in summary.items() if info["status"] == "ran"]
+    print(f"[INFO] Training pipeline finished in {time.perf_counter() - start:.1f}s; "
+          f"recomputed {len(ran)}/{len(summary)} stages: {', '.join(ran) or 'none'}")
+    return summary
@@ -0,0 +1,418 @@
+"""
+Heritage Housing – Flattened Tree-Ensemble Engine
+
+Purpose:
+Exports fitted tree ensembles (the final Random Forest pipeline, the tuned Gradient
+Boosting model, or a single Decision Tree) to a compact array representation and
+evaluates it with vectorised NumPy.
+
+Every tree is packed into contiguous arrays shared by the whole ensemble:
+    feature[node]          split feature index (0 for leaves)
+    threshold[node]        split threshold (float64, as stored by scikit-learn)
+    children[node]         (left, right) node indices; left when X[feature] <= threshold
+    value[node]            leaf value
+with `roots[t]` giving the first node of tree t, and leaves pointing to themselves.
+All (row, tree) pairs of a batch descend together one level per step, with one
+gather per array and no per-tree loop; pairs drop out of the working set as soon as
+they reach a leaf.
+
+Predictions match scikit-learn bit for bit: inputs are rounded to float32 exactly as
+scikit-learn does before comparing against the float64 thresholds, and per-tree
+outputs are accumulated in estimator order (Random Forest: sum / n_trees; Gradient
+Boosting: init + learning_rate * each stage).
+
+Exported pipelines keep the original preprocessing steps and replace only the final
+estimator, so they are drop-in replacements for `pipeline.predict`. The flat engine
+is built for the dashboard's single-row predictions (no per-tree Python calls or
+thread dispatch) and for small artefacts; on large batches scikit-learn's compiled
+traversal is still faster, so batch scoring keeps using the original pipeline.
+
+The benchmark writes single-row latency (whole pipeline and ensemble alone), batch
+throughput and compressed artefact size per engine to
+`outputs/metrics/tree_engine_benchmark.csv`; `--verify` exits non-zero unless every
+X_test prediction is identical to scikit-learn's.
+
+Usage:
+    python -m utils.tree_engine --verify --benchmark
+"""
+
+import argparse
+import copy
+import io
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+
+from utils.data_io import read_dataset
+from utils.instrumentation import median_seconds
+from utils.model_registry import MODEL_DIR
+
+
+X_TEST_PATH = "data/processed/final/X_test.csv"
+FLAT_SUFFIX = "_flat.joblib"
+EXPORT_MODELS = [
+    os.path.join(MODEL_DIR, "final_random_forest_pipeline.pkl"),
+    os.path.join(MODEL_DIR, "best_gradient_boosting.pkl"),
+]
+BENCHMARK_OUTPUT_PATH = "outputs/metrics/tree_engine_benchmark.csv"
+
+# Rows traversed per block; bounds the (rows x trees) index arrays
+BLOCK_ROWS = 8192
+
+
+class FlatForest(RegressorMixin, BaseEstimator):
+    """
+    Array-based tree ensemble with a scikit-learn style `predict`.
+
+    Attributes:
+        kind (str): "mean" (forests, single trees) or "additive" (gradient boosting).
+        init_value (float): Starting value for additive ensembles.
+        scale (float): Per-tree multiplier for additive ensembles (learning rate).
+        value_scale (float or None): If set, `value` holds quantised integers and
+            node values are `value_offset + value_scale * value`.
+        n_trees (int), max_depth (int), n_features_in_ (int)
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, n_features,
+                 kind="mean", init_value=0.0, scale=1.0, value_scale=None, value_offset=0.0):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.n_features_in_ = self.n_features
+        self.kind = kind
+        self.init_value = float(init_value)
+        self.scale = float(scale)
+        self.value_scale = value_scale
+        self.value_offset = value_offset
+
+    def __repr__(self):
+        return (f"FlatForest(kind={self.kind!r}, n_trees={self.n_trees}, "
+                f"n_nodes={len(self.value)}, max_depth={self.max_depth})")
+
+    def fit(self, X, y, sample_weight=None):
+        """
+        Train a RandomForestRegressor with as many trees as this forest (100 if it
+        has none) and take over its flattened trees. Usually a FlatForest is
+        exported from an already fitted model with `from_estimator` instead.
+        """
+        forest = RandomForestRegressor(n_estimators=self.n_trees or 100, random_state=0)
+        flat = FlatForest.from_estimator(forest.fit(X, y, sample_weight=sample_weight))
+        self.set_params(**flat.get_params())
+        self.n_features_in_ = self.n_features
+        return self
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def children_left(self):
+        return self.children[:, 0]
+
+    @property
+    def children_right(self):
+        return self.children[:, 1]
+
+    @property
+    def is_leaf(self):
+        return self.children[:, 0] == np.arange(len(self.children))
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.children,
+                                      self.value, self.roots))
+
+    def node_values(self, nodes=None):
+        """Value of `nodes` (default: every node), decoding quantised values."""
+        values = self.value if nodes is None else self.value[nodes]
+        if self.value_scale is None:
+            return values
+        return self.value_offset + self.value_scale * values.astype(np.float64)
+
+    def select_trees(self, tree_indices):
+        """New FlatForest keeping only the trees in `tree_indices` (in that order)."""
+        ends = np.append(self.roots[1:], len(self.value))
+        parts = {"feature": [], "threshold": [], "children": [], "value": []}
+        roots = []
+        offset = 0
+        for t in tree_indices:
+            start, end = self.roots[t], ends[t]
+            for name in ("feature", "threshold", "value"):
+                parts[name].append(getattr(self, name)[start:end])
+            parts["children"].append(self.children[start:end] - start + offset)
+            roots.append(offset)
+            offset += end - start
+        params = self.get_params()
+        params.update({name: np.concatenate(arrays) for name, arrays in parts.items()})
+        params["roots"] = np.asarray(roots, dtype=self.roots.dtype)
+        return type(self)(**params)
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        """Flatten a fitted forest, gradient-boosting or decision-tree regressor."""
+        init_value, scale, kind = 0.0, 1.0, "mean"
+        if hasattr(estimator, "tree_"):
+            trees = [estimator]
+        elif hasattr(estimator, "learning_rate") and hasattr(estimator, "init_"):
+            trees = [stage[0] for stage in estimator.estimators_]
+            kind, scale = "additive", estimator.learning_rate
+            init_value = _constant_init(estimator.init_)
+        elif hasattr(estimator, "estimators_"):
+            trees = list(estimator.estimators_)
+        else:
+            raise ValueError(f"[ERROR] Cannot flatten {type(estimator).__name__}: not a tree ensemble.")
+
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree in trees:
+            t = tree.tree_
+            nodes = np.arange(t.node_count, dtype=np.int32)
+            is_leaf = t.children_left < 0
+            features.append(np.where(is_leaf, 0, t.feature).astype(np.int32))
+            thresholds.append(t.threshold.astype(np.float64))
+            children.append(np.column_stack([
+                np.where(is_leaf, nodes, t.children_left),
+                np.where(is_leaf, nodes, t.children_right),
+            ]).astype(np.int32) + offset)
+            values.append(t.value[:, 0, 0].astype(np.float64))
+            roots.append(offset)
+            offset += t.node_count
+            max_depth = max(max_depth, t.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.concatenate(children),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            n_features=trees[0].n_features_in_,
+            kind=kind,
+            init_value=init_value,
+            scale=scale,
+        )
+
+    def _as_input(self, X):
+        # scikit-learn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"[ERROR] Expected {self.n_features_in_} features, got shape {X.shape}.")
+        return X.astype(np.float64)
+
+    def apply(self, X):
+        """Global leaf index reached in every tree, shape (n_samples, n_trees)."""
+        X = self._as_input(X)
+        n_features = X.shape[1]
+        is_leaf = self.is_leaf
+        children = self.children.ravel()
+        leaves = np.empty((len(X), self.n_trees), dtype=np.int32)
+        for start in range(0, len(X), BLOCK_ROWS):
+            block = X[start:start + BLOCK_ROWS].ravel()
+            n_rows = len(block) // n_features
+            # One entry per (row, tree) pair, row-major like `leaves`
+            nodes = np.tile(self.roots, n_rows)
+            row_offset = np.repeat(np.arange(n_rows) * n_features, self.n_trees)
+            active = np.flatnonzero(~is_leaf[nodes])
+            while active.size:
+                current = nodes[active]
+                x = block[row_offset[active] + self.feature[current]]
+                current = children[2 * current + (x > self.threshold[current])]
+                nodes[active] = current
+                active = active[~is_leaf[current]]
+            leaves[start:start + n_rows] = nodes.reshape(n_rows, self.n_trees)
+        return leaves
+
+    def tree_predictions(self, X):
+        """Raw leaf value of every tree, shape (n_samples, n_trees)."""
+        return self.node_values(self.apply(X))
+
+    def predict(self, X):
+        per_tree = np.ascontiguousarray(self.tree_predictions(X).T)
+        if self.kind == "additive":
+            out = np.full(per_tree.shape[1], self.init_value)
+            for values in per_tree:
+                out += self.scale * values
+            return out
+        out = np.zeros(per_tree.shape[1])
+        for values in per_tree:
+            out += values
+        out /= self.n_trees
+        return out
+
+
+def _constant_init(init):
+    if isinstance(init, str) and init == "zero":
+        return 0.0
+    if hasattr(init, "constant_"):
+        return float(np.ravel(init.constant_)[0])
+    raise ValueError(f"[ERROR] Unsupported gradient-boosting init estimator: {init!r}")
+
+
+def final_estimator(model):
+    """The estimator that makes predictions (the last step of a pipeline)."""
+    return model.steps[-1][1] if isinstance(model, Pipeline) else model
+
+
+def flatten_model(model):
+    """
+    Return `model` with its tree ensemble replaced by a FlatForest.
+    Pipelines keep their preprocessing steps.
+    """
+    return replace_final_estimator(model, FlatForest.from_estimator(final_estimator(model)))
+
+
+def replace_final_estimator(model, estimator):
+    """Copy of pipeline `model` with its last step swapped for `estimator`."""
+    if not isinstance(model, Pipeline):
+        return estimator
+    replaced = copy.copy(model)
+    replaced.steps = list(model.steps[:-1]) + [(model.steps[-1][0], estimator)]
+    return replaced
+
+
+def flat_path(model_path):
+    return os.path.splitext(model_path)[0] + FLAT_SUFFIX
+
+
+def export_model(model_path, output_path=None):
+    """Flatten the artefact at `model_path` and save it next to it. Returns the path."""
+    output_path = output_path or flat_path(model_path)
+    flat = flatten_model(joblib.load(model_path))
+    joblib.dump(flat, output_path, compress=3)
+    forest = final_estimator(flat)
+    print(f"[SAVED] {forest.n_trees} trees ({len(forest.value):,} nodes) saved to: {output_path}")
+    return output_path
+
+
+def model_input(model, X):
+    """Columns of `X` the model was fitted on (pipelines take X as is)."""
+    if isinstance(model, Pipeline):
+        return X
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None:
+        return X[list(names)]
+    if X.shape[1] != model.n_features_in_:
+        X = X.select_dtypes(include=[np.number])
+    return X.iloc[:, :model.n_features_in_].astype(np.float64).to_numpy()
+
+
+def verify_parity(model, flat, X):
+    """
+    Compare sklearn and flat predictions on `X`.
+    Returns (identical_rows, n_rows, max_abs_difference).
+    """
+    reference = _single_threaded(model)
+    expected = reference.predict(model_input(model, X))
+    actual = flat.predict(model_input(model, X))
+    diff = np.abs(expected - actual)
+    return int((expected == actual).sum()), len(expected), float(diff.max()) if len(diff) else 0.0
+
+
+def _single_threaded(model):
+    # Forests sum trees in thread completion order when n_jobs > 1
+    model = copy.deepcopy(model)
+    estimator = final_estimator(model)
+    if hasattr(estimator, "n_jobs"):
+        estimator.n_jobs = 1
+    return model
+
+
+def _dumped_size(obj):
+    buffer = io.BytesIO()
+    joblib.dump(obj, buffer, compress=3)
+    return buffer.tell()
+
+
+def benchmark(model, flat, X, batch_rows=100_000, repeats=200):
+    """
+    Single-row latency, batch throughput and serialized size of the sklearn
+    model versus its flat export. For pipelines, single-row latency is also
+    reported for the tree ensemble alone (on already preprocessed input).
+    Returns a list of result dicts.
+    """
+    X = model_input(model, X)
+    rows = X.iloc if isinstance(X, pd.DataFrame) else X
+    row = rows[[0]]
+    batch = rows[np.resize(np.arange(len(X)), batch_rows)]
+    model_row = model[:-1].transform(row) if isinstance(model, Pipeline) else row
+
+    results = []
+    for engine, candidate in (("sklearn", _single_threaded(model)), ("flat", flat)):
+        estimator = final_estimator(candidate)
+        candidate.predict(row)  # warm-up
+        latency = median_seconds(lambda: candidate.predict(row), repeats)
+        model_latency = median_seconds(lambda: estimator.predict(model_row), repeats)
+        start = time.perf_counter()
+        candidate.predict(batch)
+        batch_seconds = time.perf_counter() - start
+        results.append({
+            "Engine": engine,
+            "Single-row latency (ms)": round(latency * 1000, 3),
+            "Single-row model latency (ms)": round(model_latency * 1000, 3),
+            "Batch throughput (rows/s)": round(batch_rows / batch_seconds, 1),
+            "Artifact size (KB)": round(_dumped_size(candidate) / 1024, 1),
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export tree ensembles to the flat engine.")
+    parser.add_argument("--models", nargs="+", default=EXPORT_MODELS)
+    parser.add_argument("--verify", action="store_true",
+                        help="Check flat predictions match scikit-learn on X_test.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare latency, throughput and artifact size.")
+    parser.add_argument("--benchmark-output", default=BENCHMARK_OUTPUT_PATH)
+    args = parser.parse_args(argv)
+
+    X_test = read_dataset(X_TEST_PATH) if args.verify or args.benchmark else None
+    rows = []
+    failed = False
+    for model_path in args.models:
+        if not os.path.exists(model_path):
+            print(f"[WARNING] Skipping missing model: {model_path}")
+            continue
+        try:
+            output_path = export_model(model_path)
+        except Exception as e:
+            print(f"[ERROR] Could not export {model_path}: {e}")
+            failed = True
+            continue
+
+        model = joblib.load(model_path)
+        flat = joblib.load(output_path)
+        if args.verify:
+            identical, n_rows, max_diff = verify_parity(model, flat, X_test)
+            status = "OK" if identical == n_rows else "MISMATCH"
+            failed |= identical != n_rows
+            print(f"[INFO] Parity {status}: {identical}/{n_rows} identical predictions "
+                  f"(max |diff| {max_diff:.3g}) for {model_path}")
+        if args.benchmark:
+            for result in benchmark(model, flat, X_test):
+                rows.append({"Model": os.path.basename(model_path), **result})
+
+    if rows:
+        report = pd.DataFrame(rows)
+        os.makedirs(os.path.dirname(args.benchmark_output), exist_ok=True)
+        report.to_csv(args.benchmark_output, index=False)
+        print(report.to_string(index=False))
+        print(f"[SAVED] Benchmark results saved to: {args.benchmark_output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    # Import through the package so exported artefacts pickle FlatForest as
+    # utils.tree_engine.FlatForest rather than __main__.FlatForest
+    from utils.tree_engine import main as _main
+    raise SystemExit(_main())
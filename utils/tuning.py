@@ -0,0 +1,401 @@
+"""
+Heritage Housing – Hyperparameter Tuning
+
+Purpose:
+Replaces the per-model GridSearchCV cells of `05_Model_Training_and_Evaluation.ipynb`
+with one scriptable search over every model family (Ridge, Decision Tree, Random
+Forest, Gradient Boosting, SVR), run in a single process pool.
+
+- Successive halving with folds as the resource: every configuration is first scored
+  on a few CV folds, only the best 1/`eta` of each family advance to more folds, and
+  the survivors are scored on all folds. `--n-iter` samples configurations at random
+  from each grid instead of using the full grid
+- Fold preprocessing (imputer + scaler for Ridge/SVR) is fitted once per fold and
+  saved under `outputs/tuning_cache/`, together with every (configuration, fold)
+  score; re-running with an extended grid only evaluates configurations not seen
+  before. The cache is keyed by the content of X_train / y_train and the CV setup,
+  so new data starts a fresh cache
+- X_train / y_train are opened as the shared memory-mapped feature matrix
+  (utils/feature_matrix.py); fold workers open the same files and only receive fold
+  indices, so the data is never pickled into the pool
+- The best configuration of each family is written to
+  `outputs/metrics/cross_validation_results.csv` (Model, CV R2, CV MAE, CV RMSE, as
+  before) and its parameters to `outputs/metrics/best_hyperparameters.json`; a
+  `--models` run only replaces the rows and entries of the families it searched
+
+Usage:
+    python -m utils.tuning --workers 4
+    python -m utils.tuning --models "Random Forest" "Gradient Boosting" --n-iter 20
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import KFold, ParameterGrid, ParameterSampler
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVR
+from sklearn.tree import DecisionTreeRegressor
+
+from utils.data_io import resolve_dataset
+from utils.feature_matrix import FINAL_DIR, load_feature_matrix, source_paths
+from utils.model_registry import file_digest
+
+
+CACHE_DIR = "outputs/tuning_cache"
+CV_RESULTS_PATH = "outputs/metrics/cross_validation_results.csv"
+BEST_PARAMS_PATH = "outputs/metrics/best_hyperparameters.json"
+
+N_SPLITS = 5
+RANDOM_STATE = 42
+DEFAULT_ETA = 3
+DEFAULT_MIN_FOLDS = 1
+
+# Grids from 05_Model_Training_and_Evaluation.ipynb
+MODEL_FAMILIES = {
+    "Ridge Regression": {
+        "estimator": Ridge,
+        "fixed": {"random_state": RANDOM_STATE},
+        "preprocessing": "scaled",
+        "grid": {
+            "alpha": [0.01, 0.1, 1, 10, 100],
+            "solver": ["auto", "svd", "cholesky", "lsqr", "sag"],
+        },
+    },
+    "Decision Tree": {
+        "estimator": DecisionTreeRegressor,
+        "fixed": {"random_state": RANDOM_STATE},
+        "preprocessing": "none",
+        "grid": {
+            "max_depth": [3, 5, 10, 15, None],
+            "min_samples_split": [2, 5, 10],
+            "min_samples_leaf": [1, 2, 4],
+        },
+    },
+    "Random Forest": {
+        "estimator": RandomForestRegressor,
+        "fixed": {"random_state": RANDOM_STATE},
+        "preprocessing": "none",
+        "grid": {
+            "n_estimators": [100, 200],
+            "max_depth": [10, 20, None],
+            "min_samples_split": [2, 5],
+            "min_samples_leaf": [1, 2],
+        },
+    },
+    "Gradient Boosting": {
+        "estimator": GradientBoostingRegressor,
+        "fixed": {"random_state": RANDOM_STATE},
+        "preprocessing": "none",
+        "grid": {
+            "n_estimators": [100, 200],
+            "max_depth": [3, 4, 5],
+            "learning_rate": [0.01, 0.05, 0.1],
+            "min_samples_split": [2, 5],
+            "min_samples_leaf": [1, 2],
+        },
+    },
+    "SVR": {
+        "estimator": SVR,
+        "fixed": {"kernel": "rbf"},
+        "preprocessing": "scaled",
+        "grid": {
+            "C": [1, 10, 100],
+            "gamma": ["scale", "auto"],
+            "epsilon": [0.1, 0.2, 0.5],
+        },
+    },
+}
+
+PREPROCESSORS = {
+    "none": lambda: None,
+    "scaled": lambda: make_pipeline(SimpleImputer(strategy="median"), StandardScaler()),
+}
+
+
+def config_key(family, params):
+    """Stable identifier of one (family, parameters) configuration."""
+    text = json.dumps({"family": family, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def _data_key(split, data_dir, n_splits, random_state):
+    digests = [file_digest(resolve_dataset(path))[:16] for path in source_paths(split, data_dir)]
+    return "-".join(digests + [f"k{n_splits}", f"s{random_state}"])
+
+
+def candidate_configs(family, n_iter=None, random_state=RANDOM_STATE):
+    """The family's full grid, or `n_iter` configurations sampled from it."""
+    grid = MODEL_FAMILIES[family]["grid"]
+    if n_iter is not None and n_iter < len(ParameterGrid(grid)):
+        return list(ParameterSampler(grid, n_iter=n_iter, random_state=random_state))
+    return list(ParameterGrid(grid))
+
+
+class TuningCache:
+    """
+    On-disk cache of fold data and fold scores for one dataset + CV setup.
+
+    Layout under `cache_dir/<data_key>/`:
+        folds/<preprocessing>_<fold>.joblib   fitted transformer + transformed arrays
+        scores.jsonl                          one line per (configuration, fold)
+    """
+
+    def __init__(self, cache_dir, data_key):
+        self.root = os.path.join(cache_dir, data_key)
+        self.scores_path = os.path.join(self.root, "scores.jsonl")
+        os.makedirs(os.path.join(self.root, "folds"), exist_ok=True)
+        self.scores = {}
+        torn = 0
+        if os.path.exists(self.scores_path):
+            with open(self.scores_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        self.scores[(record["config"], record["fold"])] = record
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        torn += 1  # e.g. a line cut short by an interrupted run
+        if torn:
+            print(f"[WARNING] Skipped {torn} unreadable line(s) in {self.scores_path}; "
+                  "those scores will be recomputed.")
+            self._rewrite_scores()
+
+    def _rewrite_scores(self):
+        """Replace scores.jsonl with the parsed records, so later appends start on a fresh line."""
+        part_path = f"{self.scores_path}.part"
+        with open(part_path, "w") as f:
+            for record in self.scores.values():
+                f.write(json.dumps(record, default=str) + "\n")
+        os.replace(part_path, self.scores_path)
+
+    def fold_path(self, preprocessing, fold):
+        return os.path.join(self.root, "folds", f"{preprocessing}_{fold}.joblib")
+
+    def add_score(self, record):
+        self.scores[(record["config"], record["fold"])] = record
+        with open(self.scores_path, "a") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+
+def prepare_fold(path, preprocessing, split, data_dir, train_idx, valid_idx):
+    """
+    Fit the fold's preprocessing on its training rows and save the arrays.
+    X and y are opened from the shared memory-mapped feature matrix.
+    """
+    X, y, _ = load_feature_matrix(split, data_dir, refresh=False)
+    transformer = PREPROCESSORS[preprocessing]()
+    X_train, X_valid = X[train_idx], X[valid_idx]
+    if transformer is not None:
+        X_train = transformer.fit_transform(X_train)
+        X_valid = transformer.transform(X_valid)
+    # Written aside and moved into place, so an interrupted run never leaves a
+    # truncated fold that later runs would trust
+    part_path = f"{path}.part"
+    joblib.dump({
+        "transformer": transformer,
+        "X_train": np.ascontiguousarray(X_train),
+        "y_train": y[train_idx],
+        "X_valid": np.ascontiguousarray(X_valid),
+        "y_valid": y[valid_idx],
+    }, part_path)
+    os.replace(part_path, path)
+    return path
+
+
+def score_config(fold_path, family, params):
+    """Fit one configuration on one cached fold and return its validation scores."""
+    fold = joblib.load(fold_path, mmap_mode="r")
+    spec = MODEL_FAMILIES[family]
+    model = spec["estimator"](**spec["fixed"], **params)
+    start = time.perf_counter()
+    model.fit(fold["X_train"], fold["y_train"])
+    predictions = model.predict(fold["X_valid"])
+    return {
+        "r2": float(r2_score(fold["y_valid"], predictions)),
+        "mae": float(mean_absolute_error(fold["y_valid"], predictions)),
+        "mse": float(mean_squared_error(fold["y_valid"], predictions)),
+        "fit_seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def _fold_schedule(n_splits, eta, min_folds):
+    """Number of folds scored at each rung, e.g. [1, 3, 5] for 5 folds and eta=3."""
+    schedule = []
+    folds = max(1, min(min_folds, n_splits))
+    while folds < n_splits:
+        schedule.append(folds)
+        folds *= eta
+    schedule.append(n_splits)
+    return schedule
+
+
+class SearchRun:
+    """One successive-halving search over the selected model families."""
+
+    def __init__(self, families, split, data_dir, cache, n_splits=N_SPLITS, random_state=RANDOM_STATE,
+                 eta=DEFAULT_ETA, min_folds=DEFAULT_MIN_FOLDS, n_iter=None, workers=1):
+        self.families = families
+        self.split = split
+        self.data_dir = data_dir
+        # Built here if stale, so the workers only ever open the files
+        X, _, _ = load_feature_matrix(split, data_dir)
+        self.cache = cache
+        self.n_splits = n_splits
+        self.splits = list(KFold(n_splits, shuffle=True, random_state=random_state).split(X))
+        self.eta = eta
+        self.schedule = _fold_schedule(n_splits, eta, min_folds)
+        self.workers = max(1, workers)
+        self.candidates = {
+            family: [(config_key(family, params), params)
+                     for params in candidate_configs(family, n_iter, random_state)]
+            for family in families
+        }
+        self.evaluated = 0
+
+    def _prepare_folds(self, executor):
+        futures = []
+        for preprocessing in sorted({MODEL_FAMILIES[f]["preprocessing"] for f in self.families}):
+            for fold, (train_idx, valid_idx) in enumerate(self.splits):
+                path = self.cache.fold_path(preprocessing, fold)
+                if not os.path.exists(path):
+                    futures.append(executor.submit(
+                        prepare_fold, path, preprocessing, self.split, self.data_dir,
+                        train_idx, valid_idx))
+        for future in as_completed(futures):
+            future.result()
+
+    def _score_missing(self, executor, jobs):
+        """Score every (family, key, params, fold) not already in the cache."""
+        futures = {}
+        for family, key, params, fold in jobs:
+            if (key, fold) in self.cache.scores:
+                continue
+            path = self.cache.fold_path(MODEL_FAMILIES[family]["preprocessing"], fold)
+            futures[executor.submit(score_config, path, family, params)] = (family, key, params, fold)
+        for future in as_completed(futures):
+            family, key, params, fold = futures[future]
+            self.cache.add_score({"config": key, "family": family, "params": params,
+                                  "fold": fold, **future.result()})
+            self.evaluated += 1
+
+    def _mean_r2(self, key, n_folds):
+        return np.mean([self.cache.scores[(key, fold)]["r2"] for fold in range(n_folds)])
+
+    def run(self):
+        """Run every rung for every family; returns {family: (key, params)} of the winners."""
+        alive = {family: list(configs) for family, configs in self.candidates.items()}
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            self._prepare_folds(executor)
+            for rung, n_folds in enumerate(self.schedule):
+                # All families' jobs for this rung share the pool
+                jobs = [(family, key, params, fold)
+                        for family, configs in alive.items()
+                        for key, params in configs
+                        for fold in range(n_folds)]
+                self._score_missing(executor, jobs)
+                print(f"[INFO] Rung {rung + 1}/{len(self.schedule)}: "
+                      f"{sum(map(len, alive.values()))} configurations on {n_folds} fold(s)")
+                if n_folds == self.n_splits:
+                    break
+                for family, configs in alive.items():
+                    ranked = sorted(configs, key=lambda c: self._mean_r2(c[0], n_folds), reverse=True)
+                    alive[family] = ranked[:max(1, int(np.ceil(len(ranked) / self.eta)))]
+
+        return {
+            family: max(configs, key=lambda c: self._mean_r2(c[0], self.n_splits))
+            for family, configs in alive.items()
+        }
+
+    def summary(self, winners):
+        """Cross-validation table in the format of cross_validation_results.csv."""
+        rows = []
+        for family, (key, _) in winners.items():
+            folds = [self.cache.scores[(key, fold)] for fold in range(self.n_splits)]
+            rows.append({
+                "Model": family,
+                "CV R2": round(np.mean([s["r2"] for s in folds]), 4),
+                "CV MAE": round(np.mean([s["mae"] for s in folds]), 4),
+                "CV RMSE": round(float(np.sqrt(np.mean([s["mse"] for s in folds]))), 4),
+            })
+        return pd.DataFrame(rows).sort_values(by="CV R2", ascending=False)
+
+
+def _upsert_results(path, results):
+    """Replace the searched families' rows of the CV results, keeping the other models."""
+    if os.path.exists(path):
+        existing = pd.read_csv(path)
+        existing = existing[~existing["Model"].isin(results["Model"])]
+        results = pd.concat([existing, results], ignore_index=True)
+    results.sort_values(by="CV R2", ascending=False).to_csv(path, index=False)
+
+
+def _upsert_params(path, best_params):
+    """Replace the searched families' entries of the best parameters, keeping the others."""
+    merged = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            merged = json.load(f)
+    merged.update(best_params)
+    with open(path, "w") as f:
+        json.dump(merged, f, indent=2, default=str)
+
+
+def tune(families=None, split="train", data_dir=FINAL_DIR, cache_dir=CACHE_DIR,
+         output_path=CV_RESULTS_PATH, params_path=BEST_PARAMS_PATH, n_splits=N_SPLITS,
+         eta=DEFAULT_ETA, min_folds=DEFAULT_MIN_FOLDS, n_iter=None, workers=1):
+    """
+    Search all `families` and write their CV results and best parameters; rows and
+    entries of families not searched are kept. Returns (results DataFrame, {family: best params}).
+    """
+    families = families or list(MODEL_FAMILIES)
+    cache = TuningCache(cache_dir, _data_key(split, data_dir, n_splits, RANDOM_STATE))
+
+    start = time.perf_counter()
+    search = SearchRun(families, split, data_dir, cache, n_splits, RANDOM_STATE, eta, min_folds, n_iter, workers)
+    winners = search.run()
+    results = search.summary(winners)
+    best_params = {family: params for family, (_, params) in winners.items()}
+    print(f"[INFO] Evaluated {search.evaluated} new (configuration, fold) pairs "
+          f"in {time.perf_counter() - start:.1f}s; the rest came from the cache.")
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    _upsert_results(output_path, results)
+    _upsert_params(params_path, best_params)
+    print(results.to_string(index=False))
+    print(f"[SAVED] Cross-validation results saved to: {output_path}")
+    print(f"[SAVED] Best hyperparameters saved to: {params_path}")
+    return results, best_params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Successive-halving hyperparameter search.")
+    parser.add_argument("--models", nargs="+", choices=list(MODEL_FAMILIES), default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--n-iter", type=int, default=None,
+                        help="Sample this many configurations per family instead of the full grid.")
+    parser.add_argument("--eta", type=int, default=DEFAULT_ETA,
+                        help="Keep the best 1/eta of each family at every rung.")
+    parser.add_argument("--min-folds", type=int, default=DEFAULT_MIN_FOLDS,
+                        help="Folds scored at the first rung.")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--output", default=CV_RESULTS_PATH)
+    parser.add_argument("--params-output", default=BEST_PARAMS_PATH)
+    args = parser.parse_args(argv)
+    tune(args.models, cache_dir=args.cache_dir, output_path=args.output,
+         params_path=args.params_output, eta=args.eta, min_folds=args.min_folds,
+         n_iter=args.n_iter, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()